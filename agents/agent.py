@@ -1,18 +1,31 @@
-import json
 
 import asyncio
-from typing import Optional
-from datetime import datetime, timezone
+import logging
+from typing import Awaitable, Optional
 
 from spade.agent import Agent
 from spade.behaviour import CyclicBehaviour
 from spade.message import Message
+from spade.template import Template
 
 from agents.protocol.acl_messages import AclMessage
-from agents.protocol.guards import meta_language_is_json, acl_language_is_json
-from agents.common.telemetry import log_acl_event
-from agents.common.metrics import inc
-from agents.common.metrics import export_to_kb
+from agents.protocol import wire
+from agents.protocol.guards import meta_language_supported, acl_language_is_json
+from agents.protocol.correlation import Correlator
+from agents.protocol.dedup import ACL_DUPLICATES, DedupWindow
+from agents.protocol.errors import ErrorCode
+from agents.protocol.handler import ACL_MESSAGES, ACL_SEND_SECONDS, ACL_WIRE_BYTES, acl_labels, next_frame, wake
+from agents.protocol.ingest import ingest_message
+from agents.protocol.lanes import CLASSIFIER
+from agents.protocol.mailbox import ConversationMailboxes
+from agents.common.config import settings
+from agents.common.telemetry import record_acl, aflush as atelemetry_flush
+from agents.common.metrics import inc, timer
+from agents.common.log import StructLogger, get_logger, wire_allowed
+from agents.common import metrics_store
+from agents.common import profiler, tracing
+from agents.common.kb_async import aflush
+from agents.common.metrics_exporter import maybe_start_from_env as start_metrics_exporter
 
 
 # (opcjonalnie) integracja z KB dla zdrowia agenta
@@ -25,32 +38,47 @@ except Exception:
 class BaseAgent(Agent):
     """
     Klasa bazowa dla agentów SPADE z ACL:
-    - wspólny Inbox (odbiór -> walidacja -> parsowanie -> handle_acl)
+    - jeden konsument skrzynki XMPP na agenta (acl_consumer(): domyślnie Inbox,
+      odbiór -> walidacja -> parsowanie -> handle_acl; pochodne podają własny OnACL)
     - helpery: send_acl, parse_acl, log
     - prosty healthcheck do KB (jeśli KB dostępne)
     """
 
-    recv_timeout: int = 5   # standardowy timeout na odbiór
     health_session_id: str = "system"
 
-    # ------------ logowanie ------------
-    def log(self, msg: str):
-        print(f"[{self.__class__.__name__}] {msg}")
-        
+    # ------------ logowanie (agents.common.log: kolejka + wątek zapisu, JSON lines) ------------
+    @property
+    def logger(self) -> StructLogger:
+        """Logger agenta "agent.<Klasa>" — poziom per agent przez MAS_LOG_LEVELS albo log.set_level."""
+        lg = getattr(self, "_logger", None)
+        if lg is None:
+            lg = self._logger = get_logger(f"agent.{type(self).__name__}")
+        return lg
+
+    def log(self, msg: str, *, level: int = logging.INFO, **fields):
+        self.logger.log(level, msg, **fields)
+
     def wire_log(self, dir_: str, *, acl: AclMessage, to_jid: Optional[str]=None, spade_msg: Optional[Message]=None):
+        """Linia WIRE (debug spójności thread/conv): pola budowane tylko, gdy poziom i limit WIRE pozwalają."""
+        wire_logger = getattr(self, "_wire_logger", None)
+        if wire_logger is None:
+            wire_logger = self._wire_logger = get_logger(f"wire.{type(self).__name__}")
+        if not wire_logger.enabled(logging.INFO) or not wire_allowed(type(self).__name__):
+            return
         try:
-            from_jid = str(getattr(spade_msg, "sender", self.jid))
-            thr   = getattr(spade_msg, "thread", None) if spade_msg else None
             meta  = getattr(spade_msg, "metadata", {}) or {}
-            stanza = getattr(spade_msg, "id", None) or meta.get("stanza_id")
-            ptype = (acl.payload or {}).get("type")
-            sess  = (acl.payload or {}).get("session_id")
-            self.log(
-                "WIRE "
-                f"dir={dir_} from={from_jid} to={to_jid or ''} "
-                f"perf={getattr(acl.performative,'value',str(acl.performative))} type={ptype} "
-                f"conv={acl.conversation_id} sess={sess} thread={thr} stanza={stanza} "
-                f"ts={datetime.now(timezone.utc).isoformat()}"
+            payload = acl.payload or {}
+            wire_logger.info(
+                "WIRE",
+                dir=dir_,
+                sender=str(getattr(spade_msg, "sender", None) or self.jid),
+                to=to_jid or "",
+                perf=getattr(acl.performative, "value", str(acl.performative)),
+                type=payload.get("type"),
+                conv=acl.conversation_id,
+                sess=payload.get("session_id"),
+                xmpp_thread=getattr(spade_msg, "thread", None) if spade_msg is not None else acl.conversation_id,
+                stanza=getattr(spade_msg, "id", None) or meta.get("stanza_id"),
             )
         except Exception:
             pass
@@ -60,128 +88,292 @@ class BaseAgent(Agent):
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str) -> Message:
         """Zbuduj i wyślij SPADE Message z AclMessage (wysyłka przez Behaviour)."""
 
-        # 1) Budowa SPADE Message z gwarancją: thread == conversation_id
-        #    (używamy metody z AclMessage dodanej w poprzednim kroku)
-        msg = acl.to_spade_message(to=to_jid)
+        # 1) Budowa SPADE Message z gwarancją: thread == conversation_id.
+        #    freeze(): JSON powstaje tu raz; body, telemetria i log korzystają z tej samej kopii.
+        #    Kodowanie body: json, chyba że odbiorca ogłosił zwięźlejsze (agents.protocol.wire)
+        encoding = wire.PEERS.choose(to_jid, len(acl.freeze().to_json()))
+        msg = acl.to_spade_message(to=to_jid, encoding=encoding)
 
         # 2) Pas bezpieczeństwa (nawet gdyby ktoś zbudował msg inną ścieżką):
         if not getattr(msg, "thread", None):
             msg.thread = acl.conversation_id
         elif msg.thread != acl.conversation_id:
-            self.log(f"[warn] Overriding thread {msg.thread!r} -> {acl.conversation_id!r}")
+            self.log(f"[warn] Overriding thread {msg.thread!r} -> {acl.conversation_id!r}", level=logging.WARNING)
             msg.thread = acl.conversation_id
 
-        # 3) Krótka telemetria „przewozowa” — jednorodna
-        try:
-            pval = getattr(acl.performative, "value", str(acl.performative))
-            ptype = (acl.payload or {}).get("type")
-            sess  = (acl.payload or {}).get("session_id")
-            self.log(
-                "WIRE dir=OUT "
-                f"from={self.jid} to={to_jid} "
-                f"perf={pval} type={ptype} "
-                f"conv={acl.conversation_id} sess={sess} "
-                f"thread={getattr(msg, 'thread', None)} stanza=None "
-                f"ts={datetime.now(timezone.utc).isoformat()}"
-            )
-        except Exception:
-            pass
+        # 3) Krótka telemetria „przewozowa” — jednorodna (pomijana przy wyłączonym poziomie / limicie WIRE)
+        wire_log = getattr(self, "wire_log", None)
+        if callable(wire_log):
+            wire_log("OUT", acl=acl, to_jid=to_jid, spade_msg=msg)
 
-        # 4) TELEMETRIA OUT (jak było)
+        # 4) TELEMETRIA OUT (bufor w pamięci, zapis w tle)
         try:
-            log_acl_event(acl.conversation_id, "OUT", json.loads(acl.to_json()))
+            record_acl("OUT", acl)
         except Exception as e:
-            self.log(f"[telemetry] OUT failed: {e}")
+            self.log(f"[telemetry] OUT failed: {e}", level=logging.WARNING)
 
-        # 5) METRYKI OUT (jak było)
+        # 5) METRYKI OUT (etykiety: agent, kierunek, performatyw, typ)
+        perf, ptype = acl_labels(acl)
+        owner = getattr(self, "name", None) or type(self).__name__
         try:
             inc("acl_out_total", 1)
-            p = getattr(acl, "performative", None)
-            if p and getattr(p, "value", None):
-                inc(f"acl_out_performative_{p.value}", 1)
-            payload = getattr(acl, "payload", {}) or {}
-            ptype = payload.get("type")
-            if isinstance(ptype, str):
-                inc(f"acl_out_type_{ptype}", 1)
+            ACL_MESSAGES.labels(owner, "out", perf, ptype).inc()
+            ACL_WIRE_BYTES.labels("out", encoding).inc(len(msg.body))
         except Exception:
             pass
 
-        # 6) Właściwa wysyłka
-        await behaviour.send(msg)
+        # 6) Właściwa wysyłka (z pomiarem czasu)
+        with timer(ACL_SEND_SECONDS.labels(owner, perf, ptype)):
+            await behaviour.send(msg)
 
-        # 7) Log „po wysyłce” (jak było)
-        try:
-            dump = acl.model_dump()
-        except AttributeError:
-            dump = acl.dict()
-        self.log(f"ACL OUT to={to_jid} payload={dump.get('payload')}")
+        # 7) Log „po wysyłce” (DEBUG; payload wprost, bez ponownego zrzutu modelu)
+        logger = getattr(self, "logger", None)
+        if logger is not None:
+            logger.debug("ACL OUT", to=to_jid, payload=acl.payload)
         return msg
 
 
+    async def send_request(
+        self, behaviour, acl: AclMessage, to_jid: str, *, match_conversation: bool = False
+    ) -> "asyncio.Future[AclMessage]":
+        """
+        Wyślij żądanie i zwróć future z odpowiedzią (agents.protocol.correlation):
+
+            fut = await self.send_request(behaviour, ask, to_jid=jid)
+            reply = await asyncio.wait_for(fut, timeout=2.0)
+
+        reply_with = message_id (o ile nie ustawiono). match_conversation=True dopasuje też
+        odpowiedź bez in_reply_to po conversation_id (peery, które go nie odsyłają).
+        """
+        if not acl.reply_with:
+            acl.reply_with = acl.message_id
+        conv = acl.conversation_id if match_conversation else None
+        fut = self._correlator().expect(acl.reply_with, conversation_id=conv)
+        try:
+            await self.send_acl(behaviour, acl, to_jid=to_jid)
+        except BaseException:
+            fut.cancel()
+            raise
+        return fut
+
+    def resolve_reply(self, acl: AclMessage) -> bool:
+        """Pipeline wejściowy: odpowiedź na send_request zamyka future zamiast iść do handle_acl."""
+        correlator = getattr(self, "_pending", None)
+        return correlator is not None and correlator.resolve(acl)
+
+    def _correlator(self) -> Correlator:
+        correlator = getattr(self, "_pending", None)
+        if correlator is None:
+            correlator = self._pending = Correlator()
+        return correlator
+
+    def spawn(self, coro: Awaitable, *, name: Optional[str] = None) -> asyncio.Task:
+        """Uruchom korutynę w tle (np. przepływ czekający na odpowiedzi); błąd trafia do logu, stop() anuluje."""
+        tasks = getattr(self, "_tasks", None)
+        if tasks is None:
+            tasks = self._tasks = set()
+        task = asyncio.ensure_future(coro)
+        if name:
+            task.set_name(name)
+        tasks.add(task)
+
+        def _done(t: asyncio.Task) -> None:
+            tasks.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                self.log(f"[task] {t.get_name()} FAILED: {t.exception()!r}", level=logging.ERROR)
+
+        task.add_done_callback(_done)
+        return task
+
+    def mailboxes(self, max_concurrency: Optional[int] = None) -> ConversationMailboxes:
+        """
+        Skrzynki rozmów agenta (agents.protocol.mailbox) — jedne dla wszystkich behaviours,
+        więc limit obsług w toku jest wspólny. Limit ustala pierwsze wywołanie.
+        """
+        boxes = getattr(self, "_mailboxes", None)
+        if boxes is None:
+            boxes = self._mailboxes = ConversationMailboxes(
+                max_concurrency=max_concurrency or settings.acl_concurrency or 1,
+                idle_s=settings.acl_mailbox_idle_s,
+                name=getattr(self, "name", None) or type(self).__name__,
+                on_error=lambda key, e: self.log(f"[mailbox] conv={key} FAILED: {e!r}", level=logging.ERROR),
+            )
+        return boxes
+
     def parse_acl(self, msg: Message) -> Optional[AclMessage]:
-        """Wymuś JSON w meta + w obiekcie ACL, potem zwróć AclMessage albo None."""
-        if not meta_language_is_json(msg):
+        """Wymuś JSON (lub obsługiwane kodowanie body) w meta + JSON w obiekcie ACL, potem zwróć AclMessage albo None."""
+        if not meta_language_supported(msg):
             lang_meta = msg.metadata.get("language") if hasattr(msg, "metadata") else None
-            self.log(f"WARN unsupported meta.language='{lang_meta}', drop")
+            self.log(f"WARN unsupported meta.language='{lang_meta}', drop", level=logging.WARNING)
             return None
 
-        try:
-            # parser respektujący XMPP thread (dokładaliśmy go w AclMessage)
-            acl = AclMessage.from_spade_message(msg)
-        except Exception as e:
-            self.log(f"ERR invalid ACL (from_spade_message): {e}; body={getattr(msg,'body', '')!r}")
+        # jedno dekodowanie body + walidacja; thread XMPP uzupełnia conversation_id (agents.protocol.ingest)
+        res = ingest_message(msg)
+        if not res.ok:
+            self.log(f"ERR invalid ACL: {res.acl.payload.get('details', {}).get('err')}; body={getattr(msg,'body', '')!r}", level=logging.WARNING)
             return None
+        acl = res.acl
 
         if not acl_language_is_json(acl):
             try:
                 lang = acl.language
             except Exception:
                 lang = None
-            self.log(f"WARN unsupported ACL.language='{lang}', drop")
+            self.log(f"WARN unsupported ACL.language='{lang}', drop", level=logging.WARNING)
             return None
 
         return acl
 
+    def is_duplicate(self, acl: AclMessage) -> bool:
+        """Czy ramka już była (message_id / idempotency_key; agents.protocol.dedup) — jedno okno na agenta."""
+        window = getattr(self, "_dedup", None)
+        if window is None:
+            window = self._dedup = DedupWindow()
+        if not window.is_duplicate(acl):
+            return False
+        try:
+            ACL_DUPLICATES.labels(getattr(self, "name", None) or type(self).__name__).inc()
+        except Exception:
+            pass
+        return True
+
+    # ------------ Komunikaty sterujące (ontology=system) ------------
+    async def handle_control(self, behaviour, spade_msg: Message, acl: AclMessage) -> bool:
+        """
+        PROFILE (agents.common.profiler): start/stop sesji profilowania w działającym agencie.
+        True = komunikat obsłużony tutaj (nie idzie do handle_acl / routera).
+        """
+        payload = acl.payload or {}
+        if payload.get("type") != "PROFILE" or acl.ontology != "system":
+            return False
+        owner = getattr(self, "name", None) or type(self).__name__
+        sender = str(getattr(spade_msg, "sender", "") or "")
+
+        async def reply(result: str, out: AclMessage) -> None:
+            try:
+                profiler.PROFILE_REQUESTS.labels(owner, result).inc()
+            except Exception:
+                pass
+            await self.send_acl(behaviour, out.as_reply_to(acl), to_jid=sender)
+
+        if not profiler.authorized(sender):
+            self.log("PROFILE denied", level=logging.WARNING, sender=sender)
+            await reply("denied", AclMessage.build_failure(
+                acl.conversation_id, code=ErrorCode.UNAUTHORIZED.value, message="PROFILE not allowed for sender",
+                details={"sender": sender.split("/", 1)[0]}, ontology="system",
+            ))
+            return True
+
+        action = payload.get("action", "start")
+        try:
+            if action == "stop":
+                session = profiler.active()
+                if session is None:
+                    raise profiler.ProfileError("no profile session running")
+                session.stop()  # wyniki i CONFIRM "done" wysyła _finish_profile
+                await reply("stopped", self._profile_confirm(acl, "stopping"))
+                return True
+            if action != "start":
+                raise profiler.ProfileError(f"unknown action {action!r}")
+            session = profiler.ProfileSession(
+                owner, mode=payload.get("mode", "sampling"), seconds=payload.get("seconds", 30),
+            )
+            session.start()
+        except profiler.ProfileError as e:
+            busy = profiler.active() is not None and action == "start"
+            await reply("busy" if busy else "invalid", AclMessage.build_failure(
+                acl.conversation_id, code=ErrorCode.VALIDATION_ERROR.value, message=str(e), ontology="system",
+            ))
+            return True
+
+        self.log("PROFILE started", mode=session.mode, seconds=session.seconds, sender=sender)
+        await reply("started", self._profile_confirm(acl, "started", mode=session.mode, seconds=session.seconds))
+        self.spawn(self._finish_profile(behaviour, session, acl, sender), name=f"profile-{owner}")
+        return True
+
+    async def _finish_profile(self, behaviour, session: "profiler.ProfileSession", acl: AclMessage, sender: str):
+        """Po N sekundach (albo PROFILE stop) zatrzymaj pomiar, zapisz pliki poza pętlą i odeślij ścieżki."""
+        try:
+            await asyncio.wait_for(session.done.wait(), timeout=session.seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            session.stop()  # także przy anulowaniu (stop agenta)
+        files = await asyncio.to_thread(session.write)
+        self.log("PROFILE done", **files)
+        try:
+            profiler.PROFILE_REQUESTS.labels(getattr(self, "name", None) or type(self).__name__, "done").inc()
+        except Exception:
+            pass
+        await self.send_acl(behaviour, self._profile_confirm(acl, "done", files=files).as_reply_to(acl), to_jid=sender)
+
+    @staticmethod
+    def _profile_confirm(acl: AclMessage, status: str, **fields) -> AclMessage:
+        return AclMessage.build_inform(
+            conversation_id=acl.conversation_id,
+            payload={"type": "CONFIRM", "slot": "profile", "status": status, **fields},
+            ontology="system",
+        )
+
+    class Control(CyclicBehaviour):
+        """Komunikaty sterujące dla agentów bez wspólnego konsumenta (tylko behaviours z szablonami)."""
+
+        async def run(self):
+            msg = await next_frame(self)
+            if not msg:
+                return
+            acl = self.agent.parse_acl(msg)
+            if acl is not None:
+                await self.agent.handle_control(self, msg, acl)
+
+    def add_control_behaviour(self) -> None:
+        """Dla agentów, które nie wołają BaseAgent.setup(): odbiór REQUEST/system przez Control."""
+        t = Template()
+        t.set_metadata("performative", "REQUEST")
+        t.set_metadata("ontology", "system")
+        self.add_behaviour(self.Control(), t)
+
     # ------------ Inbox ------------
     class Inbox(CyclicBehaviour):
+        acl_concurrency = settings.acl_concurrency  # > 0: skrzynki per rozmowa zamiast ramki po ramce
+
         async def run(self):
-            msg = await self.receive(timeout=self.agent.recv_timeout)
+            msg = await next_frame(self)  # czeka na ramkę, bez cyklicznego odpytywania
             if not msg:
                 return
 
             acl = self.agent.parse_acl(msg)
             if not acl:
                 return
+            if self.agent.resolve_reply(acl):
+                return  # odpowiedź na send_request
+            if await self.agent.handle_control(self, msg, acl):
+                return  # PROFILE i inne komunikaty sterujące
 
             # WIRE IN (jednolinijkowy log do debugowania spójności)
-            try:
-                ptype = (acl.payload or {}).get("type")
-                sess  = (acl.payload or {}).get("session_id")
-                thr   = getattr(msg, "thread", None)
-                meta  = getattr(msg, "metadata", {}) or {}
-                stanza = getattr(msg, "id", None) or meta.get("stanza_id")
-                self.agent.log(
-                    "WIRE dir=IN "
-                    f"from={str(getattr(msg, 'sender', ''))} "
-                    f"perf={getattr(acl.performative,'value',str(acl.performative))} type={ptype} "
-                    f"conv={acl.conversation_id} sess={sess} thread={thr} stanza={stanza} "
-                    f"ts={datetime.now(timezone.utc).isoformat()}"
-                )
-            except Exception:
-                pass
+            self.agent.wire_log("IN", acl=acl, spade_msg=msg)
 
+            # przekaż referencję do aktywnego Behaviour (span obsługi pod traceparent nadawcy)
+            parent = tracing.extract(msg)
 
-            # przekaż referencję do aktywnego Behaviour
-            await self.agent.handle_acl(self, msg, acl)
+            async def handle():
+                with tracing.span("acl.handle", parent=parent, service=type(self.agent).__name__,
+                                  type=(acl.payload or {}).get("type"), conv=acl.conversation_id):
+                    await self.agent.handle_acl(self, msg, acl)
+
+            if self.acl_concurrency > 0:
+                self.agent.mailboxes(self.acl_concurrency).submit(
+                    acl.conversation_id or getattr(msg, "thread", None),
+                    handle,
+                    lane=CLASSIFIER.lane_for(acl),
+                )
+                return
+            await handle()
 
     # ------------ Wzorzec: nadpisuj w pochodnych ------------
     async def handle_acl(self, behaviour, spade_msg: Message, acl: AclMessage):
         """Domyślnie tylko log — konkretne agenty nadpisują tę metodę."""
-        try:
-            dump = acl.model_dump()
-        except AttributeError:
-            dump = getattr(acl, "dict", lambda: {"_warn": "no-dict"})()
-        self.log(f"UNHANDLED ACL payload={dump.get('payload')}")
+        self.log("UNHANDLED ACL", payload=acl.payload)
 
     # ------------ Healthcheck do KB (opcjonalny) ------------
     def kb_health_slot(self) -> str:
@@ -201,25 +393,74 @@ class BaseAgent(Agent):
         except Exception as e:
             self.log(f"KB healthcheck FAILED: {e}")
             
-    def export_metrics(self, session_id: str = "system", slot_prefix: str = "metrics") -> str:
+    async def export_metrics(self) -> Optional[int]:
+        """
+        Zrzut przyrostów metryk do metric_points (agents.common.metrics_store) w wątku —
+        zapis do bazy i blokada store nie wstrzymują pętli. Zwraca liczbę punktów, None przy błędzie.
+        """
         try:
-            slot = export_to_kb(session_id=session_id, slot_prefix=slot_prefix)
-            self.log(f"metrics exported to KB slot='{slot}'")
-            return slot
+            n = await asyncio.to_thread(metrics_store.flush)
+            self.log(f"metrics exported to metric_points ({n} points)")
+            return n
         except Exception as e:
             self.log(f"metrics export FAILED: {e}")
-            return ""
+            return None
 
     # ------------ Setup wspólne ------------
+    def acl_consumer(self) -> CyclicBehaviour:
+        """Jedyny konsument ramek ACL agenta (bez szablonu); pochodne z własnym OnACL zwracają go tutaj."""
+        return self.Inbox()
+
     async def setup(self):
-        # domyślnie: tylko wspólny inbox
-        self.add_behaviour(self.Inbox())
+        # dokładnie jeden konsument skrzynki — SPADE dostarcza ramkę każdemu pasującemu behaviour
+        self.acl_behaviour = self.acl_consumer()
+        self.add_behaviour(self.acl_behaviour)
         self.log("starting")
 
+    async def stop(self):
+        """
+        Zatrzymaj agenta: anuluj zadania w tle i skrzynki rozmów (i poczekaj na nie), oczekujące odpowiedzi, obudź
+        behaviours czekające na ramkę (on_end), dopisz wszystko, co zostało w buforach telemetrii i write-behind.
+        """
+        me = asyncio.current_task()
+        tasks = [t for t in getattr(self, "_tasks", ()) if t is not me]
+        for task in tasks:
+            task.cancel()
+        if getattr(self, "_mailboxes", None) is not None:
+            await self._mailboxes.aclose()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if getattr(self, "_pending", None) is not None:
+            self._pending.cancel_all()
+        for behav in list(getattr(self, "behaviours", ())):
+            behav.kill()  # SPADE robi to samo w stop(), ale kill() nikogo nie budzi
+            wake(behav)   # konsument czekający w next_frame kończy pętlę i woła on_end()
+        try:
+            await super().stop()
+        finally:
+            try:
+                await atelemetry_flush()
+            except Exception as e:
+                self.log(f"telemetry flush on stop FAILED: {e}")
+            if getattr(self, "_metrics_store_user", False):
+                self._metrics_store_user = False
+                try:
+                    # wątek store jest wspólny dla procesu: zatrzymuje go dopiero ostatni agent
+                    await asyncio.to_thread(metrics_store.release)
+                except Exception as e:
+                    self.log(f"metrics store flush on stop FAILED: {e}")
+            try:
+                n = await aflush()
+                if n:
+                    self.log(f"KB write-behind flushed {n} rows on stop")
+            except Exception as e:
+                self.log(f"KB flush on stop FAILED: {e}")
+
     # ------------ Utility: pętla życia ------------
     @staticmethod
     async def run_forever(agent: "BaseAgent"):
         await agent.start(auto_register=False)
         agent.log("started")
+        start_metrics_exporter(log=agent.log)  # tylko gdy ustawiono MAS_METRICS_PORT
+        agent._metrics_store_user = metrics_store.maybe_start_from_env(log=agent.log)
         while True:
             await asyncio.sleep(1)
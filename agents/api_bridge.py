@@ -1,14 +1,15 @@
 # agents/api_bridge.py
 import asyncio
-import json
 from typing import Dict, Optional
 import contextlib
 from collections import deque 
 
 from agents.agent import BaseAgent
 from agents.common.config import settings
+from agents.common import tracing
+from agents.common.metrics import register_gauge
 from agents.protocol.acl_messages import AclMessage
-from agents.protocol import acl_handler
+from agents.protocol import acl_handler, wire
 from agents.protocol.guards import acl_language_is_json
 from spade.behaviour import CyclicBehaviour
 
@@ -38,13 +39,20 @@ class ApiBridgeAgent(BaseAgent):
 
         return q
 
-    async def send_user_msg(self, conversation_id: str, text: str, session_id: Optional[str] = None):
+    async def send_user_msg(
+        self,
+        conversation_id: str,
+        text: str,
+        session_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ):
         sess = session_id or conversation_id
         acl = AclMessage.build_request_user_msg(
             conversation_id=conversation_id,
             text=text,
             ontology="ui",
             session_id=sess,
+            idempotency_key=idempotency_key,  # ponowiony POST z tym samym kluczem koordynator odrzuci
         )
         await self.send_acl(self._onacl_beh, acl, to_jid=settings.coordinator_jid)
         self.log(f"[Bridge] USER_MSG → Coordinator conv='{conversation_id}' sess='{sess}'")
@@ -59,24 +67,29 @@ class ApiBridgeAgent(BaseAgent):
             acl = AclMessage.build_request_user_msg(
                 conversation_id=conv, text=text, ontology="ui", session_id=sess
             )
-            await self.agent.send_acl(self, acl, to_jid=settings.coordinator_jid)
+            with tracing.span("bridge.user_msg", service="api", conv=conv):
+                await self.agent.send_acl(self, acl, to_jid=settings.coordinator_jid)
             self.agent.log(f"[Bridge] USER_MSG from HTTP → Coordinator conv='{conv}'")
 
     class OnACL(CyclicBehaviour):
-        acl_handler_timeout = 0.2
-
         @acl_handler
         async def run(self, acl: AclMessage, raw_msg):
             if not acl_language_is_json(acl):
                 return
             await self.agent.handle_acl(self, raw_msg, acl)
 
+    def acl_consumer(self):
+        return self.OnACL()
+
     async def setup(self):
-        await super().setup()
+        await super().setup()  # jedyny konsument ACL: OnACL (acl_consumer)
         # zachowaj referencję do OnACL, żeby send_user_msg mógł używać self._onacl_beh
-        self._onacl_beh = self.OnACL()
-        self.add_behaviour(self._onacl_beh)
+        self._onacl_beh = self.acl_behaviour
         self.add_behaviour(self.FromHttp())
+        # stan mostu HTTP<->ACL widoczny w /metrics
+        register_gauge("bridge_http_waiters", lambda: len(self._http_waiters))
+        register_gauge("bridge_http_buffered", lambda: len(self._http_buffer))
+        register_gauge("bridge_inbox_size", lambda: self.inbox.qsize())
 
     async def handle_acl(self, behaviour, spade_msg, acl: AclMessage):
         
@@ -97,7 +110,7 @@ class ApiBridgeAgent(BaseAgent):
         if not thr:
             self.log("[Bridge][warn] Missing thread; trying body.conversation_id")
             try:
-                body = json.loads(getattr(spade_msg, "body", "") or "{}")
+                body = wire.decode(getattr(spade_msg, "body", "") or "{}", wire.body_encoding(spade_msg))
             except Exception:
                 body = {}
             thr = body.get("conversation_id")
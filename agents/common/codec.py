@@ -0,0 +1,54 @@
+# agents/common/codec.py
+"""
+Wspólny kodek JSON: orjson, gdy jest zainstalowany, w przeciwnym razie biblioteka standardowa.
+
+    dumps(obj) -> str     kompaktowy JSON, UTF-8 bez \\uXXXX (jak ensure_ascii=False)
+    dumpb(obj) -> bytes
+    loads(s | bytes)      błędy jako ValueError (json.JSONDecodeError / orjson.JSONDecodeError)
+
+Oba warianty: datetime -> ISO 8601, Enum -> wartość, klucze nie-str -> str.
+AclMessage koduje się własnym enkoderem pydantic (AclMessage.to_json) — dla modeli jest
+szybszy niż orjson(model_dump()); ten moduł obsługuje zwykłe słowniki (body, KB, telemetria).
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # opcjonalna zależność
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTS = orjson.OPT_NON_STR_KEYS
+    _OPTS_SORTED = _OPTS | orjson.OPT_SORT_KEYS
+
+    def dumpb(obj: Any, *, sort_keys: bool = False) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTS_SORTED if sort_keys else _OPTS)
+
+    def dumps(obj: Any, *, sort_keys: bool = False) -> str:
+        return dumpb(obj, sort_keys=sort_keys).decode("utf-8")
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any, *, sort_keys: bool = False) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=_default)
+
+    def dumpb(obj: Any, *, sort_keys: bool = False) -> bytes:
+        return dumps(obj, sort_keys=sort_keys).encode("utf-8")
+
+    loads = json.loads
@@ -1,10 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, field_validator
 import os
+import warnings
 from dotenv import load_dotenv
 
 load_dotenv()
 
+_LENIENT_DEFAULTS = {  # błędna wartość w env -> ostrzeżenie i domyślna, nie wyjątek przy imporcie
+    "acl_max_body_bytes": 65536,
+    "acl_max_idle_s": 0.0,
+    "acl_concurrency": 0,
+    "acl_mailbox_idle_s": 30.0,
+}
+IDLE_TICK_S = 0.2  # dawny tick pętli receive(timeout=0.2) dla ACL_MAX_IDLE_TICKS
+
 class Settings(BaseModel):
+    model_config = ConfigDict(validate_default=True)
+
     xmpp_domain: str = os.getenv("XMPP_DOMAIN", "xmpp.pawelhaladyj.pl")
     xmpp_host: str = os.getenv("XMPP_HOST", "85.215.177.75")
     xmpp_port: int = int(os.getenv("XMPP_PORT", "5222"))
@@ -14,8 +25,38 @@ class Settings(BaseModel):
     coordinator_pass: str = os.getenv("XMPP_COORDINATOR_PASS","coordinator")
     verify_security: bool = os.getenv("VERIFY_SECURITY", "true").lower() == "true"
     acl_max_body_bytes: int = os.getenv("ACL_MAX_BODY_BYTES","65536")
-    acl_max_idle_ticks: int = os.getenv("ACL_MAX_IDLE_TICKS","0")
+    acl_max_idle_s: float = os.getenv("ACL_MAX_IDLE_S")  # 0 = bez strażnika; brak -> ACL_MAX_IDLE_TICKS
+    acl_concurrency: int = os.getenv("ACL_CONCURRENCY","0")  # 0 = ramka po ramce
+    acl_mailbox_idle_s: float = os.getenv("ACL_MAILBOX_IDLE_S","30")
     api_bridge_jid: str = os.getenv("API_BRIDGE_JID", "bridge@xmpp.pawelhaladyj.pl")
     api_bridge_pass: str = os.getenv("API_BRIDGE_PASS", "bridge")
 
+    @field_validator(*_LENIENT_DEFAULTS, mode="before")
+    @classmethod
+    def _lenient(cls, v, info):
+        default = _LENIENT_DEFAULTS[info.field_name]
+        try:
+            return type(default)(float(v)) if isinstance(default, int) else float(v)
+        except (TypeError, ValueError):
+            warnings.warn(f"invalid {info.field_name}={v!r}, using {default}", RuntimeWarning)
+            return default
+
+    # walidatory "before" działają od ostatniego: najpierw zamiana ticków, potem _lenient
+    @field_validator("acl_max_idle_s", mode="before")
+    @classmethod
+    def _idle_from_ticks(cls, v):
+        """Przestarzałe ACL_MAX_IDLE_TICKS (puste ticki co 0.2 s) -> sekundy, gdy ACL_MAX_IDLE_S nie ustawiono."""
+        if v is not None:
+            return v
+        ticks = os.getenv("ACL_MAX_IDLE_TICKS")
+        if ticks is None:
+            return "0"
+        warnings.warn(
+            f"ACL_MAX_IDLE_TICKS is deprecated, use ACL_MAX_IDLE_S (ticks x {IDLE_TICK_S} s)", FutureWarning
+        )
+        try:
+            return max(0.0, float(ticks)) * IDLE_TICK_S
+        except ValueError:
+            return ticks  # błędną wartość obsłuży _lenient
+
 settings = Settings()
\ No newline at end of file
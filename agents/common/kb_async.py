@@ -0,0 +1,229 @@
+# agents/common/kb_async.py
+"""
+Asynchroniczne API bazy wiedzy: aput_fact, aget_fact, aget_facts(_many), alist_facts, aquery_offers, aadd_offer.
+
+- Gdy zainstalowany jest asyncpg: własna pula połączeń asyncio (MAS_DB_POOL_MIN/MAX),
+  zapytania idą bez blokowania pętli zdarzeń SPADE.
+- Bez asyncpg: wywołania synchronicznego kb w dedykowanej, ograniczonej puli wątków
+  (rozmiar = MAS_DB_POOL_MAX, czyli tyle, ile połączeń ma pula synchroniczna).
+
+Zapytania SQL są wspólne z agents.common.kb (SQL_*), tu tylko przepisujemy placeholdery.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from . import codec, kb, tracing
+from .metrics import inc, timer
+
+try:
+    import asyncpg  # opcjonalnie
+except Exception:  # brak biblioteki
+    asyncpg = None  # type: ignore
+
+
+def _pg(sql: str) -> str:
+    """'%s' (psycopg2) -> '$1, $2, ...' (asyncpg)."""
+    counter = iter(range(1, 1000))
+    return re.sub(r"%s", lambda _m: f"${next(counter)}", sql)
+
+
+_SQL_INSERT_FACT = _pg(kb.SQL_INSERT_FACT)
+_SQL_PUT_FACT_PROJECTED = _pg(kb.SQL_PUT_FACT_PROJECTED)
+_SQL_CURRENT_FACT = _pg(kb.SQL_CURRENT_FACT)
+_SQL_LATEST_FACT = _pg(kb.SQL_LATEST_FACT)
+_SQL_CURRENT_FACTS_ALL = _pg(kb.SQL_CURRENT_FACTS_ALL)
+_SQL_MANY = {kb.SQL_CURRENT_FACTS: _pg(kb.SQL_CURRENT_FACTS), kb.SQL_LATEST_FACTS: _pg(kb.SQL_LATEST_FACTS)}
+_SQL_LIST_FACTS = _pg(kb.SQL_LIST_FACTS)
+_SQL_QUERY_OFFERS = _pg(kb.SQL_QUERY_OFFERS)
+_SQL_INSERT_OFFER = _pg(kb.SQL_INSERT_OFFER)
+
+# ------------ pula asyncpg (per pętla zdarzeń) ------------
+_apool = None
+_apool_loop: Optional[asyncio.AbstractEventLoop] = None
+_apool_lock: Optional[asyncio.Lock] = None
+
+
+def _use_asyncpg() -> bool:
+    return asyncpg is not None and kb.DSN.startswith(("postgresql://", "postgres://"))
+
+
+async def _init_conn(conn) -> None:
+    # JSON/JSONB <-> dict, tak jak psycopg2.extras.Json po stronie synchronicznej
+    for typ in ("json", "jsonb"):
+        await conn.set_type_codec(typ, encoder=codec.dumps, decoder=codec.loads, schema="pg_catalog")
+
+
+async def get_apool():
+    """Zwróć pulę asyncpg dla bieżącej pętli (tworzoną leniwie)."""
+    global _apool, _apool_loop, _apool_lock
+    loop = asyncio.get_running_loop()
+    if _apool is not None and _apool_loop is loop:
+        return _apool
+    if _apool_lock is None or _apool_loop is not loop:
+        _apool_lock = asyncio.Lock()
+        _apool_loop = loop
+        _apool = None
+    async with _apool_lock:
+        if _apool is None:
+            _apool = await asyncpg.create_pool(
+                kb.DSN,
+                min_size=kb.POOL_MIN,
+                max_size=kb.POOL_MAX,
+                init=_init_conn,
+            )
+        return _apool
+
+
+async def aclose_pool() -> None:
+    global _apool
+    pool, _apool = _apool, None
+    if pool is not None:
+        await pool.close()
+
+
+class _acquire:
+    """async with _acquire() as conn — pobranie połączenia z pomiarem czasu czekania."""
+
+    async def __aenter__(self):
+        pool = await get_apool()
+        t0 = time.perf_counter()
+        self._pool = pool
+        self._conn = await pool.acquire(timeout=kb.POOL_TIMEOUT_S)
+        inc("kb_apool_checkouts_total", 1)
+        inc("kb_apool_wait_us_total", int((time.perf_counter() - t0) * 1_000_000))
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        await self._pool.release(self._conn)
+        return False
+
+
+# ------------ fallback: ograniczona pula wątków nad kb ------------
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, kb.POOL_MAX), thread_name_prefix="kb")
+    return _executor
+
+
+async def _offload(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args))
+
+
+# ------------ API ------------
+async def aflush() -> int:
+    """Asynchroniczny kb.flush() — zapis bufora write-behind poza pętlą zdarzeń."""
+    if kb._wb is None or not len(kb._wb):
+        return 0
+    return await _offload(kb.flush)
+
+
+@tracing.traced("kb.aput_fact")
+@timer(kb.KB_CALL_SECONDS.labels(op="aput_fact"))
+async def aput_fact(conversation_id: str, slot: str, value: dict) -> None:
+    wb = kb._write_buffer()
+    if wb is not None:
+        row = kb._fact_row(conversation_id, slot, value)
+        if not wb.try_add(row):
+            # bufor pełny: czekamy na miejsce w wątku, pętla zdarzeń działa dalej
+            await _offload(wb.add, row)
+        kb._cache_after_put(conversation_id, slot, value)
+        return
+    if not _use_asyncpg():
+        return await _offload(kb.put_fact, conversation_id, slot, value)
+    sql = _SQL_PUT_FACT_PROJECTED if kb.is_projected(slot) else _SQL_INSERT_FACT
+    async with _acquire() as conn:
+        await conn.execute(sql, conversation_id, slot, value)
+    kb._cache_after_put(conversation_id, slot, value)
+
+
+@tracing.traced("kb.aget_fact")
+@timer(kb.KB_CALL_SECONDS.labels(op="aget_fact"))
+async def aget_fact(conversation_id: str, slot: str) -> Optional[dict]:
+    hit, value = kb._cache_get(conversation_id, slot)
+    if hit:
+        return value  # trafienie w cache: bez wątku i bez bazy
+    if not _use_asyncpg():
+        return await _offload(kb.get_fact, conversation_id, slot)
+    await aflush()
+    sql = _SQL_CURRENT_FACT if kb.is_projected(slot) else _SQL_LATEST_FACT
+    async with _acquire() as conn:
+        row = await conn.fetchrow(sql, conversation_id, slot)
+    value = dict(row["value"]) if row else None
+    kb._cache_store(conversation_id, slot, value)
+    return value
+
+
+@tracing.traced("kb.aget_facts_many")
+@timer(kb.KB_CALL_SECONDS.labels(op="aget_facts_many"))
+async def aget_facts_many(conversation_ids, slots=None) -> Dict[str, Dict[str, Any]]:
+    cids = list(dict.fromkeys(conversation_ids))
+    out: Dict[str, Dict[str, Any]] = {cid: {} for cid in cids}
+    if not cids:
+        return out
+    if slots is None:
+        if not _use_asyncpg():
+            return await _offload(kb.get_facts_many, cids, None)
+        await aflush()
+        async with _acquire() as conn:
+            rows = await conn.fetch(_SQL_CURRENT_FACTS_ALL, cids)
+        for cid, slot, value in rows:
+            out[cid][slot] = dict(value)
+            kb._cache_store(cid, slot, out[cid][slot])
+        return out
+    misses = kb._collect_cached(out, cids, list(dict.fromkeys(slots)))
+    queries = kb._facts_queries(misses)
+    if not queries:
+        return out  # wszystko z cache
+    if not _use_asyncpg():
+        return await _offload(kb.get_facts_many, cids, slots)
+    await aflush()
+    rows = []
+    async with _acquire() as conn:
+        for sql, params in queries:
+            rows.extend(await conn.fetch(_SQL_MANY[sql], *params))
+    kb._store_fetched(out, misses, rows)
+    return out
+
+
+async def aget_facts(conversation_id: str, slots=None) -> Dict[str, Any]:
+    return (await aget_facts_many([conversation_id], slots))[conversation_id]
+
+
+@tracing.traced("kb.alist_facts")
+@timer(kb.KB_CALL_SECONDS.labels(op="alist_facts"))
+async def alist_facts(conversation_id: str) -> List[Dict[str, Any]]:
+    if not _use_asyncpg():
+        return await _offload(kb.list_facts, conversation_id)
+    await aflush()
+    async with _acquire() as conn:
+        return [dict(r) for r in await conn.fetch(_SQL_LIST_FACTS, conversation_id)]
+
+
+@tracing.traced("kb.aquery_offers")
+@timer(kb.KB_CALL_SECONDS.labels(op="aquery_offers"))
+async def aquery_offers(conversation_id: str) -> List[Dict[str, Any]]:
+    if not _use_asyncpg():
+        return await _offload(kb.query_offers, conversation_id)
+    async with _acquire() as conn:
+        rows = await conn.fetch(_SQL_QUERY_OFFERS, conversation_id)
+    return [{"provider": r["provider"], "offer": dict(r["offer"]), "score": r["score"]} for r in rows]
+
+
+@tracing.traced("kb.aadd_offer")
+@timer(kb.KB_CALL_SECONDS.labels(op="aadd_offer"))
+async def aadd_offer(conversation_id: str, provider: str, offer: dict, score: float | None = None) -> None:
+    if not _use_asyncpg():
+        return await _offload(kb.add_offer, conversation_id, provider, offer, score)
+    async with _acquire() as conn:
+        await conn.execute(_SQL_INSERT_OFFER, conversation_id, provider, offer, score)
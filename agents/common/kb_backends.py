@@ -0,0 +1,429 @@
+# agents/common/kb_backends.py
+"""
+Backendy bazy wiedzy bez zewnętrznego serwera (wybór w agents.common.kb po schemacie MAS_DB_DSN):
+
+    sqlite:///kb.db            plik względny (SQLite, tryb WAL)
+    sqlite:////var/lib/kb.db   ścieżka absolutna
+    sqlite://  /  sqlite:///:memory:
+    memory://                  słowniki w pamięci procesu (testy, benchmarki)
+
+Interfejs (KBBackend) jest wspólny z PostgresBackend z agents.common.kb.
+Wiersz faktu: (conversation_id, slot, value, created_at); value to dict serializowalny do JSON.
+Punkt metryki (tabela metric_points, agents.common.metrics_store):
+(resolution, name, labels, bucket, kind, value, samples); labels to JSON z posortowanymi kluczami.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import codec
+
+FactRow = Tuple[str, str, Any, datetime]
+PointRow = Tuple[str, str, str, int, str, float, int]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _json_copy(value: Any) -> Any:
+    """Kopia o semantyce bazy: to, co nie przejdzie przez JSON, nie zostanie zapisane."""
+    return codec.loads(codec.dumps(value))
+
+
+class KBBackend:
+    """Operacje, których agents.common.kb wymaga od magazynu faktów i ofert."""
+
+    name = "base"
+
+    def put_fact(self, conversation_id: str, slot: str, value: dict) -> None:
+        self.insert_facts([(conversation_id, slot, value, _now())])
+
+    def insert_facts(self, rows: List[FactRow]) -> None:
+        """Zapis partii: historia + projekcja najnowszej wartości, atomowo."""
+        raise NotImplementedError
+
+    def get_fact(self, conversation_id: str, slot: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def latest_facts(self, conversation_ids: List[str], slots: Optional[List[str]]) -> List[Tuple[str, str, Any]]:
+        """(conversation_id, slot, value) najnowszych wartości; slots=None -> wszystkie sloty projekcji."""
+        raise NotImplementedError
+
+    def list_facts(self, conversation_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def query_offers(self, conversation_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def add_offer(self, conversation_id: str, provider: str, offer: dict, score: float | None = None) -> None:
+        raise NotImplementedError
+
+    def add_metric_points(self, rows: List[PointRow]) -> None:
+        """Upsert przyrostów: istniejący (resolution, name, labels, bucket) dostaje sumę."""
+        raise NotImplementedError
+
+    def rollup_metric_points(self, src: str, dst: str, step_s: int, since: int) -> None:
+        """Przelicz kubełki dst (szerokość step_s) od since z punktów src; wynik zastępuje stare wartości."""
+        raise NotImplementedError
+
+    def metric_points(self, name: str, resolution: str, since: int, until: int) -> List[Tuple[str, str, int, float, int]]:
+        """(labels, kind, bucket, value, samples) dla since <= bucket < until, rosnąco po bucket."""
+        raise NotImplementedError
+
+    def delete_metric_points(self, resolution: str, before: int) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+def _offers_sorted(offers: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # ORDER BY score DESC NULLS LAST, stabilnie względem kolejności dodania
+    return sorted(offers, key=lambda o: (o["score"] is None, -(o["score"] or 0.0)))
+
+
+class MemoryBackend(KBBackend):
+    """Wszystko w słownikach procesu; dane giną przy restarcie."""
+
+    name = "memory"
+
+    def __init__(self, *, is_projected: Callable[[str], bool]):
+        self._is_projected = is_projected
+        self._history: Dict[str, List[FactRow]] = {}
+        self._current: Dict[Tuple[str, str], Tuple[Any, datetime]] = {}
+        self._offers: Dict[str, List[Dict[str, Any]]] = {}
+        self._points: Dict[Tuple[str, str, str, int], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def insert_facts(self, rows: List[FactRow]) -> None:
+        rows = [(cid, slot, _json_copy(value), ts) for cid, slot, value, ts in rows]
+        with self._lock:
+            for cid, slot, value, ts in rows:
+                self._history.setdefault(cid, []).append((cid, slot, value, ts))
+                if self._is_projected(slot):
+                    cur = self._current.get((cid, slot))
+                    if cur is None or cur[1] <= ts:
+                        self._current[(cid, slot)] = (value, ts)
+
+    def _latest(self, cid: str, slot: str):
+        if self._is_projected(slot):
+            cur = self._current.get((cid, slot))
+            return None if cur is None else cur[0]
+        for _cid, s, value, _ts in reversed(self._history.get(cid, ())):
+            if s == slot:
+                return value
+        return None
+
+    def get_fact(self, conversation_id: str, slot: str) -> Optional[dict]:
+        with self._lock:
+            value = self._latest(conversation_id, slot)
+        return None if value is None else _json_copy(value)
+
+    def latest_facts(self, conversation_ids, slots):
+        out = []
+        with self._lock:
+            if slots is None:
+                wanted = set(conversation_ids)
+                for (cid, slot), (value, _ts) in self._current.items():
+                    if cid in wanted:
+                        out.append((cid, slot, value))
+            else:
+                for cid in conversation_ids:
+                    for slot in slots:
+                        value = self._latest(cid, slot)
+                        if value is not None:
+                            out.append((cid, slot, value))
+        return [(cid, slot, _json_copy(value)) for cid, slot, value in out]
+
+    def list_facts(self, conversation_id: str):
+        with self._lock:
+            rows = list(self._history.get(conversation_id, ()))
+        rows.sort(key=lambda r: r[3])
+        return [{"slot": slot, "value": _json_copy(value), "created_at": ts} for _cid, slot, value, ts in rows]
+
+    def query_offers(self, conversation_id: str):
+        with self._lock:
+            offers = [dict(o, offer=_json_copy(o["offer"])) for o in self._offers.get(conversation_id, ())]
+        return _offers_sorted(offers)
+
+    def add_offer(self, conversation_id: str, provider: str, offer: dict, score: float | None = None) -> None:
+        item = {"provider": provider, "offer": _json_copy(offer), "score": score}
+        with self._lock:
+            self._offers.setdefault(conversation_id, []).append(item)
+
+    def add_metric_points(self, rows: List[PointRow]) -> None:
+        with self._lock:
+            for res, name, labels, bucket, kind, value, samples in rows:
+                point = self._points.setdefault((res, name, labels, bucket), [kind, 0.0, 0])
+                point[1] += value
+                point[2] += samples
+
+    def rollup_metric_points(self, src: str, dst: str, step_s: int, since: int) -> None:
+        with self._lock:
+            acc: Dict[Tuple[str, str, str, int], List[Any]] = {}
+            for (res, name, labels, bucket), (kind, value, samples) in self._points.items():
+                if res == src and bucket >= since:
+                    point = acc.setdefault((dst, name, labels, bucket // step_s * step_s), [kind, 0.0, 0])
+                    point[1] += value
+                    point[2] += samples
+            self._points.update(acc)
+
+    def metric_points(self, name: str, resolution: str, since: int, until: int):
+        with self._lock:
+            rows = [
+                (labels, kind, bucket, value, samples)
+                for (res, n, labels, bucket), (kind, value, samples) in self._points.items()
+                if res == resolution and n == name and since <= bucket < until
+            ]
+        return sorted(rows, key=lambda r: (r[2], r[0]))
+
+    def delete_metric_points(self, resolution: str, before: int) -> int:
+        with self._lock:
+            old = [k for k in self._points if k[0] == resolution and k[3] < before]
+            for k in old:
+                del self._points[k]
+        return len(old)
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS facts_conv_slot_idx ON facts (conversation_id, slot, created_at);
+CREATE TABLE IF NOT EXISTS facts_current (
+    conversation_id TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, slot)
+);
+CREATE TABLE IF NOT EXISTS offers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    offer TEXT NOT NULL,
+    score REAL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS offers_conv_idx ON offers (conversation_id);
+CREATE TABLE IF NOT EXISTS metric_points (
+    resolution TEXT NOT NULL,
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, name, labels, bucket)
+);
+CREATE INDEX IF NOT EXISTS metric_points_res_bucket_idx ON metric_points (resolution, bucket);
+"""
+
+# te same zapytania co SQL_*_METRIC_POINTS w agents.common.kb, z placeholderami SQLite
+SQLITE_ADD_METRIC_POINTS = (
+    "INSERT INTO metric_points (resolution, name, labels, bucket, kind, value, samples) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (resolution, name, labels, bucket) DO UPDATE "
+    "SET value = metric_points.value + excluded.value, samples = metric_points.samples + excluded.samples"
+)
+SQLITE_ROLLUP_METRIC_POINTS = (
+    "INSERT INTO metric_points (resolution, name, labels, bucket, kind, value, samples) "
+    "SELECT ?, name, labels, (bucket / ?) * ?, MAX(kind), SUM(value), SUM(samples) "
+    "FROM metric_points WHERE resolution = ? AND bucket >= ? "
+    "GROUP BY name, labels, (bucket / ?) * ? "
+    "ON CONFLICT (resolution, name, labels, bucket) DO UPDATE "
+    "SET value = excluded.value, samples = excluded.samples"
+)
+
+_SQLITE_UPSERT_CURRENT = (
+    "INSERT INTO facts_current (conversation_id, slot, value, updated_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (conversation_id, slot) DO UPDATE "
+    "SET value = excluded.value, updated_at = excluded.updated_at "
+    "WHERE facts_current.updated_at <= excluded.updated_at"
+)
+
+
+def _ts(dt: datetime) -> str:
+    # stała szerokość (zawsze mikrosekundy, UTC) -> porządek leksykograficzny == chronologiczny
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _in(values) -> str:
+    return ",".join("?" * len(values))
+
+
+class SQLiteBackend(KBBackend):
+    """
+    Wbudowany SQLite w trybie WAL: czytelnicy nie czekają na zapis.
+    Plik: osobne połączenie na wątek. ':memory:': jedno połączenie pod lockiem
+    (każde nowe połączenie do ':memory:' to osobna, pusta baza).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, *, is_projected: Callable[[str], bool], timeout_s: float = 5.0):
+        self.path = path or ":memory:"
+        self._is_projected = is_projected
+        self._timeout_s = timeout_s
+        self._shared = self.path == ":memory:"
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._conns: List[sqlite3.Connection] = []
+        with self._lock:
+            conn = self._conn()
+            conn.executescript(_SQLITE_SCHEMA)
+            conn.commit()
+
+    def _open(self) -> sqlite3.Connection:
+        # połączenia plikowe i tak są per wątek; False pozwala je zamknąć z dowolnego wątku w close()
+        conn = sqlite3.connect(self.path, timeout=self._timeout_s, check_same_thread=False)
+        if not self._shared:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        self._conns.append(conn)
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._shared:
+            if not self._conns:
+                self._open()
+            return self._conns[0]
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                conn = self._local.conn = self._open()
+        return conn
+
+    def _run(self, fn):
+        """Wywołaj fn(conn) w transakcji (z lockiem tylko dla współdzielonego ':memory:')."""
+        if self._shared:
+            with self._lock:
+                conn = self._conn()
+                with conn:
+                    return fn(conn)
+        conn = self._conn()
+        with conn:
+            return fn(conn)
+
+    def insert_facts(self, rows: List[FactRow]) -> None:
+        data = [(cid, slot, codec.dumps(value), _ts(ts)) for cid, slot, value, ts in rows]
+        current = [r for r in data if self._is_projected(r[1])]
+
+        def tx(conn):
+            conn.executemany(
+                "INSERT INTO facts (conversation_id, slot, value, created_at) VALUES (?, ?, ?, ?)", data
+            )
+            if current:
+                conn.executemany(_SQLITE_UPSERT_CURRENT, current)
+
+        self._run(tx)
+
+    def get_fact(self, conversation_id: str, slot: str) -> Optional[dict]:
+        if self._is_projected(slot):
+            sql = "SELECT value FROM facts_current WHERE conversation_id=? AND slot=?"
+        else:
+            sql = (
+                "SELECT value FROM facts WHERE conversation_id=? AND slot=? "
+                "ORDER BY created_at DESC, id DESC LIMIT 1"
+            )
+        row = self._run(lambda conn: conn.execute(sql, (conversation_id, slot)).fetchone())
+        return codec.loads(row[0]) if row else None
+
+    def latest_facts(self, conversation_ids, slots):
+        cids = list(conversation_ids)
+        if slots is None:
+            sql = f"SELECT conversation_id, slot, value FROM facts_current WHERE conversation_id IN ({_in(cids)})"
+            rows = self._run(lambda conn: conn.execute(sql, cids).fetchall())
+            return [(cid, slot, codec.loads(v)) for cid, slot, v in rows]
+        projected = [s for s in slots if self._is_projected(s)]
+        history = [s for s in slots if not self._is_projected(s)]
+
+        def tx(conn):
+            out = []
+            if projected:
+                out += conn.execute(
+                    "SELECT conversation_id, slot, value FROM facts_current "
+                    f"WHERE conversation_id IN ({_in(cids)}) AND slot IN ({_in(projected)})",
+                    cids + projected,
+                ).fetchall()
+            if history:
+                latest = {}
+                for cid, slot, v in conn.execute(
+                    "SELECT conversation_id, slot, value FROM facts "
+                    f"WHERE conversation_id IN ({_in(cids)}) AND slot IN ({_in(history)}) "
+                    "ORDER BY created_at, id",
+                    cids + history,
+                ):
+                    latest[(cid, slot)] = v
+                out += [(cid, slot, v) for (cid, slot), v in latest.items()]
+            return out
+
+        return [(cid, slot, codec.loads(v)) for cid, slot, v in self._run(tx)]
+
+    def list_facts(self, conversation_id: str):
+        rows = self._run(lambda conn: conn.execute(
+            "SELECT slot, value, created_at FROM facts WHERE conversation_id=? ORDER BY created_at, id",
+            (conversation_id,),
+        ).fetchall())
+        return [
+            {"slot": slot, "value": codec.loads(v), "created_at": datetime.fromisoformat(ts)}
+            for slot, v, ts in rows
+        ]
+
+    def query_offers(self, conversation_id: str):
+        rows = self._run(lambda conn: conn.execute(
+            "SELECT provider, offer, score FROM offers WHERE conversation_id=? "
+            "ORDER BY score IS NULL, score DESC, id",
+            (conversation_id,),
+        ).fetchall())
+        return [{"provider": p, "offer": codec.loads(o), "score": s} for p, o, s in rows]
+
+    def add_offer(self, conversation_id: str, provider: str, offer: dict, score: float | None = None) -> None:
+        args = (conversation_id, provider, codec.dumps(offer), score, _ts(_now()))
+        self._run(lambda conn: conn.execute(
+            "INSERT INTO offers (conversation_id, provider, offer, score, created_at) VALUES (?, ?, ?, ?, ?)", args
+        ))
+
+    def add_metric_points(self, rows: List[PointRow]) -> None:
+        self._run(lambda conn: conn.executemany(SQLITE_ADD_METRIC_POINTS, rows))
+
+    def rollup_metric_points(self, src: str, dst: str, step_s: int, since: int) -> None:
+        args = (dst, step_s, step_s, src, since, step_s, step_s)
+        self._run(lambda conn: conn.execute(SQLITE_ROLLUP_METRIC_POINTS, args))
+
+    def metric_points(self, name: str, resolution: str, since: int, until: int):
+        return self._run(lambda conn: conn.execute(
+            "SELECT labels, kind, bucket, value, samples FROM metric_points "
+            "WHERE resolution=? AND name=? AND bucket >= ? AND bucket < ? ORDER BY bucket, labels",
+            (resolution, name, since, until),
+        ).fetchall())
+
+    def delete_metric_points(self, resolution: str, before: int) -> int:
+        return self._run(lambda conn: conn.execute(
+            "DELETE FROM metric_points WHERE resolution=? AND bucket < ?", (resolution, before)
+        ).rowcount)
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._local = threading.local()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def sqlite_path(dsn: str) -> str:
+    """sqlite:///rel.db -> 'rel.db', sqlite:////abs.db -> '/abs.db', sqlite:// -> ':memory:'."""
+    rest = dsn.split("://", 1)[1] if "://" in dsn else ""
+    path = rest[1:] if rest.startswith("/") else rest
+    return path or ":memory:"
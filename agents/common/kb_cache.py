@@ -0,0 +1,100 @@
+# agents/common/kb_cache.py
+"""
+Cache procesu przed get_fact/get_facts: LRU + TTL, ograniczony liczbą wpisów i pamięcią.
+Klucz: (conversation_id, slot). put_fact z tego samego procesu aktualizuje wpis w miejscu;
+zapisy innych procesów go nie unieważniają (założenie jednego piszącego, stąd krótki TTL).
+Liczniki w agents.common.metrics: kb_cache_hits_total, kb_cache_misses_total,
+kb_cache_evictions_total, kb_cache_expired_total.
+"""
+from __future__ import annotations
+
+import copy
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+from .metrics import inc
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """Przybliżony rozmiar obiektu w bajtach (kontenery JSON-owe liczone rekurencyjnie)."""
+    size = sys.getsizeof(obj)
+    if _depth > 16:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            size += approx_size(v, _depth + 1)
+    return size
+
+
+class FactCache:
+    def __init__(self, *, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024, ttl_s: float = 30.0, clock=time.monotonic):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key) -> Tuple[bool, Any]:
+        """(trafienie, kopia wartości). Wartość None też jest cache'owana (slot nieustawiony)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                inc("kb_cache_misses_total", 1)
+                return False, None
+            value, expires_at, size = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self._bytes -= size
+                inc("kb_cache_expired_total", 1)
+                inc("kb_cache_misses_total", 1)
+                return False, None
+            self._data.move_to_end(key)
+        inc("kb_cache_hits_total", 1)
+        return True, copy.deepcopy(value)
+
+    def put(self, key, value) -> None:
+        value = copy.deepcopy(value)
+        size = approx_size(value)
+        if size > self.max_bytes:
+            self.invalidate(key)  # za duże, żeby trzymać — ale nie zostawiamy starej wartości
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, self._clock() + self.ttl_s, size)
+            self._bytes += size
+            self._evict_locked()
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes,
+                    "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+    def _evict_locked(self) -> None:
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            _key, (_v, _exp, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            inc("kb_cache_evictions_total", 1)
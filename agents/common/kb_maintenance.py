@@ -0,0 +1,416 @@
+# agents/common/kb_maintenance.py
+"""
+Utrzymanie tabeli facts (Postgres, po migracji 002_facts_partitioned):
+- partycje dzienne facts_pRRRRMMDD tworzone z wyprzedzeniem (wiersze dnia, które trafiły
+  już do facts_default, kopiowane partiami do nowej partycji przed krótkim ATTACH),
+- retencja per prefiks slotu (np. telemetria 7 dni, metryki 30 dni; '*' = pozostałe sloty),
+- kompakcja: z historii slotu zostaje N ostatnich wersji (facts_current trzyma najnowszą).
+
+Usuwanie idzie małymi partiami (tableoid + ctid), commit po każdej — bez długich blokad;
+--max-batches pozwala rozłożyć pracę na kilka uruchomień (np. z crona).
+
+    python -m agents.common.kb_maintenance                      # wszystko wg env
+    python -m agents.common.kb_maintenance --partitions --ahead 14
+    python -m agents.common.kb_maintenance --retention "event_=7d,metrics_=30d"
+    python -m agents.common.kb_maintenance --compact --keep 5
+
+Retencja obejmuje też telemetrię w acl_events (MAS_TELEMETRY_RETENTION, domyślnie 7d).
+
+Env: MAS_KB_RETENTION ("event_=7d,metrics_=30d"), MAS_KB_COMPACT_KEEP (0 = bez kompakcji),
+MAS_KB_PARTITION_AHEAD_DAYS (7), MAS_KB_MAINT_BATCH (5000), MAS_KB_MAINT_PAUSE (0.05 s).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from . import kb
+
+RETENTION = os.getenv("MAS_KB_RETENTION", "event_=7d,metrics_=30d")
+EVENTS_RETENTION = os.getenv("MAS_TELEMETRY_RETENTION", "7d")
+COMPACT_KEEP = int(os.getenv("MAS_KB_COMPACT_KEEP", "0"))
+PARTITION_AHEAD_DAYS = int(os.getenv("MAS_KB_PARTITION_AHEAD_DAYS", "7"))
+BATCH = int(os.getenv("MAS_KB_MAINT_BATCH", "5000"))
+PAUSE_S = float(os.getenv("MAS_KB_MAINT_PAUSE", "0.05"))
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+_PARTITION_RE = re.compile(r"^facts_p(\d{8})$")
+DEFAULT_PARTITION = "facts_default"
+
+SQL_IS_PARTITIONED = "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'facts'::regclass"
+SQL_PARTITIONS = (
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = 'facts'::regclass"
+)
+SQL_DEFAULT_HAS_ROWS = (
+    f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s LIMIT 1"
+)
+# przenoszenie wierszy dnia z facts_default do tabeli przyszłej partycji (_partition_from_default)
+SQL_COPY_FROM_DEFAULT = (
+    "WITH copied AS ("
+    f"INSERT INTO {{name}} SELECT * FROM {DEFAULT_PARTITION} "
+    "WHERE created_at >= %s AND created_at < %s AND id > %s ORDER BY id LIMIT %s RETURNING id"
+    ") SELECT count(*), max(id) FROM copied"
+)
+SQL_COPY_REST_FROM_DEFAULT = (
+    f"INSERT INTO {{name}} SELECT d.* FROM {DEFAULT_PARTITION} d "
+    "WHERE d.created_at >= %s AND d.created_at < %s "
+    "AND NOT EXISTS (SELECT 1 FROM {name} p WHERE p.id = d.id)"
+)
+# najpierw adresy partii (tableoid, ctid), potem DELETE po nich: krótka transakcja
+SQL_DELETE_EXPIRED = (
+    "DELETE FROM facts f USING ("
+    "SELECT tableoid, ctid FROM facts WHERE created_at < %s AND {where} LIMIT %s"
+    ") d WHERE f.tableoid = d.tableoid AND f.ctid = d.ctid"
+)
+SQL_DELETE_EVENTS = (
+    "DELETE FROM acl_events WHERE id IN ("
+    "SELECT id FROM acl_events WHERE ts < %s ORDER BY ts LIMIT %s)"
+)
+SQL_NEXT_CONVERSATIONS = (
+    "SELECT conversation_id FROM facts_current WHERE conversation_id > %s "
+    "GROUP BY conversation_id ORDER BY conversation_id LIMIT %s"
+)
+SQL_COMPACT = (
+    "DELETE FROM facts f USING ("
+    "SELECT tableoid, ctid FROM ("
+    "SELECT tableoid, ctid, row_number() OVER ("
+    "PARTITION BY conversation_id, slot ORDER BY created_at DESC, id DESC) AS rn "
+    "FROM facts WHERE conversation_id = ANY(%s) AND {where}"
+    ") r WHERE rn > %s"
+    ") d WHERE f.tableoid = d.tableoid AND f.ctid = d.ctid"
+)
+
+
+def parse_period(text: str) -> timedelta:
+    """'7d' -> timedelta(days=7); jednostki s/m/h/d/w."""
+    m = re.fullmatch(r"(\d+)([smhdw])", (text or "").strip())
+    if not m:
+        raise ValueError(f"bad period: {text!r} (expected <n>[smhdw])")
+    return timedelta(seconds=int(m.group(1)) * _UNITS[m.group(2)])
+
+
+def parse_retention(spec: str) -> List[Tuple[str, timedelta]]:
+    """'event_=7d,metrics_=30d,*=365d' -> [(prefiks, okres)]."""
+    rules = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        prefix, sep, period = part.partition("=")
+        if not sep or not prefix.strip():
+            raise ValueError(f"bad retention rule: {part!r} (expected PREFIX=<n>[smhdw])")
+        rules.append((prefix.strip(), parse_period(period)))
+    return rules
+
+
+def _like(prefix: str) -> str:
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _slot_filter(prefix: str, others: List[str]) -> Tuple[str, list]:
+    """Warunek SQL na sloty reguły; '*' = sloty nieobjęte pozostałymi prefiksami."""
+    if prefix != "*":
+        return "slot LIKE %s", [_like(prefix)]
+    if not others:
+        return "TRUE", []
+    return " AND ".join(["slot NOT LIKE %s"] * len(others)), [_like(p) for p in others]
+
+
+def partition_name(day: date) -> str:
+    return f"facts_p{day:%Y%m%d}"
+
+
+def _is_partitioned(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute(SQL_IS_PARTITIONED)
+        found = cur.fetchone() is not None
+    conn.commit()
+    return found
+
+
+def _partition_names(conn) -> List[str]:
+    with conn.cursor() as cur:
+        cur.execute(SQL_PARTITIONS)
+        names = [r[0] for r in cur.fetchall()]
+    conn.commit()
+    return names
+
+
+def _daily_partitions(conn, names: Optional[List[str]] = None) -> Dict[str, date]:
+    if names is None:
+        names = _partition_names(conn)
+    out = {}
+    for name in names:
+        m = _PARTITION_RE.match(name)
+        if m:
+            out[name] = datetime.strptime(m.group(1), "%Y%m%d").date()
+    return out
+
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def ensure_partitions(
+    conn,
+    *,
+    ahead_days: int = PARTITION_AHEAD_DAYS,
+    today: Optional[date] = None,
+    batch: int = BATCH,
+    pause_s: float = PAUSE_S,
+    log=print,
+) -> List[str]:
+    """Utwórz brakujące partycje dzienne na [dziś, dziś + ahead_days]. Zwraca nazwy utworzonych."""
+    if not _is_partitioned(conn):
+        log("[kb_maintenance] facts is not partitioned (run kb_migrate), skipping partitions")
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    names = _partition_names(conn)
+    existing = _daily_partitions(conn, names)
+    has_default = DEFAULT_PARTITION in names
+    created = []
+    for i in range(ahead_days + 1):
+        day = today + timedelta(days=i)
+        name = partition_name(day)
+        if name in existing:
+            continue
+        bounds = (_utc_midnight(day), _utc_midnight(day + timedelta(days=1)))
+        try:
+            move = False
+            if has_default:
+                with conn.cursor() as cur:
+                    cur.execute(SQL_DEFAULT_HAS_ROWS, bounds)
+                    move = cur.fetchone() is not None
+                conn.commit()
+            if move:
+                # z wierszami tego dnia w facts_default CREATE PARTITION się nie uda
+                n = _partition_from_default(conn, name, bounds, batch=batch, pause_s=pause_s)
+                log(f"[kb_maintenance] moved {n} rows of {day} from {DEFAULT_PARTITION} to {name}")
+            else:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF facts FOR VALUES FROM (%s) TO (%s)",
+                        bounds,
+                    )
+                conn.commit()
+            created.append(name)
+        except Exception as e:
+            # np. zakres pokrywa się z facts_legacy
+            conn.rollback()
+            log(f"[kb_maintenance] cannot create {name}: {e}")
+    return created
+
+
+def _partition_from_default(conn, name: str, bounds: Tuple[datetime, datetime], *, batch: int, pause_s: float) -> int:
+    """
+    Partycja dnia z wierszy, które już leżą w facts_default, bez blokady całej facts:
+    1) osobna tabela {name} z CHECK na zakres i indeksami partycji (pusta — tanio),
+    2) kopiowanie partiami (commit po każdej); wiersze zostają w DEFAULT, odczyty ich nie gubią,
+    3) krótka transakcja: blokada zapisu do facts_default (odczyty idą), dograne wiersze
+       dopisane od kroku 2, DELETE z DEFAULT, ATTACH (CHECK zwalnia z przeglądu {name}).
+    Zwraca liczbę przeniesionych wierszy.
+    """
+    lo, hi = bounds
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {name} (LIKE facts INCLUDING DEFAULTS)")
+        cur.execute(
+            f"ALTER TABLE {name} ADD CONSTRAINT {name}_range CHECK (created_at >= %s AND created_at < %s)",
+            bounds,
+        )
+        # odpowiedniki facts_p_conv_created_idx / facts_p_conv_slot_created_idx: ATTACH je podepnie
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name}_conv_created_idx ON {name} (conversation_id, created_at)")
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {name}_conv_slot_created_idx ON {name} (conversation_id, slot, created_at)"
+        )
+    conn.commit()
+
+    moved, last_id = 0, 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(SQL_COPY_FROM_DEFAULT.format(name=name), (lo, hi, last_id, batch))
+            n, max_id = cur.fetchone()
+        conn.commit()
+        moved += n or 0
+        if not n or n < batch:
+            break
+        last_id = max_id
+        if pause_s:
+            time.sleep(pause_s)
+
+    with conn.cursor() as cur:
+        cur.execute(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE")
+        cur.execute(SQL_COPY_REST_FROM_DEFAULT.format(name=name), (lo, hi))
+        moved += max(cur.rowcount, 0)
+        cur.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s", bounds)
+        cur.execute(f"ALTER TABLE facts ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+        cur.execute(f"ALTER TABLE {name} DROP CONSTRAINT {name}_range")
+    conn.commit()
+    return moved
+
+
+def drop_partitions_before(conn, cutoff: datetime, *, log=print) -> List[str]:
+    """Odłącz i usuń partycje dzienne, których cały zakres jest starszy niż cutoff."""
+    dropped = []
+    for name, day in sorted(_daily_partitions(conn).items(), key=lambda kv: kv[1]):
+        if _utc_midnight(day + timedelta(days=1)) > cutoff:
+            continue
+        with conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE facts DETACH PARTITION {name}")
+            cur.execute(f"DROP TABLE {name}")
+        conn.commit()
+        log(f"[kb_maintenance] dropped partition {name}")
+        dropped.append(name)
+    return dropped
+
+
+def _delete_in_batches(conn, sql: str, params: list, *, batch: int, pause_s: float, max_batches: Optional[int]) -> int:
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            n = cur.rowcount
+        conn.commit()
+        total += n
+        batches += 1
+        if n < batch:
+            break
+        if pause_s:
+            time.sleep(pause_s)  # oddaj I/O i blokady ruchowi produkcyjnemu
+    return total
+
+
+def apply_retention(
+    conn,
+    rules: List[Tuple[str, timedelta]],
+    *,
+    now: Optional[datetime] = None,
+    batch: int = BATCH,
+    pause_s: float = PAUSE_S,
+    max_batches: Optional[int] = None,
+    log=print,
+) -> Dict[str, int]:
+    """Usuń fakty starsze niż okres retencji ich prefiksu. Zwraca {prefiks: usunięte wiersze}."""
+    now = now or datetime.now(timezone.utc)
+    prefixes = [p for p, _ in rules if p != "*"]
+    result = {}
+    for prefix, period in rules:
+        cutoff = now - period
+        if prefix == "*" and _is_partitioned(conn):
+            # całe dni starsze niż najdłuższa retencja: DROP partycji zamiast DELETE
+            longest = max(p for _, p in rules)
+            drop_partitions_before(conn, now - longest, log=log)
+        where, args = _slot_filter(prefix, prefixes)
+        sql = SQL_DELETE_EXPIRED.format(where=where)
+        n = _delete_in_batches(
+            conn, sql, [cutoff, *args, batch],
+            batch=batch, pause_s=pause_s, max_batches=max_batches,
+        )
+        result[prefix] = n
+        log(f"[kb_maintenance] retention {prefix}: deleted {n} rows older than {cutoff:%Y-%m-%d %H:%M}")
+    return result
+
+
+def apply_events_retention(
+    conn,
+    period: timedelta,
+    *,
+    now: Optional[datetime] = None,
+    batch: int = BATCH,
+    pause_s: float = PAUSE_S,
+    max_batches: Optional[int] = None,
+    log=print,
+) -> int:
+    """Usuń zdarzenia telemetrii (acl_events) starsze niż period."""
+    cutoff = (now or datetime.now(timezone.utc)) - period
+    n = _delete_in_batches(conn, SQL_DELETE_EVENTS, [cutoff, batch],
+                           batch=batch, pause_s=pause_s, max_batches=max_batches)
+    log(f"[kb_maintenance] retention acl_events: deleted {n} rows older than {cutoff:%Y-%m-%d %H:%M}")
+    return n
+
+
+def compact(
+    conn,
+    keep: int,
+    *,
+    conversations_per_batch: int = 100,
+    pause_s: float = PAUSE_S,
+    max_batches: Optional[int] = None,
+    log=print,
+) -> int:
+    """
+    Zostaw `keep` ostatnich wersji każdego projektowanego slotu (telemetria ma unikalne
+    nazwy slotów, więc jej nie dotyczy). Sesje przechodzimy stronicowaniem po facts_current.
+    """
+    if keep < 1:
+        raise ValueError("keep must be >= 1")
+    skip = list(kb.PROJECTION_SKIP_PREFIXES)
+    where = " AND ".join(["slot NOT LIKE %s"] * len(skip)) or "TRUE"
+    sql = SQL_COMPACT.format(where=where)
+    total = 0
+    batches = 0
+    last = ""
+    while max_batches is None or batches < max_batches:
+        with conn.cursor() as cur:
+            cur.execute(SQL_NEXT_CONVERSATIONS, (last, conversations_per_batch))
+            cids = [r[0] for r in cur.fetchall()]
+        if not cids:
+            conn.commit()
+            break
+        with conn.cursor() as cur:
+            cur.execute(sql, [cids, *[_like(p) for p in skip], keep])
+            total += cur.rowcount
+        conn.commit()
+        batches += 1
+        last = cids[-1]
+        if len(cids) < conversations_per_batch:
+            break
+        if pause_s:
+            time.sleep(pause_s)
+    log(f"[kb_maintenance] compaction keep={keep}: deleted {total} superseded rows")
+    return total
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="KB facts maintenance: partitions, retention, compaction.")
+    ap.add_argument("--partitions", action="store_true", help="utwórz brakujące partycje dzienne")
+    ap.add_argument("--retention", nargs="?", const=RETENTION, default=None, metavar="SPEC",
+                    help='reguły "prefiks=7d,..." (domyślnie MAS_KB_RETENTION)')
+    ap.add_argument("--compact", action="store_true", help="usuń stare wersje slotów")
+    ap.add_argument("--keep", type=int, default=COMPACT_KEEP, help="ile wersji slotu zostawić")
+    ap.add_argument("--ahead", type=int, default=PARTITION_AHEAD_DAYS, help="dni partycji do przodu")
+    ap.add_argument("--batch", type=int, default=BATCH, help="wierszy na partię DELETE / kopiowania")
+    ap.add_argument("--pause", type=float, default=PAUSE_S, help="przerwa między partiami [s]")
+    ap.add_argument("--max-batches", type=int, default=None, help="limit partii na krok (praca przyrostowa)")
+    args = ap.parse_args(argv)
+    if args.compact and args.keep < 1:
+        ap.error("--compact needs --keep >= 1 (or MAS_KB_COMPACT_KEEP)")
+
+    if not isinstance(kb.get_backend(), kb.PostgresBackend):
+        print("[kb_maintenance] only the Postgres backend needs maintenance")
+        return 2
+    run_all = not (args.partitions or args.retention is not None or args.compact)
+    with kb.get_conn() as conn:
+        if args.partitions or run_all:
+            ensure_partitions(conn, ahead_days=args.ahead, batch=args.batch, pause_s=args.pause)
+        if args.retention is not None or run_all:
+            apply_retention(conn, parse_retention(args.retention or RETENTION),
+                            batch=args.batch, pause_s=args.pause, max_batches=args.max_batches)
+            try:
+                apply_events_retention(conn, parse_period(EVENTS_RETENTION),
+                                       batch=args.batch, pause_s=args.pause, max_batches=args.max_batches)
+            except Exception as e:  # brak tabeli przed migracją 003
+                conn.rollback()
+                print(f"[kb_maintenance] acl_events retention skipped: {e}")
+        if args.compact or (run_all and args.keep > 0):
+            compact(conn, args.keep, pause_s=args.pause, max_batches=args.max_batches)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+# agents/common/kb_migrate.py
+"""
+Migracje schematu KB (pliki agents/common/migrations/NNN_nazwa.sql, w kolejności nazw).
+Zastosowane wersje trzymamy w tabeli schema_migrations; każdy plik idzie w osobnej transakcji.
+Plik zaczynający się od "-- kb_migrate: no-transaction" (np. CREATE INDEX CONCURRENTLY) idzie
+w autocommit, instrukcja po instrukcji (podział po ';' na końcu linii, bez bloków DO).
+
+    python -m agents.common.kb_migrate            # zastosuj brakujące
+    python -m agents.common.kb_migrate --list     # pokaż stan
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List, Tuple
+
+from . import kb
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+NO_TRANSACTION = "-- kb_migrate: no-transaction"
+
+_SQL_TRACKING = (
+    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+    "version TEXT PRIMARY KEY, applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+)
+
+
+def available() -> List[Tuple[str, Path]]:
+    """Lista (wersja, ścieżka) posortowana po nazwie pliku."""
+    return [(p.stem, p) for p in sorted(MIGRATIONS_DIR.glob("*.sql"))]
+
+
+def statements(sql: str) -> List[str]:
+    """
+    Instrukcje pliku bez transakcji: linie komentarzy pomijamy, koniec instrukcji = ';' na końcu
+    linii poza ciałem $$ ... $$ (blok DO jest jedną instrukcją).
+    """
+    out: List[str] = []
+    buf: List[str] = []
+    in_body = False
+    for line in sql.splitlines():
+        if not line.strip() or line.lstrip().startswith("--"):
+            continue
+        buf.append(line)
+        if line.count("$$") % 2:
+            in_body = not in_body
+        if not in_body and line.rstrip().endswith(";"):
+            out.append("\n".join(buf))
+            buf = []
+    if buf:
+        out.append("\n".join(buf))
+    return out
+
+
+def applied(conn) -> set[str]:
+    with conn.cursor() as cur:
+        cur.execute(_SQL_TRACKING)
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {r[0] for r in cur.fetchall()}
+    conn.commit()
+    return done
+
+
+def migrate(*, dry_run: bool = False, log=print) -> List[str]:
+    """Zastosuj brakujące migracje; zwraca listę zastosowanych wersji."""
+    done: List[str] = []
+    with kb.get_conn() as conn:
+        already = applied(conn)
+        for version, path in available():
+            if version in already:
+                continue
+            if dry_run:
+                log(f"[kb_migrate] pending {version}")
+                done.append(version)
+                continue
+            log(f"[kb_migrate] applying {version} ...")
+            sql = path.read_text(encoding="utf-8")
+            if sql.startswith(NO_TRANSACTION):
+                _apply_autocommit(conn, version, sql)
+                done.append(version)
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            done.append(version)
+    return done
+
+
+def _apply_autocommit(conn, version: str, sql: str) -> None:
+    """Migracja poza transakcją; instrukcje mają być idempotentne (IF NOT EXISTS), bo błąd w środku nic nie cofa."""
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for stmt in statements(sql):
+                cur.execute(stmt)
+            cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+    finally:
+        conn.autocommit = False
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Apply KB schema migrations.")
+    ap.add_argument("--list", action="store_true", help="tylko pokaż, co zostało do zastosowania")
+    args = ap.parse_args(argv)
+
+    versions = migrate(dry_run=args.list)
+    if not versions:
+        print("[kb_migrate] up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
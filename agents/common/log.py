@@ -0,0 +1,280 @@
+# agents/common/log.py
+"""
+Strukturalne logi agentów poza pętlą zdarzeń.
+
+    log = get_logger("agent.CoordinatorAgent")
+    log.info("kb_saved", conv=conv_id, slot=slot)        # pola, nie f-string
+    if log.enabled(logging.DEBUG): ...                    # drogie pola tylko gdy poziom włączony
+
+- poziom sprawdzany przed zbudowaniem rekordu: wyłączony poziom = brak formatowania,
+- rekord trafia do ograniczonej kolejki (QueueHandler); formatowanie i zapis na stdout / do pliku
+  robi wątek QueueListener — pętla zdarzeń nie czeka na I/O; przy pełnej kolejce rekord
+  wypada i liczy się w log_dropped_total,
+- format: MAS_LOG_FORMAT=json (JSON lines: ts, level, logger, event + pola) albo text,
+- poziomy: MAS_LOG_LEVEL (domyślny) i MAS_LOG_LEVELS="CoordinatorAgent=DEBUG,wire=WARNING"
+  (nazwa loggera bez prefiksu "mas.", jej prefiks albo ostatni człon, czyli nazwa klasy agenta),
+- linie WIRE (wire_allowed): próbkowanie MAS_LOG_WIRE_SAMPLE (0..1) i limit
+  MAS_LOG_WIRE_RATE linii/s per agent (token bucket); odrzucone -> log_wire_suppressed_total.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from . import codec
+from .metrics import counter
+
+ROOT = "mas"
+LOG_LEVEL = os.getenv("MAS_LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("MAS_LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("MAS_LOG_FORMAT", "json")
+LOG_FILE = os.getenv("MAS_LOG_FILE", "")
+LOG_QUEUE_SIZE = int(os.getenv("MAS_LOG_QUEUE", "10000"))
+WIRE_SAMPLE = float(os.getenv("MAS_LOG_WIRE_SAMPLE", "1"))
+WIRE_RATE = float(os.getenv("MAS_LOG_WIRE_RATE", "50"))  # linii/s per agent; 0 = bez limitu
+
+LOG_DROPPED = counter("log_dropped_total", help="Rekordy logu odrzucone przy pełnej kolejce.")
+LOG_WIRE_SUPPRESSED = counter(
+    "log_wire_suppressed_total", ("agent", "reason"),
+    help="Linie WIRE pominięte przez próbkowanie (sample) albo limit (rate).",
+)
+
+_RESERVED = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+
+def _level_value(level: Any, default: int) -> int:
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    return value if isinstance(value, int) else default
+
+
+def parse_levels(spec: Optional[str]) -> Dict[str, int]:
+    """"CoordinatorAgent=DEBUG,wire=warning" -> {"CoordinatorAgent": 10, "wire": 30}; błędne wpisy pomijane."""
+    levels: Dict[str, int] = {}
+    for part in (spec or "").split(","):
+        name, sep, level = part.strip().partition("=")
+        value = _level_value(level, -1) if sep else -1
+        if name and value >= 0:
+            levels[name] = value
+    return levels
+
+
+# ------------ formatowanie (w wątku zapisu) ------------
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            line["exc"] = self.formatException(record.exc_info)
+        try:
+            return codec.dumps(line)
+        except Exception:
+            return codec.dumps({k: v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+                                for k, v in line.items()})
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        extra = " ".join(f"{k}={v}" for k, v in _fields(record).items())
+        head = f"[{record.name.rsplit('.', 1)[-1]}] {record.getMessage()}"
+        return f"{head} {extra}" if extra else head
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """stdout odczytywany przy zapisie (podmiana sys.stdout, np. przez pytest, nie gubi logów)."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+# ------------ kolejka bez blokowania ------------
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record  # formatowanie dopiero w wątku zapisu
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            try:
+                LOG_DROPPED.inc()
+            except Exception:
+                pass
+
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_levels: Dict[str, int] = {}
+_loggers: Dict[str, "StructLogger"] = {}
+
+
+def configure(
+    *,
+    level: str = LOG_LEVEL,
+    levels: Optional[str] = LOG_LEVELS,
+    fmt: str = LOG_FORMAT,
+    stream: Any = None,
+    path: str = LOG_FILE,
+    queue_size: int = LOG_QUEUE_SIZE,
+) -> logging.Logger:
+    """(Ponowna) konfiguracja loggera "mas": kolejka + wątek zapisu. Woła ją get_logger przy pierwszym użyciu."""
+    global _listener
+    with _lock:
+        root = logging.getLogger(ROOT)
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for h in list(root.handlers):
+            root.removeHandler(h)
+
+        if path:
+            sink: logging.Handler = logging.FileHandler(path, encoding="utf-8")
+        else:
+            sink = logging.StreamHandler(stream) if stream is not None else _StdoutHandler()
+        sink.setFormatter(JsonLinesFormatter() if fmt == "json" else TextFormatter())
+        q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=max(1, queue_size))
+        root.addHandler(_QueueHandler(q))
+        root.propagate = False
+        root.setLevel(_level_value(level, logging.INFO))
+
+        _levels.clear()
+        _levels.update(parse_levels(levels))
+        for lg in _loggers.values():
+            lg.reset_level()
+
+        _listener = logging.handlers.QueueListener(q, sink)
+        _listener.start()
+        return root
+
+
+def flush() -> None:
+    """Zapisz wszystko z kolejki (stop opróżnia ją i czeka na wątek), potem wznów zapis."""
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+@atexit.register
+def _shutdown() -> None:
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+
+
+def set_level(name: str, level: Any) -> None:
+    """Poziom jednego loggera w locie (np. set_level("agent.CoordinatorAgent", "DEBUG"))."""
+    get_logger(name)._logger.setLevel(_level_value(level, logging.INFO))
+
+
+# ------------ API ------------
+class StructLogger:
+    __slots__ = ("name", "_logger")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._logger = logging.getLogger(f"{ROOT}.{name}")
+        self.reset_level()
+
+    def reset_level(self) -> None:
+        """Poziom z MAS_LOG_LEVELS: pełna nazwa, jej prefiks ("wire") albo ostatni człon (klasa agenta)."""
+        parts = self.name.split(".")
+        for key in [".".join(parts[:i]) for i in range(len(parts), 0, -1)] + [parts[-1]]:
+            if key in _levels:
+                self._logger.setLevel(_levels[key])
+                return
+        self._logger.setLevel(logging.NOTSET)  # dziedziczony z "mas"
+
+    def enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def log(self, level: int, event: str, **fields: Any) -> None:
+        if self._logger.isEnabledFor(level):
+            if not _RESERVED.isdisjoint(fields):  # np. thread, name -> thread_, name_ (LogRecord ich nie nadpisze)
+                fields = {f"{k}_" if k in _RESERVED else k: v for k, v in fields.items()}
+            self._logger.log(level, event, extra=fields or None)
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self.log(logging.ERROR, event, **fields)
+
+
+def get_logger(name: str) -> StructLogger:
+    lg = _loggers.get(name)
+    if lg is None:
+        if _listener is None:
+            configure()
+        lg = _loggers[name] = StructLogger(name)
+    return lg
+
+
+class _WireGate:
+    """Próbkowanie + token bucket per agent dla linii WIRE."""
+
+    def __init__(self, sample: float = WIRE_SAMPLE, rate: float = WIRE_RATE, *, clock=time.monotonic):
+        self.sample = min(1.0, max(0.0, sample))
+        self.rate = max(0.0, rate)
+        self._clock = clock
+        self._buckets: Dict[str, list] = {}  # agent -> [tokeny, ostatnie uzupełnienie]
+
+    def allow(self, agent: str) -> bool:
+        if self.sample < 1.0 and random.random() >= self.sample:
+            self._suppressed(agent, "sample")
+            return False
+        if self.rate <= 0:
+            return True
+        now = self._clock()
+        bucket = self._buckets.get(agent)
+        if bucket is None:
+            bucket = self._buckets[agent] = [self.rate, now]
+        bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            self._suppressed(agent, "rate")
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    @staticmethod
+    def _suppressed(agent: str, reason: str) -> None:
+        try:
+            LOG_WIRE_SUPPRESSED.labels(agent, reason).inc()
+        except Exception:
+            pass
+
+
+WIRE_GATE = _WireGate()
+
+
+def wire_allowed(agent: str) -> bool:
+    return WIRE_GATE.allow(agent)
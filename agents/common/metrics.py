@@ -1,31 +1,447 @@
 # agents/common/metrics.py
+"""
+Rejestr metryk procesu: rodziny typowane (counter, gauge, histogram) z etykietami.
+
+    ACL = counter("acl_messages_total", ("agent", "direction", "performative", "type"))
+    ACL.labels(agent="coordinator", direction="in", performative="INFORM", type="FACT").inc()
+    KB = histogram("kb_call_seconds", ("op",))
+    with timer(KB.labels(op="get_fact")): ...
+
+- Zapis bez locków: każda seria trzyma komórkę per wątek (pisze tylko jej właściciel,
+  odczyt sumuje), więc inc()/observe() z wątków executora KB nie gubią aktualizacji.
+- Limit kardynalności: rodzina ma najwyżej max_series serii (MAS_METRICS_MAX_SERIES);
+  kolejne kombinacje etykiet trafiają do serii "__overflow__" i podbijają
+  metrics_series_overflow_total — wartości od peerów (np. payload.type) nie rozdmuchają pamięci.
+- API płaskie (inc, observe, register_gauge, snapshot, export_to_kb) działa jak wcześniej:
+  nazwa bez etykiet = rodzina bez etykiet.
+"""
 from __future__ import annotations
-from typing import Dict, Any
-from collections import defaultdict
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+import asyncio
+import functools
+import math
+import os
+import threading
 import time
 
-from .kb import put_fact
+MAX_SERIES = int(os.getenv("MAS_METRICS_MAX_SERIES", "500"))
+OVERFLOW = "__overflow__"
+
+# Histogramy czasów: stałe kubełki w skali log2, _HIST_SUB na każdą potęgę dwójki
+# (błąd kwantyla <= 2**(1/_HIST_SUB) - 1, czyli ok. 19%), od 1 µs do ~2**27 µs (~134 s).
+_HIST_SUB = 4
+_HIST_BUCKETS = 27 * _HIST_SUB
+_HIST_QUANTILES = ((50, 0.50), (90, 0.90), (99, 0.99))
+
+
+def put_fact(conversation_id: str, slot: str, value: dict):
+    # import leniwy: kb sam raportuje tu statystyki puli, więc nie importujemy go na starcie
+    from .kb import put_fact as _put_fact
+    return _put_fact(conversation_id, slot, value)
+
+
+class _Cells:
+    """Komórki per wątek: wątek pisze tylko do swojej, odczyt sumuje wszystkie."""
+
+    __slots__ = ("_cells", "_factory", "_lock")
+
+    def __init__(self, factory: Callable[[], list]):
+        self._cells: Dict[int, list] = {}
+        self._factory = factory
+        self._lock = threading.Lock()
+
+    def mine(self) -> list:
+        cell = self._cells.get(threading.get_ident())
+        if cell is None:
+            with self._lock:  # tylko pierwszy zapis danego wątku
+                cell = self._cells.setdefault(threading.get_ident(), self._factory())
+        return cell
+
+    def all(self) -> List[list]:
+        return list(self._cells.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cells = {}
+
+
+class Counter:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells(lambda: [0])
+
+    def inc(self, n: float = 1) -> None:
+        self._cells.mine()[0] += n
+
+    @property
+    def value(self) -> float:
+        return sum(c[0] for c in self._cells.all())
+
+    def reset(self) -> None:
+        self._cells.clear()
+
+
+class Gauge:
+    """Wartość bieżąca: set()/inc()/dec() albo funkcja liczona przy odczycie (set_function)."""
+
+    __slots__ = ("_base", "_cells", "_fn")
+
+    def __init__(self):
+        self._base = 0.0
+        self._cells = _Cells(lambda: [0.0])
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, v: float) -> None:
+        self._base = float(v) - sum(c[0] for c in self._cells.all())
+
+    def inc(self, n: float = 1) -> None:
+        self._cells.mine()[0] += n
+
+    def dec(self, n: float = 1) -> None:
+        self._cells.mine()[0] -= n
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        self._fn = fn
+
+    @property
+    def value(self) -> float:
+        if self._fn is not None:
+            return float(self._fn())
+        return self._base + sum(c[0] for c in self._cells.all())
+
+    def reset(self) -> None:
+        self._base = 0.0
+        self._cells.clear()
+
+
+class Histogram:
+    """Histogram czasów [s]; komórka wątku: [kubełki, liczba, suma, max]."""
+
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells(lambda: [[0] * _HIST_BUCKETS, 0, 0.0, 0.0])
+
+    @staticmethod
+    def _bucket(seconds: float) -> int:
+        us = seconds * 1_000_000
+        if us <= 1.0:
+            return 0
+        return min(_HIST_BUCKETS - 1, int(math.log2(us) * _HIST_SUB))
+
+    def observe(self, seconds: float) -> None:
+        cell = self._cells.mine()
+        cell[0][self._bucket(seconds)] += 1
+        cell[1] += 1
+        cell[2] += seconds
+        if seconds > cell[3]:
+            cell[3] = seconds
+
+    def _merged(self) -> Tuple[List[int], int, float, float]:
+        counts = [0] * _HIST_BUCKETS
+        count, total, mx = 0, 0.0, 0.0
+        for buckets, n, s, m in self._cells.all():
+            for i, c in enumerate(buckets):
+                if c:
+                    counts[i] += c
+            count += n
+            total += s
+            mx = max(mx, m)
+        return counts, count, total, mx
+
+    @property
+    def count(self) -> int:
+        return sum(c[1] for c in self._cells.all())
+
+    def totals(self) -> Tuple[int, float]:
+        """(liczba obserwacji, suma [s]) bez scalania kubełków."""
+        cells = self._cells.all()
+        return sum(c[1] for c in cells), sum(c[2] for c in cells)
+
+    def percentile(self, q: float) -> float:
+        """Górna granica kubełka, w którym wypada kwantyl q (w sekundach, nie więcej niż max)."""
+        return self._percentiles((q,))[0]
+
+    def _percentiles(self, qs: Iterable[float], merged=None) -> List[float]:
+        counts, count, _total, mx = merged or self._merged()
+        out = []
+        for q in qs:
+            if not count:
+                out.append(0.0)
+                continue
+            rank = max(1, math.ceil(q * count))
+            seen = 0
+            value = mx
+            for i, n in enumerate(counts):
+                seen += n
+                if seen >= rank:
+                    value = min(2 ** ((i + 1) / _HIST_SUB) / 1_000_000, mx)
+                    break
+            out.append(value)
+        return out
+
+    def buckets(self) -> Tuple[List[Tuple[float, int]], int, float]:
+        """Kubełki skumulowane na granicach potęg dwójki: ([(górna granica [s], liczba)], count, sum)."""
+        counts, count, total, _mx = self._merged()
+        out = []
+        seen = 0
+        for octave in range(1, _HIST_BUCKETS // _HIST_SUB + 1):
+            seen += sum(counts[(octave - 1) * _HIST_SUB: octave * _HIST_SUB])
+            out.append((2 ** octave / 1_000_000, seen))
+        return out, count, total
+
+    def summary(self) -> Dict[str, float]:
+        merged = self._merged()
+        _counts, count, total, mx = merged
+        out = {"count": count, "sum_ms": round(total * 1000, 3), "max_ms": round(mx * 1000, 3)}
+        values = self._percentiles([q for _, q in _HIST_QUANTILES], merged)
+        for (label, _q), v in zip(_HIST_QUANTILES, values):
+            out[f"p{label}_ms"] = round(v * 1000, 3)
+        return out
+
+    def reset(self) -> None:
+        self._cells.clear()
+
+
+_KINDS = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+class MetricFamily:
+    """Rodzina metryk jednego typu; seria = krotka wartości etykiet (w kolejności labelnames)."""
+
+    def __init__(self, name: str, kind: str, labelnames: Tuple[str, ...] = (), *, help: str = "", max_series: int = MAX_SERIES):
+        self.name = name
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.help = help
+        self.max_series = max(1, max_series)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = _KINDS[kind]()
 
-# proste liczniki w procesie
-_COUNTERS: Dict[str, int] = defaultdict(int)
+    def labels(self, *values, **kw):
+        if kw:
+            key = tuple(str(kw.get(n, "")) for n in self.labelnames)
+        else:
+            key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._create(key)
+        return child
 
+    def _create(self, key: Tuple[str, ...]):
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+        overflow = False
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                if len(self._children) >= self.max_series:
+                    overflow = True
+                    key = (OVERFLOW,) * len(self.labelnames)
+                    child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = _KINDS[self.kind]()
+        if overflow:
+            inc("metrics_series_overflow_total", 1)
+        return child
+
+    # skróty dla rodzin bez etykiet
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name}: labelled family {self.labelnames}, use .labels(...)")
+        return self._children[()]
+
+    def inc(self, n: float = 1) -> None:
+        self._unlabelled().inc(n)
+
+    def observe(self, seconds: float) -> None:
+        self._unlabelled().observe(seconds)
+
+    def set(self, v: float) -> None:
+        self._unlabelled().set(v)
+
+    def series(self) -> List[Tuple[Dict[str, str], Any]]:
+        return [(dict(zip(self.labelnames, key)), child) for key, child in list(self._children.items())]
+
+    def reset(self) -> None:
+        # zerujemy serie zamiast je usuwać: moduły trzymają gotowe .labels(...) (np. w dekoratorach)
+        for child in list(self._children.values()):
+            child.reset()
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, kind: str, labelnames=(), **kw) -> MetricFamily:
+        fam = self._families.get(name)
+        if fam is None:
+            with self._lock:
+                fam = self._families.get(name)
+                if fam is None:
+                    fam = self._families[name] = MetricFamily(name, kind, tuple(labelnames), **kw)
+        if fam.kind != kind or fam.labelnames != tuple(labelnames):
+            raise ValueError(f"metric {name!r} already registered as {fam.kind}{fam.labelnames}")
+        return fam
+
+    def counter(self, name: str, labelnames=(), **kw) -> MetricFamily:
+        return self._family(name, "counter", labelnames, **kw)
+
+    def gauge(self, name: str, labelnames=(), **kw) -> MetricFamily:
+        return self._family(name, "gauge", labelnames, **kw)
+
+    def histogram(self, name: str, labelnames=(), **kw) -> MetricFamily:
+        return self._family(name, "histogram", labelnames, **kw)
+
+    def families(self) -> List[MetricFamily]:
+        return list(self._families.values())
+
+    def get(self, name: str) -> Optional[MetricFamily]:
+        return self._families.get(name)
+
+    def reset(self) -> None:
+        for fam in self.families():
+            fam.reset()
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def flat_key(name: str, labels: Dict[str, str]) -> str:
+    """'acl_messages_total{agent="x",type="FACT"}' — klucz dla snapshot()/export_to_kb."""
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+# ------------ API płaskie (zgodne wstecz) ------------
 def inc(key: str, n: int = 1) -> None:
-    _COUNTERS[key] += n
+    fam = REGISTRY._families.get(key)
+    if fam is None or fam.kind != "counter":
+        fam = REGISTRY.counter(key)
+    fam.inc(n)
 
 def add_many(pairs: Dict[str, int]) -> None:
     for k, v in pairs.items():
-        _COUNTERS[k] += int(v)
+        inc(k, int(v))
+
+def observe(name: str, seconds: float) -> None:
+    fam = REGISTRY._families.get(name)
+    if fam is None or fam.kind != "histogram":
+        fam = REGISTRY.histogram(name)
+    fam.observe(seconds)
+
+
+def register_gauge(name: str, fn: Callable[[], float]) -> None:
+    """Gauge liczony w chwili odczytu (np. rozmiar puli, liczba oczekujących żądań HTTP)."""
+    REGISTRY.gauge(name).labels().set_function(fn)
 
-def snapshot(reset: bool = False) -> Dict[str, int]:
-    data = dict(_COUNTERS)
+
+class timer:
+    """
+    Pomiar czasu do histogramów (jednocześnie do kilku celów: nazwa albo seria rodziny):
+        with timer(KB.labels(op="get_fact")): ...
+        @timer("latency_llm_chat")          # funkcje zwykłe i async
+    """
+
+    def __init__(self, *targets):
+        self.targets = targets
+
+    def _record(self, dt: float) -> None:
+        for t in self.targets:
+            if isinstance(t, str):
+                observe(t, dt)
+            else:
+                t.observe(dt)
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._record(time.perf_counter() - self._t0)
+        return False
+
+    def __call__(self, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self._record(time.perf_counter() - t0)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(time.perf_counter() - t0)
+        return wrapper
+
+
+def _values(kind: str) -> Dict[str, Any]:
+    out = {}
+    for fam in REGISTRY.families():
+        if fam.kind != kind:
+            continue
+        for labels, child in fam.series():
+            out[flat_key(fam.name, labels)] = child
+    return out
+
+
+def counters() -> Dict[str, float]:
+    return {k: c.value for k, c in _values("counter").items()}
+
+
+def gauges() -> Dict[str, float]:
+    out = {}
+    for k, g in _values("gauge").items():
+        try:
+            out[k] = float(g.value)
+        except Exception:
+            pass  # gauge nie może zepsuć odczytu metryk
+    return out
+
+
+def raw_histograms() -> Dict[str, Histogram]:
+    return _values("histogram")
+
+
+def histograms() -> Dict[str, Dict[str, float]]:
+    """{klucz serii: {count, sum_ms, max_ms, p50_ms, p90_ms, p99_ms}}."""
+    return {k: h.summary() for k, h in raw_histograms().items()}
+
+
+def snapshot(reset: bool = False) -> Dict[str, Any]:
+    """
+    Liczniki, gauge'e i podsumowania histogramów spłaszczone do kluczy
+    <seria>_count, <seria>_p50_ms, <seria>_p90_ms, <seria>_p99_ms, <seria>_max_ms.
+    """
+    data: Dict[str, Any] = counters()
+    data.update(gauges())
+    for name, summary in histograms().items():
+        for k in ("count", "p50_ms", "p90_ms", "p99_ms", "max_ms"):
+            data[f"{name}_{k}"] = summary[k]
     if reset:
-        _COUNTERS.clear()
+        REGISTRY.reset()
     return data
 
 def export_to_kb(session_id: str = "system", slot_prefix: str = "metrics") -> str:
     """
-    Zrzuca bieżące liczniki do KB w unikalny slot (slot_prefix_<ts_ns>).
-    Zwraca nazwę użytego slotu.
+    Zrzuca bieżące liczniki i percentyle histogramów do KB w unikalny slot (slot_prefix_<ts_ns>).
+    Zwraca nazwę użytego slotu. Agenci zapisują metryki jako szeregi czasowe
+    (agents.common.metrics_store); ten zrzut zostaje do jednorazowych migawek.
     """
     ts_ns = time.time_ns()
     slot = f"{slot_prefix}_{ts_ns}"
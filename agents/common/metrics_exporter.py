@@ -0,0 +1,133 @@
+# agents/common/metrics_exporter.py
+"""
+Metryki procesu (agents.common.metrics) w formacie tekstowym Prometheusa.
+
+- render()              — tekst ekspozycji rodzin z rejestru (z etykietami; histogramy *_seconds),
+- start_exporter(port)  — mały serwer HTTP w wątku (GET /metrics) dla procesów agentów;
+  BaseAgent.run_forever uruchamia go sam, gdy ustawiono MAS_METRICS_PORT
+  (host: MAS_METRICS_HOST, domyślnie 127.0.0.1).
+Serwer FastAPI wystawia to samo pod /metrics (api/routes/metrics.py).
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from . import metrics
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = os.getenv("MAS_METRICS_PREFIX", "mas_")
+PORT = os.getenv("MAS_METRICS_PORT", "")
+HOST = os.getenv("MAS_METRICS_HOST", "127.0.0.1")
+
+_INVALID = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def metric_name(raw: str) -> str:
+    name = PREFIX + _INVALID.sub("_", raw)
+    return name if not name[0].isdigit() else "_" + name
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{_INVALID.sub("_", k)}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+def render() -> str:
+    lines: List[str] = []
+    for fam in sorted(metrics.REGISTRY.families(), key=lambda f: f.name):
+        series = fam.series()
+        if not series:
+            continue
+        name = metric_name(fam.name)
+        if fam.kind == "histogram" and not name.endswith("_seconds"):
+            name += "_seconds"
+        if fam.help:
+            lines.append(f"# HELP {name} {_escape(fam.help)}")
+        lines.append(f"# TYPE {name} {fam.kind}")
+        for labels, child in sorted(series, key=lambda s: sorted(s[0].items())):
+            if fam.kind != "histogram":
+                try:
+                    lines.append(f"{name}{_labels(labels)} {_num(child.value)}")
+                except Exception:
+                    pass  # gauge z funkcją nie może zepsuć scrape'u
+                continue
+            buckets, count, total = child.buckets()
+            lines += [f"{name}_bucket{_labels(labels, {'le': f'{le:g}'})} {n}" for le, n in buckets]
+            lines += [
+                f"{name}_bucket{_labels(labels, {'le': '+Inf'})} {count}",
+                f"{name}_sum{_labels(labels)} {total!r}",
+                f"{name}_count{_labels(labels)} {count}",
+            ]
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # scrape co kilka sekund — bez logu dostępu
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_lock = threading.Lock()
+
+
+def start_exporter(port: Optional[int] = None, host: str = HOST) -> ThreadingHTTPServer:
+    """Uruchom (raz na proces) serwer /metrics w wątku demona; port 0 = wolny port."""
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(PORT or 0) if port is None else port), _Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-exporter", daemon=True).start()
+        return _server
+
+
+def stop_exporter() -> None:
+    global _server
+    with _lock:
+        server, _server = _server, None
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+def maybe_start_from_env(log=print) -> Optional[ThreadingHTTPServer]:
+    """start_exporter(), jeśli ustawiono MAS_METRICS_PORT; błąd (np. zajęty port) tylko logujemy."""
+    if not PORT:
+        return None
+    try:
+        server = start_exporter()
+        log(f"metrics exporter on http://{host_port(server)}/metrics")
+        return server
+    except OSError as e:
+        log(f"metrics exporter FAILED: {e}")
+        return None
+
+
+def host_port(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"{host}:{port}"
@@ -0,0 +1,254 @@
+# agents/common/metrics_store.py
+"""
+Szeregi czasowe metryk w KB (tabela metric_points) zamiast zrzutów metrics_<ts_ns> do facts.
+
+Co MAS_METRICS_STORE_INTERVAL sekund (domyślnie 60; 0 = wyłączone) wątek "metrics-store":
+- zapisuje PRZYROSTY od poprzedniego zrzutu w kubełku minutowym ('1m'), jeden wiersz na serię:
+  licznik -> value = przyrost; histogram -> value = suma czasów [s], samples = liczba obserwacji;
+  gauge -> value = odczyt, samples = 1 (średnia = value / samples),
+- przelicza rollupy 1m -> 1h -> 1d dla bieżącego i poprzedniego kubełka docelowego,
+- usuwa stare punkty: MAS_METRICS_STORE_RETENTION ("1m=2d,1h=90d"; 1d bez limitu).
+
+Kilka procesów może pisać do tej samej bazy: upsert sumuje przyrosty w kubełku.
+
+    from agents.common import metrics_store
+    metrics_store.rate("acl_messages_total", 300)   # {'acl_messages_total{...}': zdarzeń/s}
+    metrics_store.series("kb_call_seconds", since=time.time() - 3600)
+
+Wątek jest wspólny dla procesu: każdy BaseAgent.run_forever rejestruje się jako użytkownik
+(maybe_start_from_env), BaseAgent.stop się wyrejestrowuje (release); dopiero ostatni zatrzymuje
+wątek i robi końcowy zrzut, więc stop jednego agenta nie wyłącza zapisu metryk pozostałych.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from . import codec, kb, metrics
+from .kb_backends import PointRow
+from .kb_maintenance import parse_retention
+
+RESOLUTIONS: Tuple[Tuple[str, int], ...] = (("1m", 60), ("1h", 3600), ("1d", 86400))
+INTERVAL_S = float(os.getenv("MAS_METRICS_STORE_INTERVAL", "60"))
+RETENTION = os.getenv("MAS_METRICS_STORE_RETENTION", "1m=2d,1h=90d")
+
+_STEP = dict(RESOLUTIONS)
+
+
+def _labels_json(labels: Dict[str, str]) -> str:
+    return codec.dumps(labels, sort_keys=True)
+
+
+class DeltaRecorder:
+    """Pamięta ostatnie wartości skumulowane i zwraca przyrosty (spadek = reset licznika)."""
+
+    def __init__(self, registry: metrics.Registry = metrics.REGISTRY):
+        self.registry = registry
+        self._prev: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+    def _delta(self, key: Tuple[str, str], value: float, samples: int) -> Tuple[float, int]:
+        prev_value, prev_samples = self._prev.get(key, (0.0, 0))
+        self._prev[key] = (value, samples)
+        if value < prev_value or samples < prev_samples:
+            return value, samples  # snapshot(reset=True) albo restart serii
+        return value - prev_value, samples - prev_samples
+
+    def collect(self, now: Optional[float] = None) -> List[PointRow]:
+        bucket = int(time.time() if now is None else now) // 60 * 60
+        rows: List[PointRow] = []
+        for fam in self.registry.families():
+            for labels, child in fam.series():
+                key = (fam.name, _labels_json(labels))
+                if fam.kind == "gauge":
+                    try:
+                        rows.append(("1m", key[0], key[1], bucket, "gauge", float(child.value), 1))
+                    except Exception:
+                        pass  # gauge liczony funkcją nie może zatrzymać zrzutu
+                    continue
+                if fam.kind == "histogram":
+                    count, total = child.totals()
+                    d_value, d_samples = self._delta(key, total, count)
+                else:
+                    d_value, d_samples = self._delta(key, child.value, 0)
+                if d_value or d_samples:
+                    rows.append(("1m", key[0], key[1], bucket, fam.kind, d_value, d_samples))
+        return rows
+
+
+class MetricsStore:
+    def __init__(self, backend_fn=kb.get_backend, *, retention: str = RETENTION,
+                 registry: metrics.Registry = metrics.REGISTRY):
+        self._backend_fn = backend_fn
+        self.recorder = DeltaRecorder(registry)
+        self.retention = {res: int(period.total_seconds()) for res, period in parse_retention(retention)}
+        self._lock = threading.Lock()  # zrzut z wątku i z BaseAgent.stop nie mogą się przeplatać
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._users = 0
+        self._users_lock = threading.Lock()
+
+    def record(self, now: Optional[float] = None) -> int:
+        """Zapisz przyrosty od poprzedniego wywołania; zwraca liczbę wierszy."""
+        with self._lock:
+            rows = self.recorder.collect(now)
+            if rows:
+                self._backend_fn().add_metric_points(rows)
+                metrics.inc("metrics_store_points_total", len(rows))
+        return len(rows)
+
+    def rollup(self, now: Optional[float] = None) -> None:
+        now = int(time.time() if now is None else now)
+        backend = self._backend_fn()
+        for (src, _), (dst, step) in zip(RESOLUTIONS, RESOLUTIONS[1:]):
+            # bieżący i poprzedni kubełek: poprzedni mógł dostać ostatnie minuty po przełomie
+            backend.rollup_metric_points(src, dst, step, (now // step - 1) * step)
+
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        now = int(time.time() if now is None else now)
+        backend = self._backend_fn()
+        return sum(backend.delete_metric_points(res, now - keep) for res, keep in self.retention.items())
+
+    def tick(self, now: Optional[float] = None) -> int:
+        n = self.record(now)
+        self.rollup(now)
+        self.apply_retention(now)
+        return n
+
+    # ------------ wątek okresowy ------------
+    def start(self, interval_s: float = INTERVAL_S) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval_s,), name="metrics-store", daemon=True)
+        self._thread.start()
+
+    def _run(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.tick()
+            except Exception:
+                metrics.inc("metrics_store_errors_total", 1)
+
+    def acquire(self, interval_s: float = INTERVAL_S) -> None:
+        """Kolejny użytkownik wątku (agent w tym procesie); pierwszy go uruchamia."""
+        with self._users_lock:
+            self._users += 1
+            self.start(interval_s)
+
+    def release(self) -> None:
+        """Użytkownik kończy; ostatni zatrzymuje wątek i robi końcowy zrzut."""
+        with self._users_lock:
+            if self._users == 0:
+                return
+            self._users -= 1
+            if self._users:
+                return
+            self.stop()
+
+    def stop(self) -> None:
+        """Zatrzymaj wątek i zapisz to, co przybyło od ostatniego zrzutu (niezależnie od użytkowników)."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout=5.0)
+        self.tick()
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ------------ zapytania ------------
+    def series(self, name: str, since: float, until: Optional[float] = None,
+               resolution: Optional[str] = None) -> Dict[str, List[Tuple[int, float, int]]]:
+        """{klucz serii: [(bucket, value, samples)]} w oknie [since, until); resolution=None -> dobrana do okna."""
+        until = time.time() if until is None else until
+        resolution = resolution or self.resolution_for(until - since)
+        step = _STEP[resolution]
+        out: Dict[str, List[Tuple[int, float, int]]] = {}
+        for labels, _kind, bucket, value, samples in self._backend_fn().metric_points(
+            name, resolution, int(since) // step * step, int(until)
+        ):
+            out.setdefault(metrics.flat_key(name, codec.loads(labels)), []).append((int(bucket), float(value), int(samples)))
+        return out
+
+    def rate(self, name: str, window_s: float, now: Optional[float] = None,
+             resolution: Optional[str] = None) -> Dict[str, float]:
+        """
+        {klucz serii: wartość na sekundę} w ostatnich window_s sekundach:
+        licznik -> przyrost/s, histogram -> obserwacje/s, gauge -> średni odczyt.
+        """
+        now = time.time() if now is None else now
+        resolution = resolution or self.resolution_for(window_s)
+        step = _STEP[resolution]
+        sums: Dict[str, List] = {}
+        for labels, kind, _bucket, value, samples in self._backend_fn().metric_points(
+            name, resolution, int(now - window_s) // step * step, int(now) + 1
+        ):
+            acc = sums.setdefault(metrics.flat_key(name, codec.loads(labels)), [kind, 0.0, 0])
+            acc[1] += value
+            acc[2] += samples
+        out = {}
+        for key, (kind, value, samples) in sums.items():
+            if kind == "gauge":
+                out[key] = value / samples if samples else 0.0
+            elif kind == "histogram":
+                out[key] = samples / window_s
+            else:
+                out[key] = value / window_s
+        return out
+
+    def resolution_for(self, window_s: float) -> str:
+        """Najdrobniejsza rozdzielczość, której retencja obejmuje okno."""
+        for res, _step in RESOLUTIONS:
+            keep = self.retention.get(res)
+            if keep is None or window_s <= keep:
+                return res
+        return RESOLUTIONS[-1][0]
+
+
+_store: Optional[MetricsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MetricsStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MetricsStore()
+    return _store
+
+
+def flush(now: Optional[float] = None) -> int:
+    """Zrzut przyrostów teraz (poza cyklem wątku); zwraca liczbę zapisanych punktów."""
+    return get_store().record(now)
+
+
+def rate(name: str, window_s: float, **kw) -> Dict[str, float]:
+    return get_store().rate(name, window_s, **kw)
+
+
+def series(name: str, since: float, until: Optional[float] = None, **kw):
+    return get_store().series(name, since, until, **kw)
+
+
+def stop() -> None:
+    if _store is not None:
+        _store.stop()
+
+
+def release() -> None:
+    """Para do maybe_start_from_env (BaseAgent.stop)."""
+    if _store is not None:
+        _store.release()
+
+
+def maybe_start_from_env(log=print) -> bool:
+    """Zarejestruj użytkownika wątku (uruchamia go pierwszy), jeśli MAS_METRICS_STORE_INTERVAL > 0."""
+    if INTERVAL_S <= 0:
+        return False
+    get_store().acquire(INTERVAL_S)
+    log(f"metrics store: deltas every {INTERVAL_S:g}s -> metric_points")
+    return True
@@ -0,0 +1,19 @@
+-- Schemat bazowy KB (no-op na istniejących instalacjach).
+CREATE TABLE IF NOT EXISTS facts (
+    id              BIGSERIAL PRIMARY KEY,
+    conversation_id TEXT        NOT NULL,
+    slot            TEXT        NOT NULL,
+    value           JSONB       NOT NULL,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS facts_conv_created_idx ON facts (conversation_id, created_at);
+
+CREATE TABLE IF NOT EXISTS offers (
+    id              BIGSERIAL PRIMARY KEY,
+    conversation_id TEXT        NOT NULL,
+    provider        TEXT        NOT NULL,
+    offer           JSONB       NOT NULL,
+    score           DOUBLE PRECISION,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS offers_conv_idx ON offers (conversation_id);
@@ -0,0 +1,21 @@
+-- Projekcja "aktualnych" faktów: jeden wiersz na (conversation_id, slot),
+-- utrzymywana przez put_fact (upsert); get_fact czyta tylko stąd.
+CREATE TABLE IF NOT EXISTS facts_current (
+    conversation_id TEXT        NOT NULL,
+    slot            TEXT        NOT NULL,
+    value           JSONB       NOT NULL,
+    updated_at      TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (conversation_id, slot)
+);
+
+-- Odbudowa z historii. Bezpieczne przy równoległych zapisach: nowszy upsert wygrywa.
+-- Pomijamy sloty unikalne (telemetria/metryki) — zgodnie z MAS_KB_PROJECTION_SKIP.
+INSERT INTO facts_current (conversation_id, slot, value, updated_at)
+SELECT DISTINCT ON (conversation_id, slot)
+       conversation_id, slot, value::jsonb, created_at
+FROM facts
+WHERE slot NOT LIKE 'event\_%' AND slot NOT LIKE 'metrics\_%'
+ORDER BY conversation_id, slot, created_at DESC
+ON CONFLICT (conversation_id, slot) DO UPDATE
+    SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at
+    WHERE facts_current.updated_at < EXCLUDED.updated_at;
@@ -0,0 +1,79 @@
+-- kb_migrate: no-transaction
+-- Partycjonowanie facts po created_at (partycje dzienne facts_pRRRRMMDD, kolejne tworzy
+-- python -m agents.common.kb_maintenance --partitions). Dotychczasowa tabela zostaje
+-- partycją facts_legacy (MINVALUE .. pojutrze 00:00 UTC), danych nie kopiujemy.
+-- Trzy kroki, każdy we własnej transakcji, żeby ATTACH nie skanował tabeli pod blokadą:
+-- 1) CHECK (created_at < granica) NOT VALID — chwilowa blokada, bez skanu,
+-- 2) VALIDATE CONSTRAINT — skan, ale pod SHARE UPDATE EXCLUSIVE (zapisy idą),
+-- 3) RENAME + ATTACH — poprawny CHECK implikuje zakres partycji, więc ATTACH go nie
+--    sprawdza; CHECK usuwamy na końcu.
+-- Granica to pojutrze, nie jutro: między krokiem 1 a 3 wiersze z created_at >= granica
+-- odrzuciłby CHECK, a doba zapasu wystarcza na VALIDATE dużej tabeli.
+-- Sekwencja id przechodzi na nową tabelę nadrzędną, więc usunięcie facts_legacy w przyszłości
+-- jej nie zabierze. Indeksy powstają ON ONLY facts: nie budujemy niczego na facts_legacy
+-- (blokada całej tabeli na czas budowy). Indeksy facts_legacy buduje CONCURRENTLY
+-- i podpina 005_facts_legacy_indexes; do tego czasu indeksy nadrzędne są INVALID.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'facts'::regclass)
+       OR EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'facts_legacy_bound') THEN
+        RETURN;
+    END IF;
+    EXECUTE format(
+        'ALTER TABLE facts ADD CONSTRAINT facts_legacy_bound CHECK (created_at < %L) NOT VALID',
+        ((now() AT TIME ZONE 'UTC')::date + 2)::timestamp AT TIME ZONE 'UTC'
+    );
+END $$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'facts'::regclass) THEN
+        RETURN;
+    END IF;
+    ALTER TABLE facts VALIDATE CONSTRAINT facts_legacy_bound;
+END $$;
+
+DO $$
+DECLARE
+    boundary timestamptz;
+    d date;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'facts'::regclass) THEN
+        RETURN;
+    END IF;
+    -- granica z kroku 1 (pg_get_constraintdef zwraca ją z przesunięciem strefy)
+    SELECT (regexp_match(pg_get_constraintdef(oid), '''([^'']*)'''))[1]::timestamptz INTO boundary
+      FROM pg_constraint WHERE conname = 'facts_legacy_bound';
+
+    ALTER TABLE facts RENAME TO facts_legacy;
+    CREATE TABLE facts (
+        id              BIGINT      NOT NULL DEFAULT nextval('facts_id_seq'),
+        conversation_id TEXT        NOT NULL,
+        slot            TEXT        NOT NULL,
+        value           JSONB       NOT NULL,
+        created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+    ) PARTITION BY RANGE (created_at);
+    ALTER SEQUENCE facts_id_seq OWNED BY facts.id;
+
+    EXECUTE format(
+        'ALTER TABLE facts ATTACH PARTITION facts_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        boundary
+    );
+    ALTER TABLE facts_legacy DROP CONSTRAINT facts_legacy_bound;
+    -- nowe (puste) partycje poniżej dostają te indeksy przy CREATE TABLE ... PARTITION OF
+    CREATE INDEX facts_p_conv_created_idx ON ONLY facts (conversation_id, created_at);
+    CREATE INDEX facts_p_conv_slot_created_idx ON ONLY facts (conversation_id, slot, created_at);
+
+    FOR i IN 0..6 LOOP
+        d := (boundary AT TIME ZONE 'UTC')::date + i;
+        EXECUTE format(
+            'CREATE TABLE facts_p%s PARTITION OF facts FOR VALUES FROM (%L) TO (%L)',
+            to_char(d, 'YYYYMMDD'),
+            d::timestamp AT TIME ZONE 'UTC',
+            (d + 1)::timestamp AT TIME ZONE 'UTC'
+        );
+    END LOOP;
+    -- bezpiecznik, gdy kb_maintenance nie dotworzy partycji na czas; wiersze, które tu trafią,
+    -- kb_maintenance.ensure_partitions kopiuje partiami do tworzonej partycji dnia
+    CREATE TABLE facts_default PARTITION OF facts DEFAULT;
+END $$;
@@ -0,0 +1,13 @@
+-- Telemetria ACL poza tabelą facts: jeden wiersz na wiadomość IN/OUT,
+-- zapisywany partiami przez COPY (agents.common.telemetry, sink "postgres").
+CREATE TABLE IF NOT EXISTS acl_events (
+    id              BIGSERIAL PRIMARY KEY,
+    ts              TIMESTAMPTZ NOT NULL,
+    conversation_id TEXT        NOT NULL,
+    direction       TEXT        NOT NULL,
+    performative    TEXT,
+    msg_type        TEXT,
+    body            JSONB       NOT NULL
+);
+CREATE INDEX IF NOT EXISTS acl_events_conv_ts_idx ON acl_events (conversation_id, ts);
+CREATE INDEX IF NOT EXISTS acl_events_ts_idx ON acl_events (ts);
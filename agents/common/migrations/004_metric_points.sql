@@ -0,0 +1,17 @@
+-- Szeregi czasowe metryk (agents.common.metrics_store): jeden wiersz na metrykę, serię
+-- etykiet i kubełek. resolution '1m' to przyrosty zbierane przez procesy (upsert sumuje
+-- wkłady kilku procesów), '1h' i '1d' są przeliczane z rozdzielczości niższej.
+-- bucket = początek kubełka w sekundach epoki (UTC) — ta sama arytmetyka w Postgresie i SQLite.
+-- value: przyrost licznika / suma czasów histogramu / suma odczytów gauge'a;
+-- samples: liczba obserwacji histogramu / liczba odczytów gauge'a.
+CREATE TABLE IF NOT EXISTS metric_points (
+    resolution TEXT             NOT NULL,
+    name       TEXT             NOT NULL,
+    labels     TEXT             NOT NULL,
+    bucket     BIGINT           NOT NULL,
+    kind       TEXT             NOT NULL,
+    value      DOUBLE PRECISION NOT NULL,
+    samples    BIGINT           NOT NULL DEFAULT 0,
+    PRIMARY KEY (resolution, name, labels, bucket)
+);
+CREATE INDEX IF NOT EXISTS metric_points_res_bucket_idx ON metric_points (resolution, bucket);
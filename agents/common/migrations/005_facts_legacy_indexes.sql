@@ -0,0 +1,12 @@
+-- kb_migrate: no-transaction
+-- Indeksy facts_legacy (partycja z 002_facts_partitioned) budowane CONCURRENTLY — zapisy
+-- do facts idą w trakcie budowy — i podpinane pod indeksy nadrzędne, które wtedy stają
+-- się VALID. Każda instrukcja osobno, poza transakcją. facts_conv_created_idx z 000_base
+-- zwykle już istnieje (IF NOT EXISTS), więc jest tylko podpinany. Po przerwanej budowie
+-- zostaje indeks INVALID: DROP INDEX CONCURRENTLY <nazwa> i ponowne uruchomienie kb_migrate.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS facts_conv_created_idx
+    ON facts_legacy (conversation_id, created_at);
+ALTER INDEX facts_p_conv_created_idx ATTACH PARTITION facts_conv_created_idx;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS facts_legacy_conv_slot_created_idx
+    ON facts_legacy (conversation_id, slot, created_at);
+ALTER INDEX facts_p_conv_slot_created_idx ATTACH PARTITION facts_legacy_conv_slot_created_idx;
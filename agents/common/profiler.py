@@ -0,0 +1,164 @@
+# agents/common/profiler.py
+"""
+Profilowanie działającego agenta na żądanie (komunikat PROFILE, ontology=system).
+
+    REQUEST {"type": "PROFILE", "action": "start", "seconds": 30, "mode": "sampling"}
+    REQUEST {"type": "PROFILE", "action": "stop"}          # wcześniejsze zakończenie
+
+- mode: sampling (wątek próbkujący stos pętli zdarzeń co MAS_PROFILE_INTERVAL_MS -> .collapsed,
+  format flamegraph.pl / speedscope), cprofile (cProfile na wątku pętli -> .pstats) albo both,
+- wynik w MAS_PROFILE_DIR jako <agent>-<czas>.{pstats,collapsed}; zapis poza pętlą (to_thread),
+- autoryzacja: bare JID nadawcy musi być w MAS_PROFILE_ALLOW (lista po przecinku; pusta = nikt),
+- jedna sesja na proces (cProfile i sys._current_frames obejmują wszystkie agenty w tej pętli),
+  czas ograniczony do MAS_PROFILE_MAX_S.
+"""
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional
+
+from .metrics import counter
+
+PROFILE_DIR = os.getenv("MAS_PROFILE_DIR", "telemetry/profiles")
+PROFILE_ALLOW = os.getenv("MAS_PROFILE_ALLOW", "")
+PROFILE_MAX_S = float(os.getenv("MAS_PROFILE_MAX_S", "300"))
+PROFILE_INTERVAL_MS = float(os.getenv("MAS_PROFILE_INTERVAL_MS", "5"))
+
+MODES = ("sampling", "cprofile", "both")
+
+PROFILE_REQUESTS = counter(
+    "profile_requests_total", ("agent", "result"),
+    help="Komunikaty PROFILE wg wyniku (started, stopped, done, denied, busy, invalid).",
+)
+
+
+class ProfileError(ValueError):
+    """Niepoprawne żądanie PROFILE albo sesja już trwa."""
+
+
+def parse_allow(spec: Optional[str]) -> FrozenSet[str]:
+    return frozenset(j.strip().split("/", 1)[0] for j in (spec or "").split(",") if j.strip())
+
+
+ALLOWED_JIDS = parse_allow(PROFILE_ALLOW)
+
+
+def authorized(sender: str, allowed: Optional[FrozenSet[str]] = None) -> bool:
+    """Bare JID nadawcy na liście MAS_PROFILE_ALLOW (zasób /xyz pomijany)."""
+    bare = str(sender or "").split("/", 1)[0]
+    return bool(bare) and bare in (ALLOWED_JIDS if allowed is None else allowed)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Wątek próbkujący stos jednego wątku (pętli zdarzeń) -> liczniki stosów w formacie collapsed."""
+
+    def __init__(self, thread_id: int, interval_s: float = PROFILE_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id
+        self.interval_s = max(0.0005, interval_s)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+class ProfileSession:
+    """Jedna sesja profilowania; start()/stop() w wątku pętli, write() może iść przez to_thread."""
+
+    def __init__(self, name: str, mode: str = "sampling", seconds: float = 30.0, out_dir: Optional[str] = None):
+        if mode not in MODES:
+            raise ProfileError(f"unknown mode {mode!r} (allowed: {', '.join(MODES)})")
+        try:
+            seconds = float(seconds)
+        except (TypeError, ValueError):
+            raise ProfileError(f"seconds must be a number, got {seconds!r}") from None
+        if not 0 < seconds <= PROFILE_MAX_S:
+            raise ProfileError(f"seconds must be in (0, {PROFILE_MAX_S:g}]")
+        self.name = re.sub(r"[^\w.@-]+", "_", name)
+        self.mode = mode
+        self.seconds = seconds
+        self.out_dir = Path(out_dir or PROFILE_DIR)
+        self.started_at = 0.0
+        self.done = asyncio.Event()
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self) -> None:
+        global _active
+        if _active is not None:
+            raise ProfileError(f"profile session already running ({_active.name})")
+        if self.mode in ("cprofile", "both"):
+            self._profile = cProfile.Profile()
+            self._profile.enable()  # obejmuje wątek, który woła start() — pętlę zdarzeń
+        if self.mode in ("sampling", "both"):
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        self.started_at = time.time()
+        _active = self
+
+    def stop(self) -> None:
+        """Zatrzymaj pomiar (idempotentne); pliki zapisuje write()."""
+        global _active
+        if self.done.is_set():
+            return
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.done.set()
+        if _active is self:
+            _active = None
+
+    def write(self) -> Dict[str, str]:
+        """Zapisz wyniki: {"pstats": ścieżka, "collapsed": ścieżka} (tylko dla aktywnych trybów)."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.name}-{time.strftime('%Y%m%dT%H%M%S', time.localtime(self.started_at))}"
+        files: Dict[str, str] = {}
+        if self._profile is not None:
+            path = self.out_dir / f"{stem}.pstats"  # JID ma kropki -> bez with_suffix
+            self._profile.dump_stats(str(path))
+            files["pstats"] = str(path)
+        if self._sampler is not None:
+            path = self.out_dir / f"{stem}.collapsed"
+            path.write_text(self._sampler.collapsed(), encoding="utf-8")
+            files["collapsed"] = str(path)
+        return files
+
+
+_active: Optional[ProfileSession] = None
+
+
+def active() -> Optional[ProfileSession]:
+    return _active
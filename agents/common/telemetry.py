@@ -1,16 +1,359 @@
 # agents/common/telemetry.py
+"""
+Telemetria ACL poza ścieżką krytyczną.
+
+record_acl(direction, acl) tylko dokłada zdarzenie do ograniczonego bufora pierścieniowego
+(bez I/O, bez serializacji). Wątek "telemetry-sink" co MAS_TELEMETRY_INTERVAL sekund albo
+po uzbieraniu MAS_TELEMETRY_BATCH zdarzeń zapisuje je partią do sinka (MAS_TELEMETRY_SINK):
+
+- postgres  — COPY do tabeli acl_events (migracja 003_acl_events),
+- jsonl     — pliki JSONL z rotacją (MAS_TELEMETRY_JSONL, *_MAX_BYTES, *_BACKUPS),
+- kb        — jak dawniej: fakty event_<DIR>_<time_ns> przez backend KB,
+- off       — nic nie zbieramy,
+- auto      — postgres dla backendu Postgres, w innym wypadku kb (domyślnie).
+
+Próbkowanie per typ: MAS_TELEMETRY_SAMPLE="PING=0.01,FACT=0.5,*=1" (typ payloadu albo
+performatyw; '*' = pozostałe). Liczniki w agents.common.metrics: telemetry_enqueued_total,
+telemetry_sampled_out_total, telemetry_dropped_total (przepełnienie bufora — wypadają
+najstarsze), telemetry_written_total, telemetry_sink_errors_total.
+"""
 from __future__ import annotations
+
+import asyncio
+import atexit
+import csv
+import io
+import os
+import random
+import threading
 import time
-from typing import Any, Dict
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
 
-from .kb import put_fact
+from . import codec, kb
+from .metrics import inc
 
-def log_acl_event(conversation_id: str, direction: str, acl_dict: Dict[str, Any]) -> None:
+SINK = os.getenv("MAS_TELEMETRY_SINK", "auto")
+BUFFER_SIZE = int(os.getenv("MAS_TELEMETRY_BUFFER", "10000"))
+BATCH_SIZE = int(os.getenv("MAS_TELEMETRY_BATCH", "500"))
+INTERVAL_S = float(os.getenv("MAS_TELEMETRY_INTERVAL", "0.5"))
+SAMPLE_SPEC = os.getenv("MAS_TELEMETRY_SAMPLE", "")
+JSONL_PATH = os.getenv("MAS_TELEMETRY_JSONL", "telemetry/acl_events.jsonl")
+JSONL_MAX_BYTES = int(os.getenv("MAS_TELEMETRY_JSONL_MAX_BYTES", str(64 * 1024 * 1024)))
+JSONL_BACKUPS = int(os.getenv("MAS_TELEMETRY_JSONL_BACKUPS", "5"))
+
+
+class AclEvent(NamedTuple):
+    ts_ns: int
+    direction: str
+    conversation_id: str
+    performative: Optional[str]
+    msg_type: Optional[str]
+    acl: Any  # AclMessage (serializowany dopiero w wątku sinka) albo gotowy dict
+
+    def body_json(self) -> str:
+        to_json = getattr(self.acl, "to_json", None)
+        return to_json() if to_json is not None else codec.dumps(self.acl)
+
+    def body_dict(self) -> Dict[str, Any]:
+        return self.acl if isinstance(self.acl, dict) else codec.loads(self.body_json())
+
+    @property
+    def ts(self) -> datetime:
+        return datetime.fromtimestamp(self.ts_ns / 1e9, tz=timezone.utc)
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """'PING=0.01,*=1' -> {'PING': 0.01, '*': 1.0}; wartości przycinane do [0, 1]."""
+    rates = {}
+    for part in (spec or "").split(","):
+        key, sep, rate = part.strip().partition("=")
+        if not sep or not key.strip():
+            continue
+        rates[key.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+# ------------ sinki ------------
+class Sink:
+    """Cel zapisu partii zdarzeń; write() woła tylko wątek telemetry-sink (albo flush())."""
+
+    name = "base"
+
+    def write(self, events: List[AclEvent]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class NullSink(Sink):
+    name = "off"
+
+    def write(self, events: List[AclEvent]) -> None:
+        pass
+
+
+class PostgresCopySink(Sink):
+    """COPY ... FROM STDIN (CSV) do acl_events — jedna podróż do bazy na partię."""
+
+    name = "postgres"
+    SQL_COPY = (
+        "COPY acl_events (ts, conversation_id, direction, performative, msg_type, body) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+
+    def write(self, events: List[AclEvent]) -> None:
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        for e in events:
+            w.writerow((e.ts.isoformat(), e.conversation_id, e.direction, e.performative or "", e.msg_type or "", e.body_json()))
+        buf.seek(0)
+        with kb.get_conn() as conn, conn.cursor() as cur:
+            cur.copy_expert(self.SQL_COPY, buf)
+            conn.commit()
+
+
+class JsonlSink(Sink):
+    """Dopisywanie do pliku JSONL; po przekroczeniu max_bytes rotacja path -> path.1 -> ... path.N."""
+
+    name = "jsonl"
+
+    def __init__(self, path: str = JSONL_PATH, *, max_bytes: int = JSONL_MAX_BYTES, backups: int = JSONL_BACKUPS):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = max(0, backups)
+        self._fh = None
+
+    def _open(self):
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        return self._fh
+
+    def _rotate(self) -> None:
+        self.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                src.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def write(self, events: List[AclEvent]) -> None:
+        fh = self._open()
+        for e in events:
+            fh.write(
+                '{"ts":"%s","conversation_id":%s,"direction":"%s","performative":%s,"type":%s,"acl":%s}\n'
+                % (
+                    e.ts.isoformat(),
+                    codec.dumps(e.conversation_id),
+                    e.direction,
+                    codec.dumps(e.performative),
+                    codec.dumps(e.msg_type),
+                    e.body_json(),  # gotowy JSON — bez loads/dumps
+                )
+            )
+        fh.flush()
+        if fh.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+class KBSink(Sink):
+    """Zgodność wstecz: zdarzenia jako fakty event_<DIR>_<time_ns> (zapis partią)."""
+
+    name = "kb"
+
+    def write(self, events: List[AclEvent]) -> None:
+        kb._insert_facts([
+            (e.conversation_id, f"event_{e.direction}_{e.ts_ns}", {"direction": e.direction, "acl": e.body_dict()}, e.ts)
+            for e in events
+        ])
+
+
+def make_sink(name: str = SINK):
+    if name == "auto":
+        name = "postgres" if isinstance(kb.get_backend(), kb.PostgresBackend) else "kb"
+    sinks = {"postgres": PostgresCopySink, "jsonl": JsonlSink, "kb": KBSink, "off": NullSink}
+    if name not in sinks:
+        raise ValueError(f"unknown MAS_TELEMETRY_SINK: {name!r}")
+    return sinks[name]()
+
+
+# ------------ bufor ------------
+class TelemetryBuffer:
     """
-    Zapisz zdarzenie ACL jako wpis w KB.
-    direction: "IN" lub "OUT".
-    Slot jest unikalny (event_<DIR>_<time_ns>).
+    Bufor pierścieniowy (deque z maxlen: append jest atomowy, producent nie bierze locka)
+    + wątek zapisujący partie do sinka. Błąd sinka kosztuje partię, nie blokuje agentów.
     """
-    ts_ns = time.time_ns()
-    slot = f"event_{direction}_{ts_ns}"
-    put_fact(conversation_id, slot, {"direction": direction, "acl": acl_dict})
+
+    def __init__(self, sink, *, capacity: int = BUFFER_SIZE, batch_size: int = BATCH_SIZE, interval_s: float = INTERVAL_S):
+        self.sink = sink
+        self.capacity = max(1, capacity)
+        self.batch_size = max(1, batch_size)
+        self.interval_s = interval_s
+        self._events: deque = deque(maxlen=self.capacity)
+        self._wake = threading.Event()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="telemetry-sink", daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(self, event: AclEvent) -> None:
+        if len(self._events) >= self.capacity:
+            inc("telemetry_dropped_total", 1)  # deque wyrzuci najstarsze zdarzenie
+        self._events.append(event)
+        inc("telemetry_enqueued_total", 1)
+        if len(self._events) >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Zapisz wszystko, co jest w buforze, w bieżącym wątku. Zwraca liczbę zdarzeń."""
+        written = 0
+        while True:
+            n = self._write_batch()
+            if n == 0:
+                return written
+            written += max(n, 0)
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=max(1.0, self.interval_s * 5))
+        self.flush()
+        self.sink.close()
+
+    def _write_batch(self) -> int:
+        with self._write_lock:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._events.popleft())
+            except IndexError:
+                pass
+            if not batch:
+                return 0
+            try:
+                self.sink.write(batch)
+            except Exception:
+                inc("telemetry_sink_errors_total", 1)
+                return -1
+            inc("telemetry_written_total", len(batch))
+            return len(batch)
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+            if self._closed:
+                return
+            while len(self._events) and self._write_batch() > 0:
+                pass
+
+
+_sampling: Dict[str, float] = parse_sampling(SAMPLE_SPEC)
+_buffer: Optional[TelemetryBuffer] = None
+_enabled = SINK != "off"
+_lock = threading.Lock()
+
+
+def configure(sink=None, *, sampling: Optional[Dict[str, float]] = None, **buffer_kw) -> None:
+    """Przełącz sink (nazwa, obiekt albo None = 'off') i/lub próbkowanie w trakcie działania."""
+    global _buffer, _enabled, _sampling
+    with _lock:
+        if _buffer is not None:
+            _buffer.close()
+            _buffer = None
+        if sampling is not None:
+            _sampling = dict(sampling)
+        if isinstance(sink, str):
+            sink = make_sink(sink)
+        _enabled = sink is not None and not isinstance(sink, NullSink)
+        if _enabled:
+            _buffer = TelemetryBuffer(sink, **buffer_kw)
+
+
+def _get_buffer() -> Optional[TelemetryBuffer]:
+    global _buffer
+    buf = _buffer
+    if buf is None and _enabled:
+        with _lock:
+            if _buffer is None and _enabled:
+                _buffer = TelemetryBuffer(make_sink(SINK))
+            buf = _buffer
+    return buf
+
+
+def _sampled(msg_type: Optional[str], performative: Optional[str]) -> bool:
+    if not _sampling:
+        return True
+    rate = _sampling.get(msg_type or "", _sampling.get(performative or "", _sampling.get("*", 1.0)))
+    if rate >= 1.0 or random.random() < rate:
+        return True
+    inc("telemetry_sampled_out_total", 1)
+    return False
+
+
+def _enqueue(conversation_id: str, direction: str, performative, msg_type, acl) -> None:
+    if not _enabled or not _sampled(msg_type, performative):
+        return
+    buf = _get_buffer()
+    if buf is not None:
+        buf.add(AclEvent(time.time_ns(), direction, conversation_id, performative, msg_type, acl))
+
+
+def record_acl(direction: str, acl, data: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Zarejestruj wiadomość ACL ("IN"/"OUT"). Nie blokuje i nie serializuje —
+    wiadomość trafia do bufora, JSON powstaje dopiero w wątku sinka.
+    data: już zdekodowany body (ścieżka IN z agents.protocol.ingest) — sink zapisze go wprost.
+    """
+    perf = getattr(acl.performative, "value", acl.performative)
+    ptype = (acl.payload or {}).get("type")
+    _enqueue(acl.conversation_id, direction, perf, ptype if isinstance(ptype, str) else None,
+             acl if data is None else data)
+
+
+def log_acl_event(conversation_id: str, direction: str, acl_dict: Dict[str, Any]) -> None:
+    """Zgodność wstecz: zdarzenie z gotowego słownika ACL (direction: "IN" lub "OUT")."""
+    payload = acl_dict.get("payload") or {}
+    _enqueue(conversation_id, direction, acl_dict.get("performative"), payload.get("type"), acl_dict)
+
+
+async def alog_acl_event(conversation_id: str, direction: str, acl_dict: Dict[str, Any]) -> None:
+    log_acl_event(conversation_id, direction, acl_dict)
+
+
+def flush() -> int:
+    buf = _buffer
+    return buf.flush() if buf is not None else 0
+
+
+async def aflush() -> int:
+    """flush() poza pętlą zdarzeń (sink robi I/O)."""
+    if _buffer is None or not len(_buffer):
+        return 0
+    return await asyncio.get_running_loop().run_in_executor(None, flush)
+
+
+def shutdown() -> None:
+    global _buffer
+    with _lock:
+        if _buffer is not None:
+            _buffer.close()
+            _buffer = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,331 @@
+# agents/common/tracing.py
+"""
+Śledzenie jednej tury czatu przez agenty (trace/span), kontekst w metadanych XMPP.
+
+    with tracing.span("acl.handle", parent=tracing.extract(msg), service="CoordinatorAgent", type=ptype):
+        ...                                   # KB / LLM / OWM w środku -> spany potomne
+    reply = acl.to_spade_message(to)          # metadata["traceparent"] = bieżący span (inject)
+
+- kontekst: W3C traceparent "00-<trace_id>-<span_id>-<flags>" w metadata wiadomości SPADE;
+  wewnątrz agenta niesie go ContextVar (przechodzi do zadań asyncio i asyncio.to_thread),
+- eksport (MAS_TRACE_EXPORT): off (domyślnie; span() to pusty kontekst), memory (COLLECTOR,
+  testy i podgląd w procesie) albo jsonl (MAS_TRACE_JSONL, zapis w osobnym wątku),
+- próbkowanie korzeni MAS_TRACE_SAMPLE (0..1); decyzja idzie dalej w flagach traceparent,
+- waterfall tury: python scripts/trace_waterfall.py telemetry/traces.jsonl.
+"""
+from __future__ import annotations
+
+import atexit
+import functools
+import inspect
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from . import codec
+
+EXPORT = os.getenv("MAS_TRACE_EXPORT", "off")
+JSONL_PATH = os.getenv("MAS_TRACE_JSONL", "telemetry/traces.jsonl")
+SAMPLE = float(os.getenv("MAS_TRACE_SAMPLE", "1"))
+BUFFER_SIZE = int(os.getenv("MAS_TRACE_BUFFER", "10000"))
+META_TRACEPARENT = "traceparent"
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+    service: str = ""
+
+
+def parse_traceparent(value: Any) -> Optional[SpanContext]:
+    """"00-<32 hex>-<16 hex>-<2 hex>" -> SpanContext; inne wartości -> None."""
+    if not isinstance(value, str):
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+def format_traceparent(ctx: SpanContext) -> str:
+    return f"00-{ctx.trace_id}-{ctx.span_id}-{'01' if ctx.sampled else '00'}"
+
+
+_current: ContextVar[Optional[SpanContext]] = ContextVar("mas_span", default=None)
+
+
+def current() -> Optional[SpanContext]:
+    return _current.get()
+
+
+def traceparent() -> Optional[str]:
+    ctx = _current.get()
+    return format_traceparent(ctx) if ctx is not None else None
+
+
+def inject(msg: Any) -> None:
+    """Dopisz bieżący kontekst do metadata wiadomości SPADE (bez kontekstu: nic)."""
+    tp = traceparent()
+    meta = getattr(msg, "metadata", None)
+    if tp and isinstance(meta, dict):
+        meta[META_TRACEPARENT] = tp
+
+
+def extract(msg: Any) -> Optional[SpanContext]:
+    meta = getattr(msg, "metadata", None)
+    return parse_traceparent(meta.get(META_TRACEPARENT)) if isinstance(meta, dict) else None
+
+
+# ------------ spany ------------
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "service", "attrs", "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, ctx: SpanContext, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.trace_id = ctx.trace_id
+        self.span_id = ctx.span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.service = ctx.service
+        self.attrs = attrs
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+class _SpanScope:
+    __slots__ = ("_name", "_parent", "_service", "_attrs", "_span", "_token")
+
+    def __init__(self, name: str, parent: Optional[SpanContext], service: Optional[str], attrs: Dict[str, Any]):
+        self._name, self._parent, self._service, self._attrs = name, parent, service, attrs
+        self._span: Optional[Span] = None
+        self._token = None
+
+    def __enter__(self) -> Optional[Span]:
+        parent = self._parent or _current.get()
+        if parent is None:
+            sampled = SAMPLE >= 1.0 or random.random() < SAMPLE
+            trace_id = os.urandom(16).hex()
+        else:
+            sampled, trace_id = parent.sampled, parent.trace_id
+        service = self._service or (parent.service if parent is not None else "")
+        ctx = SpanContext(trace_id, os.urandom(8).hex(), sampled, service)
+        self._token = _current.set(ctx)
+        if sampled:
+            self._span = Span(self._name, ctx, parent.span_id if parent is not None else None, self._attrs)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current.reset(self._token)
+        sp = self._span
+        if sp is not None:
+            sp.end_ns = time.time_ns()
+            if exc is not None and not isinstance(exc, GeneratorExit):
+                sp.error = f"{exc_type.__name__}: {exc}"
+            exporter = _exporter
+            if exporter is not None:
+                exporter.export(sp)
+        return False
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+def span(name: str, *, parent: Optional[SpanContext] = None, service: Optional[str] = None, **attrs: Any):
+    """Kontekst spanu (with); parent=None -> bieżący span albo nowy ślad. Eksport wyłączony -> pusty kontekst."""
+    if _exporter is None:
+        return _NOOP
+    return _SpanScope(name, parent, service, attrs)
+
+
+def traced(name: str) -> Callable:
+    """Dekorator: całe wywołanie funkcji (sync albo async) jako span potomny."""
+
+    def deco(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return deco
+
+
+# ------------ eksport ------------
+class MemoryCollector:
+    """Zakończone spany w pamięci (ograniczony bufor)."""
+
+    def __init__(self, maxlen: int = BUFFER_SIZE):
+        self._spans: Deque[Span] = deque(maxlen=max(1, maxlen))
+
+    def export(self, sp: Span) -> None:
+        self._spans.append(sp)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        return [s for s in self._spans if trace_id is None or s.trace_id == trace_id]
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+    def flush(self) -> None:
+        pass
+
+
+class JsonlExporter:
+    """Spany jako JSON lines; zapis partiami w wątku "trace-writer" (bez I/O w pętli zdarzeń)."""
+
+    def __init__(self, path: str = JSONL_PATH, maxsize: int = BUFFER_SIZE):
+        self.path = Path(path)
+        self._q: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max(1, maxsize))
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def export(self, sp: Span) -> None:
+        try:
+            self._q.put_nowait(sp)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._q.get()]
+            while True:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [s for s in batch if s is not None]
+            try:
+                if spans:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with self.path.open("a", encoding="utf-8") as f:
+                        f.write("".join(codec.dumps(s.to_dict()) + "\n" for s in spans))
+            except Exception:
+                pass  # ślad nie może zatrzymać wątku
+            finally:
+                for _ in batch:
+                    self._q.task_done()
+
+    def flush(self) -> None:
+        self._q.join()
+
+
+COLLECTOR = MemoryCollector()
+_exporter: Optional[Any] = None
+
+
+def configure(export: str = EXPORT, *, path: str = JSONL_PATH) -> Optional[Any]:
+    """Wybierz eksport: off | memory | jsonl (ponowne wywołanie podmienia eksport)."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.flush()
+    if export == "memory":
+        _exporter = COLLECTOR
+    elif export == "jsonl":
+        _exporter = JsonlExporter(path)
+    else:
+        _exporter = None
+    return _exporter
+
+
+def flush() -> None:
+    if _exporter is not None:
+        _exporter.flush()
+
+
+# ------------ waterfall ------------
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                out.append(codec.loads(line))
+            except Exception:
+                continue  # urwana ostatnia linia przy zapisie w toku
+    return out
+
+
+def render_waterfall(records: List[Dict[str, Any]], *, width: int = 40) -> List[str]:
+    """Drzewo spanów jednego śladu: przesunięcie od startu tury, czas, pasek na osi czasu."""
+    if not records:
+        return []
+    ids = {r["span_id"] for r in records}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for r in records:
+        parent = r.get("parent_id") if r.get("parent_id") in ids else None  # rodzic spoza pliku -> korzeń
+        children.setdefault(parent, []).append(r)
+    for group in children.values():
+        group.sort(key=lambda r: r["start_ns"])
+
+    t0 = min(r["start_ns"] for r in records)
+    total = max(max(r["end_ns"] for r in records) - t0, 1)
+    lines = [f"trace {records[0]['trace_id']}  {total / 1e6:.1f} ms"]
+
+    def walk(parent: Optional[str], depth: int) -> None:
+        for r in children.get(parent, []):
+            start, dur = r["start_ns"] - t0, r["end_ns"] - r["start_ns"]
+            lo = int(start * width / total)
+            bar = " " * lo + "█" * max(1, int(dur * width / total))
+            label = "  " * depth + r["name"] + (f" [{r['service']}]" if r.get("service") else "")
+            err = f"  ! {r['error']}" if r.get("error") else ""
+            lines.append(f"{start / 1e6:>9.1f} {dur / 1e6:>9.1f}  {label:<44} |{bar[:width]:<{width}}|{err}")
+            walk(r["span_id"], depth + 1)
+
+    walk(None, 0)
+    return lines
+
+
+atexit.register(flush)
+configure()
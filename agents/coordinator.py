@@ -1,19 +1,18 @@
 import os
-import re
-from datetime import datetime
 import asyncio
-import json
-from collections import deque
 import time
 from typing import Any, Dict, List
 
 import ai.openai_client as ai_mod
 from agents.common.config import settings
-from agents.common.kb import put_fact
+from agents.common.kb_async import aput_fact
 from agents.agent import BaseAgent
 from agents.protocol.acl_messages import AclMessage
+from agents.protocol import wire
 from agents.protocol import acl_handler
 from agents.protocol.guards import acl_language_is_json
+from agents.protocol.lanes import CLASSIFIER
+from agents.protocol.router import Router, dedup, requires, timed, wire_log
 from agents.common.slots import CANONICAL_SLOTS
 from agents.common.validators import (
     validate_budget_total, validate_dates_start, validate_nights,
@@ -31,11 +30,22 @@ WANTED_SLOTS: List[str] = list(getattr(settings, "nlu_wanted_slots", [
 ]))
 NLU_CONF_MIN  = float(getattr(settings, "nlu_conf_min", os.getenv("NLU_CONF_MIN", "0.7")))
 
+# walidatory wartości slotów (FACT od użytkownika i z NLU)
+SLOT_VALIDATORS = {
+    "budget_total":        validate_budget_total,
+    "dates_start":         validate_dates_start,
+    "nights":              validate_nights,
+    "passport_ok":         validate_passport_ok,
+    "party_children_ages": validate_party_children_ages,
+}
+
+# routing ACL po payload.type (agents.protocol.router)
+ROUTER = Router("coordinator", middleware=(wire_log, dedup, timed))
+
 
 class CoordinatorAgent(BaseAgent):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._acl_seen_keys = deque(maxlen=64)
         self._missing_cache: dict[str, tuple[frozenset[str], float]] = {}  # conv_id -> (missing, ts)
         self._cap_cache: dict[str, tuple[str, float]] = {}  # cap_key -> (jid, expires_at)
         self._root_session: dict[str, str] = {}
@@ -43,9 +53,11 @@ class CoordinatorAgent(BaseAgent):
 
     
     class OnACL(CyclicBehaviour):
-        acl_handler_timeout = getattr(settings, "acl_handler_timeout", 0.2)
         acl_max_body_bytes  = settings.acl_max_body_bytes
-        acl_max_idle_ticks  = settings.acl_max_idle_ticks
+        acl_max_idle_s      = settings.acl_max_idle_s
+        # zawsze skrzynki per rozmowa (agents.protocol.mailbox): wynik NLU z _run_nlu wraca
+        # do kolejki swojej rozmowy, więc jest obsługiwany po kolei z jej pozostałymi ramkami
+        acl_concurrency     = max(1, settings.acl_concurrency)
 
         @acl_handler
         async def run(self, acl: AclMessage, raw_msg):
@@ -65,307 +77,256 @@ class CoordinatorAgent(BaseAgent):
         return None
 
             
-    async def setup(self):
-        await super().setup()
-        self.add_behaviour(self.OnACL())
-    
+    def acl_consumer(self):
+        """Jedyny konsument ACL agenta (BaseAgent.setup)."""
+        return self.OnACL()
+
     async def handle_acl(self, behaviour, spade_msg, acl: AclMessage):
-        
-        try:
-            sender = str(getattr(spade_msg, "sender", "")) or "?"
-            thr = getattr(spade_msg, "thread", None)
-            meta = getattr(spade_msg, "metadata", {}) or {}
-            stanza = getattr(spade_msg, "id", None) or meta.get("stanza_id")
-            ptype = (acl.payload or {}).get("type")
-            sess  = (acl.payload or {}).get("session_id")
-            self.log(
-                "WIRE dir=IN "
-                f"from={sender} "
-                f"perf={getattr(acl.performative, 'value', str(acl.performative))} type={ptype} "
-                f"conv={acl.conversation_id} sess={sess} "
-                f"thread={thr} stanza={stanza} "
-                f"ts={datetime.now(timezone.utc).isoformat()}"
-            )
-        except Exception:
-            pass
-        
-        # --- filtr duplikatów (ostatnie 64 ramki) ---
-        try:
-            key = (
-                acl.conversation_id,
-                acl.performative.value,
-                acl.ontology or "default",
-                json.dumps(acl.payload, sort_keys=True, ensure_ascii=False),
-            )
-        except Exception:
-            key = (acl.conversation_id, acl.performative.value, acl.ontology or "default", str(acl.payload))
+        """Routing po payload.type (ROUTER): WIRE log i filtr duplikatów jako middleware."""
+        await ROUTER.dispatch(self, behaviour, spade_msg, acl)
 
-        if key in self._acl_seen_keys:
-            return
-        self._acl_seen_keys.append(key)
-        # --- koniec filtra ---
-        
+    @ROUTER.route("PING")
+    async def _on_ping(self, behaviour, spade_msg, acl: AclMessage):
+        """PING → ACK + OFFER (AI lub fallback)."""
         payload = acl.payload or {}
-        ptype = payload.get("type")
-
-        # --- PING → ACK + OFFER (AI lub fallback) ---
-        if ptype == "PING":
-            # ACK (może zostać)
-            ack = AclMessage.build_inform_ack(
-                conversation_id=acl.conversation_id,
-                echo={"type": "PING"},
-            )
-            await self.send_acl(behaviour, ack, to_jid=str(spade_msg.sender))
-            self.log("acked PING")
+        # ACK (może zostać)
+        ack = AclMessage.build_inform_ack(
+            conversation_id=acl.conversation_id,
+            echo={"type": "PING"},
+        )
+        await self.send_acl(behaviour, ack, to_jid=str(spade_msg.sender))
+        self.log("acked PING")
 
-            session_id = payload.get("session_id") or acl.conversation_id
+        session_id = payload.get("session_id") or acl.conversation_id
 
-            # AI włączone, gdy AI_ENABLED=1 LUB ustawienie w settings
-            ai_enabled = (os.getenv("AI_ENABLED", "0") == "1") or getattr(settings, "coordinator_ai_enabled", False)
+        # AI włączone, gdy AI_ENABLED=1 LUB ustawienie w settings
+        ai_enabled = (os.getenv("AI_ENABLED", "0") == "1") or getattr(settings, "coordinator_ai_enabled", False)
 
-            # Pobierz tekst od AI (jeśli włączone)
-            ai_text = None
-            if ai_enabled:
-                try:
-                    sys = "Jesteś zwięzłym doradcą podróży. Jedno zdanie, po polsku."
-                    usr = "Utwórz startową propozycję na powitanie nowej rozmowy."
-                    maybe = ai_mod.chat_reply(sys, usr)  # <- przez moduł, działa z monkeypatch
-                    if maybe:
-                        ai_text = maybe.strip()
-                except Exception as e:
-                    self.log(f"[warn] AI headline/notes failed: {e}")
+        # Pobierz tekst od AI (jeśli włączone)
+        ai_text = None
+        if ai_enabled:
+            try:
+                sys = "Jesteś zwięzłym doradcą podróży. Jedno zdanie, po polsku."
+                usr = "Utwórz startową propozycję na powitanie nowej rozmowy."
+                # przez moduł (działa z monkeypatch); blokujący HTTP poza pętlą zdarzeń
+                maybe = await asyncio.to_thread(ai_mod.chat_reply, sys, usr)
+                if maybe:
+                    ai_text = maybe.strip()
+            except Exception as e:
+                self.log(f"[warn] AI headline/notes failed: {e}")
 
-            # Nagłówek stały/konfigurowalny
-            headline = getattr(
-                settings,
-                "coordinator_offer_headline_default",
-                "Mam dla Ciebie wstępną propozycję podróży."
-            )
+        # Nagłówek stały/konfigurowalny
+        headline = getattr(
+            settings,
+            "coordinator_offer_headline_default",
+            "Mam dla Ciebie wstępną propozycję podróży."
+        )
 
-            # KLUCZ: notatki = AI (jeśli jest), inaczej fallback
-            notes = ai_text if ai_text else getattr(
-                settings,
-                "coordinator_offer_notes_default",
-                "Luźna podpowiedź — możemy iść w inną stronę, jeśli wolisz."
-            )
+        # KLUCZ: notatki = AI (jeśli jest), inaczej fallback
+        notes = ai_text if ai_text else getattr(
+            settings,
+            "coordinator_offer_notes_default",
+            "Luźna podpowiedź — możemy iść w inną stronę, jeśli wolisz."
+        )
 
-            # Budowa OFERTY z notes
-            offer_payload = {
-                "type": "OFFER",
-                "proposal": {"headline": headline, "notes": notes},
-                "session_id": session_id,
-            }
+        # Budowa OFERTY z notes
+        offer_payload = {
+            "type": "OFFER",
+            "proposal": {"headline": headline, "notes": notes},
+            "session_id": session_id,
+        }
+
+        reply = AclMessage.build_inform(
+            conversation_id=acl.conversation_id,
+            payload=offer_payload,
+            ontology=acl.ontology or "ui",
+        )
+        await self.send_acl(behaviour, reply, to_jid=str(spade_msg.sender))
+        self.log(f"[Coordinator] sent OFFER (notes): {notes}")
 
-            reply = AclMessage.build_inform(
-                conversation_id=acl.conversation_id,
-                payload=offer_payload,
-                ontology=acl.ontology or "ui",
-            )
-            await self.send_acl(behaviour, reply, to_jid=str(spade_msg.sender))
-            self.log(f"[Coordinator] sent OFFER (notes): {notes}")
+    @ROUTER.route("FACT", middleware=(requires("slot"),))
+    async def _on_fact(self, behaviour, spade_msg, acl: AclMessage):
+        """FACT: wynik NLU albo slot od użytkownika → walidacja, KB, CONFIRM."""
+        payload = acl.payload or {}
+        sys_slot = payload.get("slot")
+        if sys_slot and sys_slot.startswith("capability."):
+            self.log(f"ignored system FACT '{sys_slot}'")
             return
-            # --- /PING ---
 
+        slot   = payload.get("slot")
+        value  = payload.get("value")
+        source = payload.get("source", "user")
+        conv_id = acl.conversation_id
 
+        # odpowiedź z Extractora
+        if slot == "nlu.extraction":
+            extraction: Dict[str, Any] = value or {}
+            extracted: Dict[str, Any] = (extraction.get("extracted") or {})
+            missing: List[str] = list(extraction.get("missing") or [])
 
-        # --- FACT ---
-        if ptype == "FACT":
-            sys_slot = payload.get("slot")
-            if sys_slot and sys_slot.startswith("capability."):
-                self.log(f"ignored system FACT '{sys_slot}'")
-                return
-            
-            slot   = payload.get("slot")
-            value  = payload.get("value")
-            source = payload.get("source", "user")
-            conv_id = acl.conversation_id
-            
-            # odpowiedź z Extractora
-            if slot == "nlu.extraction":
-                extraction: Dict[str, Any] = value or {}
-                extracted: Dict[str, Any] = (extraction.get("extracted") or {})
-                missing: List[str] = list(extraction.get("missing") or [])
-
-                validators = {
-                    "budget_total":        validate_budget_total,
-                    "dates_start":         validate_dates_start,
-                    "nights":              validate_nights, 
-                    "passport_ok":         validate_passport_ok, 
-                    "party_children_ages": validate_party_children_ages,
-                }
-                confirmed = []
-                for s, meta in extracted.items():
-                    try:
-                        conf = float(meta.get("confidence") or 0)
-                    except Exception:
-                        conf = 0.0
-                    if s not in CANONICAL_SLOTS or conf < NLU_CONF_MIN:
+            confirmed = []
+            for s, meta in extracted.items():
+                try:
+                    conf = float(meta.get("confidence") or 0)
+                except Exception:
+                    conf = 0.0
+                if s not in CANONICAL_SLOTS or conf < NLU_CONF_MIN:
+                    if s not in missing:
+                        missing.append(s)
+                    continue
+                v = meta.get("value")
+                validator = SLOT_VALIDATORS.get(s)
+                if validator:
+                    ok, out = validator(v)
+                    if not ok:
                         if s not in missing:
                             missing.append(s)
                         continue
-                    v = meta.get("value")
-                    validator = validators.get(s)
-                    if validator:
-                        ok, out = validator(v)
-                        if not ok:
-                            if s not in missing:
-                                missing.append(s)
-                            continue
-                        v = out
-                    try:
-                        put_fact(conv_id, s, {"value": v, "source": "extractor", "confidence": conf})
-                        self.log(f"[NLU] saved to KB: slot='{s}' v='{v}' conf={conf:.2f}")
-                        confirmed.append(s)
-                    except Exception as e:
-                        self.log(f"[NLU] KB write failed for slot='{s}': {e}")
-
-                # potwierdź rozpoznane
-                for s in confirmed:
-                    confirm = AclMessage.build_inform(
-                        conversation_id=conv_id,
-                        payload={"type": "CONFIRM", "slot": s, "status": "auto"},
-                        ontology=acl.ontology or "default",
-                    )
-                    await self.send_acl(behaviour, confirm, to_jid=str(spade_msg.sender))
-
-                # poproś o brakujące → do Presentera (z deduplikacją)
-                if missing:
-                    await self._ask_missing(behaviour, conv_id, missing, settings.presenter_jid)
-                    # oraz krótka, ludzka dopowiedź od Presentera
-                    await self._compose(behaviour, conv_id, "followup")
-
-                # jeśli coś potwierdziliśmy, poproś Presentera o miękki hint
-                if confirmed and not missing:
-                    await self._compose(behaviour, conv_id, "offer_hint")
-
-
-                return
-
-            # walidacja slotu
-            if slot not in CANONICAL_SLOTS:
-                fail = AclMessage.build_failure(
-                    conversation_id=conv_id,
-                    code="VALIDATION_ERROR",
-                    message=f"Unknown slot '{slot}'",
-                    details={"allowed": sorted(CANONICAL_SLOTS)},
-                )
-                await self.send_acl(behaviour, fail, to_jid=str(spade_msg.sender))
-                self.log(f"rejected FACT for unknown slot='{slot}'")
-                return
-            
-            # walidacje wartości
-            validators = {
-                "budget_total":        validate_budget_total,
-                "dates_start":         validate_dates_start,
-                "nights":              validate_nights, 
-                "passport_ok":         validate_passport_ok, 
-                "party_children_ages": validate_party_children_ages,
-            }
-            validator = validators.get(slot)
-            if validator:
-                ok, out = validator(value)
-                if not ok:
-                    fail = AclMessage.build_failure(
-                        conversation_id=conv_id,
-                        code="VALIDATION_ERROR",
-                        message=f"Invalid value for '{slot}'",
-                        details={"reason": out},
-                    )
-                    await self.send_acl(behaviour, fail, to_jid=str(spade_msg.sender))
-                    self.log(f"rejected FACT slot='{slot}' reason='{out}'")
-                    return
-                value = out
-
-            try:
-                put_fact(conv_id, slot, {"value": value, "source": source})
-                self.log(f"FACT saved to KB: conv='{conv_id}' slot='{slot}' value='{value}' source='{source}'")
+                    v = out
+                try:
+                    await aput_fact(conv_id, s, {"value": v, "source": "extractor", "confidence": conf})
+                    self.log(f"[NLU] saved to KB: slot='{s}' v='{v}' conf={conf:.2f}")
+                    confirmed.append(s)
+                except Exception as e:
+                    self.log(f"[NLU] KB write failed for slot='{s}': {e}")
 
+            # potwierdź rozpoznane
+            for s in confirmed:
                 confirm = AclMessage.build_inform(
                     conversation_id=conv_id,
-                    payload={"type": "CONFIRM", "slot": slot, "status": "saved"},
+                    payload={"type": "CONFIRM", "slot": s, "status": "auto"},
                     ontology=acl.ontology or "default",
                 )
                 await self.send_acl(behaviour, confirm, to_jid=str(spade_msg.sender))
-                self.log(f"confirmed FACT for slot='{slot}'")
-                
-                # delikatny hint zamiast sztywnego OFFER
+
+            # poproś o brakujące → do Presentera (z deduplikacją)
+            if missing:
+                await self._ask_missing(behaviour, conv_id, missing, settings.presenter_jid)
+                # oraz krótka, ludzka dopowiedź od Presentera
+                await self._compose(behaviour, conv_id, "followup")
+
+            # jeśli coś potwierdziliśmy, poproś Presentera o miękki hint
+            if confirmed and not missing:
                 await self._compose(behaviour, conv_id, "offer_hint")
-                return
 
-            except Exception as e:
-                self.log(f"ERR KB write FAILED for slot='{slot}': {e}")
-            return
-        
-        # --- USER_MSG ---
-        if ptype == "USER_MSG":
-            conv_id = acl.conversation_id
-            text = (payload or {}).get("text", "")
-            session_id = payload.get("session_id") or conv_id
-            # zapamiętaj prawdę o sesji dla głównego conv_id
-            if session_id:
-                self._root_session[conv_id] = session_id
 
-            try:
-                put_fact(conv_id, "last_user_msg", {"value": text, "source": "user"})
-            except Exception:
-                pass
+            return
 
-            # 1) natychmiast do Presentera (żeby user dostał odpowiedź)
-            forward = AclMessage.build_request_user_msg(
+        # walidacja slotu
+        if slot not in CANONICAL_SLOTS:
+            fail = AclMessage.build_failure(
                 conversation_id=conv_id,
-                text=text,
-                ontology="ui",
-                session_id=session_id,
+                code="VALIDATION_ERROR",
+                message=f"Unknown slot '{slot}'",
+                details={"allowed": sorted(CANONICAL_SLOTS)},
             )
-            await self.send_acl(behaviour, forward, to_jid=settings.presenter_jid)
-            self.log("forwarded USER_MSG to Presenter")
-
-            # 2) równolegle NLU
-            context = ""
-            extractor_jid = await self._find_provider(behaviour, NLU_CAP_KEY)
-            if extractor_jid:
-                extraction = await self._ask_extractor(
-                    behaviour, extractor_jid, conv_id, session_id, text, context, WANTED_SLOTS
-                )
-                if extraction:
-                    inj = AclMessage.build_inform(
-                        conversation_id=conv_id,
-                        payload={"type": "FACT", "slot": "nlu.extraction", "value": extraction},
-                        ontology=NLU_ONTOLOGY,
-                    )
-                    await self.handle_acl(behaviour, spade_msg, inj)
+            await self.send_acl(behaviour, fail, to_jid=str(spade_msg.sender))
+            self.log(f"rejected FACT for unknown slot='{slot}'")
             return
 
-        # --- Forward do Bridge (to on gada z API/UIs) ---
-        if ptype in {"PRESENTER_REPLY", "TO_USER"}:
-            await self.send_acl(behaviour, acl, to_jid=settings.api_bridge_jid)
-            self.log(f"routed {ptype} to Bridge")
-            return
-
-        # --- METRICS_EXPORT (bez zmian) ---
-        if ptype == "METRICS_EXPORT":
-            try:
-                slot = self.export_metrics(session_id="system", slot_prefix="metrics")
-                confirm = AclMessage.build_inform(
-                    conversation_id=acl.conversation_id,
-                    payload={"type": "CONFIRM", "slot": "metrics_export", "status": slot or "failed"},
-                    ontology=acl.ontology or "default",
-                )
-                await self.send_acl(behaviour, confirm, to_jid=str(spade_msg.sender))
-                self.log(f"metrics exported to KB slot='{slot}'")
-            except Exception as e:
+        # walidacje wartości
+        validator = SLOT_VALIDATORS.get(slot)
+        if validator:
+            ok, out = validator(value)
+            if not ok:
                 fail = AclMessage.build_failure(
-                    conversation_id=acl.conversation_id,
-                    code="INTERNAL_ERROR",
-                    message="Metrics export failed",
-                    details={"error": str(e)},
+                    conversation_id=conv_id,
+                    code="VALIDATION_ERROR",
+                    message=f"Invalid value for '{slot}'",
+                    details={"reason": out},
                 )
                 await self.send_acl(behaviour, fail, to_jid=str(spade_msg.sender))
-                self.log(f"metrics export FAILED: {e}")
+                self.log(f"rejected FACT slot='{slot}' reason='{out}'")
+                return
+            value = out
+
+        try:
+            await aput_fact(conv_id, slot, {"value": value, "source": source})
+            self.log(f"FACT saved to KB: conv='{conv_id}' slot='{slot}' value='{value}' source='{source}'")
+
+            confirm = AclMessage.build_inform(
+                conversation_id=conv_id,
+                payload={"type": "CONFIRM", "slot": slot, "status": "saved"},
+                ontology=acl.ontology or "default",
+            )
+            await self.send_acl(behaviour, confirm, to_jid=str(spade_msg.sender))
+            self.log(f"confirmed FACT for slot='{slot}'")
+
+            # delikatny hint zamiast sztywnego OFFER
+            await self._compose(behaviour, conv_id, "offer_hint")
             return
 
-        # Inne typy — dyscyplina: tylko log.
-        self.log(f"OTHER payload: {payload}")
+        except Exception as e:
+            self.log(f"ERR KB write FAILED for slot='{slot}': {e}")
+
+    @ROUTER.route("USER_MSG")
+    async def _on_user_msg(self, behaviour, spade_msg, acl: AclMessage):
+        """USER_MSG: natychmiast do Presentera, NLU w tle."""
+        payload = acl.payload or {}
+        conv_id = acl.conversation_id
+        text = (payload or {}).get("text", "")
+        session_id = payload.get("session_id") or conv_id
+        # zapamiętaj prawdę o sesji dla głównego conv_id
+        if session_id:
+            self._root_session[conv_id] = session_id
+
+        try:
+            await aput_fact(conv_id, "last_user_msg", {"value": text, "source": "user"})
+        except Exception:
+            pass
+
+        # 1) natychmiast do Presentera (żeby user dostał odpowiedź)
+        forward = AclMessage.build_request_user_msg(
+            conversation_id=conv_id,
+            text=text,
+            ontology="ui",
+            session_id=session_id,
+        )
+        await self.send_acl(behaviour, forward, to_jid=settings.presenter_jid)
+        self.log("forwarded USER_MSG to Presenter")
+
+        # 2) równolegle NLU — w tle: czekanie na Registry/Extractora nie blokuje OnACL,
+        #    który w tym czasie odbiera (także ich odpowiedzi)
+        self.spawn(self._run_nlu(behaviour, spade_msg, conv_id, session_id, text), name=f"nlu-{conv_id}")
+
+    @ROUTER.route("PRESENTER_REPLY")
+    @ROUTER.route("TO_USER")
+    async def _on_to_user(self, behaviour, spade_msg, acl: AclMessage):
+        """Forward do Bridge (to on gada z API/UIs)."""
+        await self.send_acl(behaviour, acl, to_jid=settings.api_bridge_jid)
+        self.log(f"routed {acl.payload.get('type')} to Bridge")
+
+    @ROUTER.route("METRICS_EXPORT")
+    async def _on_metrics_export(self, behaviour, spade_msg, acl: AclMessage):
+        """METRICS_EXPORT → zrzut metryk + CONFIRM."""
+        try:
+            points = await self.export_metrics()  # zapis do bazy w wątku, poza pętlą
+            confirm = AclMessage.build_inform(
+                conversation_id=acl.conversation_id,
+                payload={
+                    "type": "CONFIRM",
+                    "slot": "metrics_export",
+                    "status": "ok" if points is not None else "failed",
+                    "points": points,
+                },
+                ontology=acl.ontology or "default",
+            )
+            await self.send_acl(behaviour, confirm, to_jid=str(spade_msg.sender))
+            self.log(f"metrics export CONFIRM sent (points={points})")
+        except Exception as e:
+            fail = AclMessage.build_failure(
+                conversation_id=acl.conversation_id,
+                code="INTERNAL_ERROR",
+                message="Metrics export failed",
+                details={"error": str(e)},
+            )
+            await self.send_acl(behaviour, fail, to_jid=str(spade_msg.sender))
+            self.log(f"metrics export FAILED: {e}")
+
+    @ROUTER.fallback
+    async def _on_other(self, behaviour, spade_msg, acl: AclMessage):
+        """Inne typy — dyscyplina: tylko log."""
+        self.log(f"OTHER payload: {acl.payload or {}}")
 
 
     async def _ask_missing(self, behaviour, conv_id: str, missing: list[str], to_jid: str):
@@ -392,15 +353,6 @@ class CoordinatorAgent(BaseAgent):
         self.log(f"[NLU] asked for missing: {sorted(missing)} (sid='{sid}')")
 
 
-    # --- Pomocnicze: oddaj niepowiązane wiadomości do głównego pipeline ---
-    async def _dispatch_unrelated(self, behaviour, spade_msg):
-        try:
-            data = json.loads(spade_msg.body or "{}")
-            acl2 = AclMessage.model_validate(data)
-            await self.handle_acl(behaviour, spade_msg, acl2)
-        except Exception:
-            pass
-
     # --- COMPOSE: wyjście do UI zawsze z niezmiennym session_id ---
     async def _compose(self, behaviour, conv_id: str, purpose: str, ontology: str = "ui"):
         sid = self._get_session(conv_id)
@@ -417,6 +369,26 @@ class CoordinatorAgent(BaseAgent):
 
 
 
+    # --- NLU: provider z Registry -> Extractor -> FACT nlu.extraction przez skrzynkę rozmowy ---
+    async def _run_nlu(self, behaviour, spade_msg, conv_id: str, session_id: str, text: str):
+        context = ""
+        extractor_jid = await self._find_provider(behaviour, NLU_CAP_KEY)
+        if not extractor_jid:
+            return
+        extraction = await self._ask_extractor(
+            behaviour, extractor_jid, conv_id, session_id, text, context, WANTED_SLOTS
+        )
+        if extraction:
+            inj = AclMessage.build_inform(
+                conversation_id=conv_id,
+                payload={"type": "FACT", "slot": "nlu.extraction", "value": extraction},
+                ontology=NLU_ONTOLOGY,
+            )
+            # nie handle_acl wprost: obsługa szłaby obok ramek tej rozmowy, które właśnie są w toku
+            self.mailboxes().submit(
+                conv_id, lambda: self.handle_acl(behaviour, spade_msg, inj), lane=CLASSIFIER.lane_for(inj)
+            )
+
     # --- Registry lookup dla capability (np. nlu.SLOTS) ---
     async def _find_provider(self, behaviour, key: str) -> str | None:
         now = time.time()
@@ -445,31 +417,20 @@ class CoordinatorAgent(BaseAgent):
                 return settings.extractor_jid
             return None
 
-        await self.send_acl(behaviour, ask, to_jid=to_registry)
-
+        # odpowiedź przychodzi przez zwykły pipeline (po in_reply_to) — bez pętli receive()
         wait_s   = float(getattr(settings, "cap_cache_wait_s", 2.0))
-        deadline = now + wait_s
         provider = None
-
-        while time.time() < deadline:
-            r = await behaviour.receive(timeout=0.25)
-            if not r:
-                continue
-            try:
-                data = json.loads(r.body or "{}")
-                acl2 = AclMessage.model_validate(data)
-                if acl2.conversation_id != conv:
-                    # oddaj niepowiązane wiadomości do głównego pipeline
-                    await self._dispatch_unrelated(behaviour, r)
-                    continue
-                p = acl2.payload or {}
-                if p.get("type") == "FACT" and p.get("slot") == "capability.providers":
-                    providers = (p.get("value") or {}).get(key) or []
-                    provider = providers[0] if providers else None
-                    break
-            except Exception:
-                await self._dispatch_unrelated(behaviour, r)
-                continue
+        try:
+            fut = await self.send_request(behaviour, ask, to_jid=to_registry)
+            reply = await asyncio.wait_for(fut, timeout=wait_s)
+            p = reply.payload or {}
+            if p.get("type") == "FACT" and p.get("slot") == "capability.providers":
+                for jid, encs in (p.get("encodings") or {}).items():
+                    wire.PEERS.learn(jid, encs)  # kodowania body ogłoszone w CAPABILITY
+                providers = (p.get("value") or {}).get(key) or []
+                provider = providers[0] if providers else None
+        except asyncio.TimeoutError:
+            self.log(f"[CAP] registry did not answer for {key} within {wait_s:g}s")
 
         # 3) Aktualizacja cache (pozytywny/negatywny)
         ttl     = float(getattr(settings, "cap_cache_ttl", 300.0))   # np. 5 min
@@ -528,27 +489,17 @@ class CoordinatorAgent(BaseAgent):
             },
             ontology=NLU_ONTOLOGY,
         )
-        await self.send_acl(behaviour, req, to_jid=extractor_jid)
-
-        # --- poczekaj na odpowiedź tylko dla tego conv_id ---
-        deadline = time.time() + 3.0
-        while time.time() < deadline:
-            r = await behaviour.receive(timeout=0.25)
-            if not r:
-                continue
-            try:
-                data = json.loads(r.body or "{}")
-                acl2 = AclMessage.model_validate(data)
-                if acl2.conversation_id != nlu_conv:
-                    # wszystko inne oddaj normalnemu pipeline
-                    await self._dispatch_unrelated(behaviour, r)
-                    continue
-                p = acl2.payload or {}
-                if p.get("type") == "FACT" and p.get("slot") == "nlu.extraction":
-                    return p.get("value") or {}
-            except Exception:
-                await self._dispatch_unrelated(behaviour, r)
-                continue
+        fut = await self.send_request(behaviour, req, to_jid=extractor_jid)
+
+        # --- poczekaj na odpowiedź (future rozwiązuje pipeline wejściowy) ---
+        try:
+            reply = await asyncio.wait_for(fut, timeout=float(getattr(settings, "nlu_reply_timeout_s", 3.0)))
+        except asyncio.TimeoutError:
+            self.log(f"[NLU] extractor did not answer for conv='{nlu_conv}'")
+            return None
+        p = reply.payload or {}
+        if p.get("type") == "FACT" and p.get("slot") == "nlu.extraction":
+            return p.get("value") or {}
         return None
         
 
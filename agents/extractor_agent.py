@@ -1,6 +1,6 @@
 # agents/extractor_agent.py
 from __future__ import annotations
-import os, json, asyncio, time
+import os, asyncio, time
 from typing import Any, Dict, List
 
 from spade.behaviour import CyclicBehaviour, OneShotBehaviour
@@ -9,6 +9,10 @@ from spade.message import Message
 
 from agents.agent import BaseAgent
 from agents.protocol.acl_messages import AclMessage, Performative
+from agents.protocol.handler import next_frame
+from agents.protocol.ingest import ingest_message
+from agents.protocol import wire
+from agents.common import codec, tracing
 from agents.common.config import settings
 
 # Tu wpięty Twój ekstraktor LLM; może zwracać pusty wynik na czas MVP
@@ -41,21 +45,22 @@ async def llm_extract_slots(session_id: str, context: str, text: str, wanted: Li
         "Jeśli czegoś nie ma, nie halucynuj — wpisz do \"missing\".\n"
         "Język polski. Krótko. Zero tekstu poza JSON."
     )
-    user_prompt = json.dumps({
+    user_prompt = codec.dumps({
         "session_id": session_id,
         "context": context or "",
         "message": text or "",
         "wanted": wanted,
-    }, ensure_ascii=False)
+    })
 
     try:
-        raw = chat_reply(system_prompt=system_prompt, user_text=user_prompt)
+        # blokujący HTTP w wątku: pętla w tym czasie odbiera kolejne ramki
+        raw = await asyncio.to_thread(chat_reply, system_prompt=system_prompt, user_text=user_prompt)
     except Exception:
         return {"extracted": {}, "missing": wanted, "notes": "llm error"}
 
     # twardy parse + sanity-check
     try:
-        obj = json.loads(raw)
+        obj = codec.loads(raw)
         extracted = obj.get("extracted") or {}
         # filtrujemy tylko to, o co prosiliśmy
         extracted = {k: v for k, v in extracted.items() if k in wanted and isinstance(v, dict)}
@@ -88,15 +93,14 @@ class NluBehaviour(CyclicBehaviour):
         _safe_log(self.agent, "[Extractor] behaviour started")
 
     async def run(self):
-        msg = await self.receive(timeout=5)
+        msg = await next_frame(self)  # czeka na ramkę z szablonu, bez odpytywania
         if not msg:
             return
 
-        try:
-            data = json.loads(msg.body or "{}")
-            acl = AclMessage.model_validate(data)
-        except Exception:
+        res = ingest_message(msg)
+        if not res.ok or self.agent.is_duplicate(res.acl):  # powtórzona ramka = drugie wywołanie LLM
             return
+        acl = res.acl
 
         payload = acl.payload or {}
         if payload.get("type") != "ASK":
@@ -110,21 +114,21 @@ class NluBehaviour(CyclicBehaviour):
         session_id = payload.get("session_id") or acl.conversation_id
         wanted = [n for n in need if n.upper() != "EXTRACT"]
 
-        result = await llm_extract_slots(session_id, context, text, wanted)
-
-        # INFORM/FACT, slot nlu.extraction (zgodny z ALLOWED_PERFORMATIVES_BY_TYPE)
-        out = AclMessage.build_inform(
-            conversation_id=acl.conversation_id,
-            payload={"type": "FACT", "slot": "nlu.extraction", "value": result},
-            ontology=NLU_ONTOLOGY,
-        )
-        r = Message(to=str(msg.sender))
-        r.thread = acl.conversation_id
-        r.set_metadata("performative", "INFORM")
-        r.set_metadata("ontology", NLU_ONTOLOGY)
-        r.set_metadata("language", "json")
-        r.body = out.to_json()
-        await self.send(r)
+        # span obsługi pod traceparent koordynatora; odpowiedź niesie go dalej (to_spade_message)
+        with tracing.span("acl.handle", parent=tracing.extract(msg), service="ExtractorAgent",
+                          type="ASK", conv=acl.conversation_id):
+            result = await llm_extract_slots(session_id, context, text, wanted)
+
+            # INFORM/FACT, slot nlu.extraction (zgodny z ALLOWED_PERFORMATIVES_BY_TYPE)
+            out = AclMessage.build_inform(
+                conversation_id=acl.conversation_id,
+                payload={"type": "FACT", "slot": "nlu.extraction", "value": result},
+                ontology=NLU_ONTOLOGY,
+            ).as_reply_to(acl)
+            # wynik ekstrakcji bywa duży -> kodowanie ogłoszone przez pytającego (agents.protocol.wire)
+            encoding = wire.PEERS.choose(msg.sender, len(out.freeze().to_json()))
+            r = out.to_spade_message(to=str(msg.sender), encoding=encoding)
+            await self.send(r)
         _safe_log(self.agent, f"[Extractor] INFORM FACT(nlu.extraction) → {msg.sender}")
 
 class AnnounceCapability(OneShotBehaviour):
@@ -144,6 +148,7 @@ class AnnounceCapability(OneShotBehaviour):
                 "provides": [{"ontology": "nlu", "types": ["SLOTS"]}],
                 "keys": ["nlu.SLOTS"],
                 "agent": os.getenv("EXTRACTOR_AGENT_JID"),
+                "encodings": list(wire.LOCAL_ENCODINGS),
             },
         )
         m = Message(to=self.registry_jid)
@@ -167,6 +172,7 @@ class ExtractorAgent(BaseAgent):
         t.set_metadata("ontology", NLU_ONTOLOGY)
         self.add_behaviour(NluBehaviour(), t)
         _safe_log(self, "[ExtractorAgent] behaviour registered")
+        self.add_control_behaviour()  # PROFILE na ontology=system (agents.common.profiler)
 
         # ogłoszenie CAPABILITY
         reg = os.getenv("REGISTRY_JID")
@@ -1,7 +1,7 @@
 # agents/protocol/__init__.py
 from .acl_messages import AclMessage, Performative
 from .handler import acl_handler, ErrorCode, ERROR_MESSAGES
-from .guards import meta_language_is_json, acl_language_is_json
+from .guards import meta_language_is_json, meta_language_supported, acl_language_is_json
 from .validators import validate_acl_json, validate_acl_dict
 
 __all__ = [
@@ -11,6 +11,7 @@ __all__ = [
     "ErrorCode",
     "ERROR_MESSAGES",
     "meta_language_is_json",
+    "meta_language_supported",
     "acl_language_is_json",
     "validate_acl_json",
     "validate_acl_dict",
@@ -2,10 +2,10 @@
 from __future__ import annotations
 from enum import Enum
 from typing import Any, Dict, Optional
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 from datetime import datetime, timezone
-import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +26,7 @@ ALLOWED_PERFORMATIVES_BY_TYPE: Dict[str, set[Performative]] = {
     "PING": {Performative.REQUEST},
     "ASK": {Performative.REQUEST},
     "METRICS_EXPORT": {Performative.REQUEST},
+    "PROFILE": {Performative.REQUEST},
     "USER_MSG": {Performative.REQUEST},
 
     # fakty i odpowiedzi
@@ -54,6 +55,10 @@ class AclMessage(BaseModel):
     # meta
     schema_version: str = Field("1.0.0", description="ACL schema version")
     ts: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat(), description="UTC timestamp ISO8601")
+    message_id: str = Field(default_factory=lambda: uuid.uuid4().hex, min_length=1, description="Unique message id (dedup)")
+    idempotency_key: Optional[str] = Field(None, description="Sender-chosen key: same key = same logical request")
+    reply_with: Optional[str] = Field(None, description="Id the reply must quote in in_reply_to (FIPA reply-with)")
+    in_reply_to: Optional[str] = Field(None, description="reply_with of the request this message answers")
 
     @field_validator("conversation_id")
     @classmethod
@@ -119,62 +124,87 @@ class AclMessage(BaseModel):
             payload={"type": "ERROR", "code": code, "message": message, "details": details or {}},
         )
 
-    # (opcjonalnie) serializacja skrócona
+    def as_reply_to(self, request: "AclMessage") -> "AclMessage":
+        """Oznacz wiadomość jako odpowiedź na request (in_reply_to = reply_with, bez niego message_id)."""
+        self.in_reply_to = request.reply_with or request.message_id
+        return self
+
+    # ===== Serializacja (raz na wiadomość wychodzącą) =====
+    # freeze(): JSON liczony raz i trzymany w obiekcie — to_spade_message, telemetria i logi
+    # używają tej samej kopii. Przypisanie pola unieważnia cache; zmian w miejscu
+    # (acl.payload["x"] = ...) nie widać, więc po freeze() payloadu się nie modyfikuje.
+    _json: Optional[str] = PrivateAttr(default=None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_") and self._json is not None:
+            self._json = None
+
+    def freeze(self) -> "AclMessage":
+        if self._json is None:
+            self._json = self.model_dump_json()
+        return self
+
+    @property
+    def frozen(self) -> bool:
+        return self._json is not None
+
+    def __eq__(self, other: Any) -> bool:
+        # cache JSON (atrybut prywatny) nie wpływa na równość wiadomości
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+
+    def model_copy(self, *args, **kwargs) -> "AclMessage":
+        copy = super().model_copy(*args, **kwargs)
+        copy._json = None  # kopia (zwłaszcza z update=) koduje się od nowa
+        return copy
+
     def to_json(self) -> str:
-        return self.model_dump_json()
+        return self._json if self._json is not None else self.model_dump_json()
+
+    def to_bytes(self) -> bytes:
+        return self.to_json().encode("utf-8")
 
     @classmethod
     def from_json(cls, data: str) -> "AclMessage":
         return cls.model_validate_json(data)
 
     # ===== Integracja ze SPADE (wymuszenie XMPP thread == conversation_id) =====
-    def to_spade_message(self, to: str):
-        """Zbuduj SPADE Message z gwarancją: msg.thread == conversation_id."""
+    def to_spade_message(self, to: str, encoding: str = "json"):
+        """
+        Zbuduj SPADE Message z gwarancją: msg.thread == conversation_id.
+        encoding != "json" (agents.protocol.wire) trafia do metadanej 'language' — tylko dla peerów, które je ogłosiły.
+        """
         from spade.message import Message  # lokalny import, by nie psuć importów tam, gdzie SPADE nie jest potrzebny
+        from agents.common import tracing
+        from . import wire
 
         msg = Message(to=to)
         # Metadane pomocnicze (nie zastępują body, ale ułatwiają debug)
         msg.set_metadata("performative", self.performative.value)
         msg.set_metadata("ontology", self.ontology)
-        msg.set_metadata("language", self.language)
+        msg.set_metadata("language", self.language if encoding == wire.JSON else encoding)
         msg.set_metadata("conversation_id", self.conversation_id)
+        wire.advertise(msg)  # nasze kodowania -> odbiorca może odpowiedzieć zwięźlej
+        tracing.inject(msg)  # traceparent bieżącego spanu (gdy śledzenie włączone)
 
         # KLUCZ: XMPP thread == conversation_id
         msg.thread = self.conversation_id
 
-        # Treść: pełny JSON AclMessage
-        msg.body = self.model_dump_json()
+        # Treść: pełny JSON AclMessage (z cache, jeśli wiadomość zamrożona) albo zakodowana wg wire
+        msg.body = self.to_json() if encoding == wire.JSON else wire.encode(self, encoding)
         return msg
 
     @classmethod
     def from_spade_message(cls, msg):
         """Odtwórz AclMessage ze SPADE Message, respektując thread jako conversation_id."""
-        try:
-            data = json.loads(getattr(msg, "body", "") or "{}")
-        except Exception as e:
-            raise ValueError(f"Invalid JSON body in SPADE Message: {e}")
-
-        # Ustal conversation_id: najpierw z body, jeśli brak — z thread
-        conv = data.get("conversation_id") or getattr(msg, "thread", None)
-        if not conv:
-            raise ValueError("Missing conversation_id (and XMPP thread)")
-
-        # Ostrzeż, jeśli body i thread się rozjeżdżają
-        thr = getattr(msg, "thread", None)
-        if thr and thr != conv:
-            logger.warning("Thread != conversation_id (thread=%s, conv=%s)", thr, conv)
+        from .ingest import ingest_message  # ingest importuje ten moduł
 
-        data["conversation_id"] = conv
-
-        # Uzupełnij pola z metadanych SPADE (gdy nieobecne w body)
-        meta = getattr(msg, "metadata", {}) or {}
-        data.setdefault("ontology", meta.get("ontology", "default"))
-        data.setdefault("language", meta.get("language", "json"))
-        if "performative" not in data and meta.get("performative"):
-            data["performative"] = meta["performative"]
-
-        # Pydantic zrzutuje string -> Enum Performative
-        return cls(**data)
+        res = ingest_message(msg)
+        if not res.ok:
+            raise ValueError(res.acl.payload.get("details", {}).get("err") or res.error)
+        return res.acl
 
     # ===== Dodatkowe fabryki używane w projekcie =====
 
@@ -218,6 +248,26 @@ class AclMessage(BaseModel):
             payload={"type": "METRICS_EXPORT"},
         )
 
+    @classmethod
+    def build_request_profile(
+        cls,
+        conversation_id: str,
+        action: str = "start",
+        *,
+        seconds: float = 30,
+        mode: str = "sampling",
+        ontology: str = "system",
+    ) -> "AclMessage":
+        payload: Dict[str, Any] = {"type": "PROFILE", "action": action}
+        if action == "start":
+            payload.update(seconds=seconds, mode=mode)
+        return cls(
+            performative=Performative.REQUEST,
+            conversation_id=conversation_id,
+            ontology=ontology,
+            payload=payload,
+        )
+
     @classmethod
     def build_request_user_msg(
         cls,
@@ -226,6 +276,7 @@ class AclMessage(BaseModel):
         *,
         ontology: str = "ui",
         session_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
     ) -> "AclMessage":
         payload = {"type": "USER_MSG", "text": text}
         if session_id:
@@ -235,6 +286,7 @@ class AclMessage(BaseModel):
             conversation_id=conversation_id,
             ontology=ontology,
             payload=payload,
+            idempotency_key=idempotency_key,
         )
 
     @classmethod
@@ -263,11 +315,15 @@ class AclMessage(BaseModel):
         provides: list[dict[str, Any]],
         *,
         ontology: str = "system",
+        encodings: Optional[list[str]] = None,
     ) -> "AclMessage":
         """
         provides: np. [{"ontology": "weather", "types": ["WEATHER_ADVICE"]}]
+        encodings: kodowania body obsługiwane przez nadawcę (agents.protocol.wire.LOCAL_ENCODINGS)
         """
-        payload = {"type": "CAPABILITY", "provides": provides}
+        payload: Dict[str, Any] = {"type": "CAPABILITY", "provides": provides}
+        if encodings:
+            payload["encodings"] = list(encodings)
         return cls(
             performative=Performative.INFORM,
             conversation_id=conversation_id,
@@ -0,0 +1,70 @@
+# agents/protocol/correlation.py
+"""
+Korelacja żądanie -> odpowiedź (FIPA reply-with / in-reply-to) dla BaseAgent.send_request:
+
+    fut = await agent.send_request(behaviour, acl, to_jid)    # acl.reply_with = acl.message_id
+    reply = await asyncio.wait_for(fut, timeout=2.0)          # AclMessage odpowiedzi
+
+Odpowiadający ustawia in_reply_to = reply_with żądania (AclMessage.as_reply_to).
+Pipeline wejściowy (acl_handler, BaseAgent.Inbox) najpierw woła resolve(acl): trafiona
+odpowiedź zamyka future i nie trafia do handle_acl — nikt nie wyciąga cudzych wiadomości
+ze skrzynki w pętli receive().
+
+Peer, który nie odsyła in_reply_to (starsze agenty, skrypty), można dopasować po
+conversation_id — tylko gdy żądanie się tak zarejestrowało (match_conversation=True)
+i tylko dla odpowiedzi bez in_reply_to; kilka żądań w jednej rozmowie rozwiązuje się
+w kolejności wysłania. Spóźniona odpowiedź z nieznanym in_reply_to (jej future już
+wygasł) nie zamyka następnego żądania w tej samej rozmowie.
+Future anulowany (np. timeout w asyncio.wait_for) sam znika z tablic.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class Correlator:
+    def __init__(self):
+        self._by_id: Dict[str, asyncio.Future] = {}
+        self._by_conv: Dict[str, Deque[asyncio.Future]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def expect(self, reply_id: str, *, conversation_id: Optional[str] = None) -> asyncio.Future:
+        """Zarejestruj oczekiwaną odpowiedź; zwraca future z AclMessage odpowiedzi."""
+        fut = asyncio.get_running_loop().create_future()
+        self._by_id[reply_id] = fut
+        if conversation_id:
+            self._by_conv.setdefault(conversation_id, deque()).append(fut)
+        fut.add_done_callback(lambda f: self._forget(reply_id, conversation_id, f))
+        return fut
+
+    def _forget(self, reply_id: str, conversation_id: Optional[str], fut: asyncio.Future) -> None:
+        if self._by_id.get(reply_id) is fut:
+            del self._by_id[reply_id]
+        queue = self._by_conv.get(conversation_id) if conversation_id else None
+        if queue is not None:
+            try:
+                queue.remove(fut)
+            except ValueError:
+                pass
+            if not queue:
+                del self._by_conv[conversation_id]
+
+    def resolve(self, acl: Any) -> bool:
+        """Jeśli acl odpowiada na oczekujące żądanie — zamknij jego future i zwróć True."""
+        if acl.in_reply_to:
+            fut = self._by_id.get(acl.in_reply_to)
+        else:
+            queue = self._by_conv.get(acl.conversation_id)
+            fut = next((f for f in queue if not f.done()), None) if queue else None
+        if fut is None or fut.done():
+            return False
+        fut.set_result(acl)
+        return True
+
+    def cancel_all(self) -> None:
+        for fut in list(self._by_id.values()):
+            fut.cancel()
@@ -0,0 +1,102 @@
+# agents/protocol/dedup.py
+"""
+Filtr powtórzonych ramek ACL, wspólny dla agentów (BaseAgent.is_duplicate):
+
+    window = DedupWindow()               # MAS_DEDUP_MAX_ITEMS / MAS_DEDUP_TTL_S
+    if window.is_duplicate(acl): return
+
+Klucz ramki (dedup_key):
+- idempotency_key -> (conversation_id, klucz): ponowienie tego samego żądania przez nadawcę,
+- message_id z body -> redelivery tej samej wiadomości,
+- ramka bez message_id (stary nadawca) z ts w body -> odcisk (conv, perf, ontology, ts, payload),
+- brak ts i message_id -> nie deduplikujemy (każde wczytanie nadałoby nowe wartości).
+Ta sama treść wysłana ponownie (np. powtórzony tekst użytkownika) ma nowy message_id i przechodzi.
+
+Okno: zbiór kluczy + kolejka (czas, klucz); sprawdzenie i wstawienie O(1), wygaszanie od
+najstarszych — po przekroczeniu liczby kluczy albo wieku.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Hashable, Optional, Set, Tuple
+
+from agents.common import codec
+from agents.common.metrics import counter
+
+DEDUP_MAX_ITEMS = int(os.getenv("MAS_DEDUP_MAX_ITEMS", "4096"))
+DEDUP_TTL_S = float(os.getenv("MAS_DEDUP_TTL_S", "300"))
+
+ACL_DUPLICATES = counter(
+    "acl_duplicates_total", ("agent",),
+    help="Ramki ACL odrzucone jako powtórzenia.",
+)
+
+
+def dedup_key(acl: Any) -> Optional[Hashable]:
+    """Klucz ramki do filtra powtórzeń albo None (ramki nie da się rozpoznać ponownie)."""
+    if acl.idempotency_key:
+        return ("idem", acl.conversation_id, acl.idempotency_key)
+    fields = acl.model_fields_set
+    if "message_id" in fields:
+        return ("id", acl.message_id)
+    if "ts" in fields:
+        try:
+            body = codec.dumpb(acl.payload, sort_keys=True)
+        except Exception:
+            body = str(acl.payload).encode("utf-8")
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        perf = getattr(acl.performative, "value", acl.performative)
+        return ("fp", acl.conversation_id, perf, acl.ontology or "default", acl.ts, digest)
+    return None
+
+
+class DedupWindow:
+    def __init__(
+        self,
+        max_items: int = DEDUP_MAX_ITEMS,
+        ttl_s: float = DEDUP_TTL_S,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_items = max(1, int(max_items))
+        self.ttl_s = float(ttl_s)
+        self._clock = clock
+        self._keys: Set[Hashable] = set()
+        self._order: Deque[Tuple[float, Hashable]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        self._expire(self._clock())
+        return key in self._keys
+
+    def _expire(self, now: float) -> None:
+        if self.ttl_s <= 0:
+            return
+        order, horizon = self._order, now - self.ttl_s
+        while order and order[0][0] <= horizon:
+            self._keys.discard(order.popleft()[1])
+
+    def seen(self, key: Hashable) -> bool:
+        """True, jeśli klucz jest w oknie (powtórzenie); inaczej zapamiętaj go i zwróć False."""
+        now = self._clock()
+        self._expire(now)
+        if key in self._keys:
+            return True
+        self._keys.add(key)
+        self._order.append((now, key))
+        if len(self._order) > self.max_items:
+            self._keys.discard(self._order.popleft()[1])
+        return False
+
+    def is_duplicate(self, acl: Any) -> bool:
+        key = dedup_key(acl)
+        return key is not None and self.seen(key)
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._order.clear()
@@ -1,4 +1,7 @@
 # agents/protocol/guards.py
+from . import wire
+
+
 def meta_language_is_json(msg) -> bool:
     """
     Zwraca True, jeśli w metadanych SPADE 'language' jest 'json'
@@ -11,6 +14,18 @@ def meta_language_is_json(msg) -> bool:
     return (lang is None) or (str(lang).lower() == "json")
 
 
+def meta_language_supported(msg) -> bool:
+    """
+    Jak meta_language_is_json, ale akceptuje też kodowania body z agents.protocol.wire
+    (np. 'json+zlib'), które ten proces potrafi zdekodować.
+    """
+    try:
+        lang = msg.metadata.get("language") if hasattr(msg, "metadata") else None
+    except Exception:
+        lang = None
+    return wire.is_encoding(lang)
+
+
 def acl_language_is_json(acl) -> bool:
     """
     Zwraca True, jeśli acl.language == 'json' (case-insensitive).
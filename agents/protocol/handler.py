@@ -1,13 +1,19 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import inspect
+import time
 from typing import Any, Awaitable, Callable, Optional
 
-from agents.common.telemetry import log_acl_event
-from agents.common.metrics import inc
+from agents.common import tracing
+from agents.common.telemetry import record_acl
+from agents.common.metrics import counter, histogram, inc, timer
 
+from . import wire
 from .acl_messages import AclMessage
-from .validators import validate_acl_json
+from .ingest import BODY_TOO_LARGE, ingest
+from .lanes import CLASSIFIER
+from .mailbox import ConversationMailboxes
 from .spade_utils import to_spade_message
 
 # agents/protocol/handler.py
@@ -33,6 +39,32 @@ ERROR_MESSAGES: dict[str, str] = {
     "UNKNOWN": "Unknown error.",
 }
 
+# metryki ACL z etykietami (wspólne z BaseAgent.send_acl); kardynalność ogranicza rejestr
+ACL_MESSAGES = counter(
+    "acl_messages_total", ("agent", "direction", "performative", "type"),
+    help="Wiadomości ACL odebrane (in) i wysłane (out).",
+)
+ACL_HANDLE_SECONDS = histogram(
+    "acl_handle_seconds", ("agent", "performative", "type"),
+    help="Czas obsługi wiadomości ACL przez handler.",
+)
+ACL_SEND_SECONDS = histogram(
+    "acl_send_seconds", ("agent", "performative", "type"),
+    help="Czas wysyłki wiadomości ACL.",
+)
+ACL_WIRE_BYTES = counter(
+    "acl_wire_bytes_total", ("direction", "encoding"),
+    help="Bajty body ACL na drodze XMPP wg kodowania (agents.protocol.wire).",
+)
+
+
+def acl_labels(acl: AclMessage) -> tuple[str, str]:
+    """(performative, type) do etykiet metryk; brak typu = ""."""
+    perf = getattr(acl.performative, "value", acl.performative)
+    ptype = (acl.payload or {}).get("type")
+    return str(perf), ptype if isinstance(ptype, str) else ""
+
+
 def _sender_jid(raw_msg: Any) -> str:
     s = getattr(raw_msg, "sender", None)
     return str(s) if s is not None else ""
@@ -45,102 +77,157 @@ def _conv_id_from_meta(raw_msg: Any, default: str = "invalid-conv") -> str:
     return default
 
 
+def _idle_seconds(behaviour: Any) -> float:
+    try:
+        return max(0.0, float(getattr(behaviour, "acl_max_idle_s", 0) or 0))  # 0 = wyłączone
+    except Exception:
+        return 0.0
+
+
+WAKE = object()  # znacznik w behaviour.queue: obudź konsumenta po kill() (wake())
+
+
+async def next_frame(behaviour: Any, *, idle_s: float = 0.0) -> Optional[Any]:
+    """
+    Następna ramka dla behaviour bez odpytywania: czeka wprost na jego kolejce SPADE (behaviour.queue).
+    idle_s > 0 -> None po idle_s bez ramek (jeden timer zamiast cyklicznych wybudzeń).
+    Znacznik WAKE (wake(), np. z BaseAgent.stop) -> None, więc pętla _step widzi kill() i woła on_end().
+    Behaviour bez kolejki (atrapy w testach) -> receive(timeout=acl_handler_timeout).
+    """
+    queue = getattr(behaviour, "queue", None)
+    if isinstance(queue, asyncio.Queue):
+        try:
+            item = await asyncio.wait_for(queue.get(), timeout=idle_s) if idle_s > 0 else await queue.get()
+        except asyncio.TimeoutError:
+            return None
+        return None if item is WAKE else item
+    receive = getattr(behaviour, "receive", None)
+    if not callable(receive):
+        return None
+    return await receive(timeout=idle_s or getattr(behaviour, "acl_handler_timeout", 1.0))
+
+
+def wake(behaviour: Any) -> None:
+    """
+    Obudź konsumenta czekającego w next_frame. SPADE kill() tylko ustawia flagę (threading.Event)
+    i niczego nie anuluje — bez tego behaviour czekające bez terminu nie dochodzi do on_end().
+    """
+    queue = getattr(behaviour, "queue", None)
+    if isinstance(queue, asyncio.Queue):
+        queue.put_nowait(WAKE)
+
+
+def _mailboxes(behaviour: Any):
+    """Skrzynki rozmów, gdy behaviour ma acl_concurrency > 0 (agents.protocol.mailbox); inaczej None."""
+    try:
+        limit = int(getattr(behaviour, "acl_concurrency", 0) or 0)
+    except Exception:
+        limit = 0
+    if limit <= 0:
+        return None
+    provider = getattr(getattr(behaviour, "agent", None), "mailboxes", None)
+    if callable(provider):
+        return provider(limit)
+    boxes = getattr(behaviour, "_acl_mailboxes", None)
+    if boxes is None:
+        boxes = ConversationMailboxes(max_concurrency=limit, name=type(behaviour).__name__)
+        setattr(behaviour, "_acl_mailboxes", boxes)
+    return boxes
+
+
 def acl_handler(fn: Callable[..., Awaitable[None]]):
     async def wrapper(self, maybe_raw_msg: Optional[Any] = None):
         raw_msg = maybe_raw_msg
 
-        # Tryb A: bez wiadomości -> odbierz ze skrzynki (SPADE) z „idle guardem”
+        # Tryb A: bez wiadomości -> czekaj na skrzynkę behaviour (bez odpytywania) ze strażnikiem bezczynności
         if raw_msg is None:
-            receive = getattr(self, "receive", None)
-            if not callable(receive):
-                return
-
-            timeout = getattr(self, "acl_handler_timeout", 1.0)
-            raw_msg = await receive(timeout=timeout)
+            idle_s = _idle_seconds(self)
+            now = time.monotonic()
+            last = getattr(self, "_acl_last_frame", None)
+            if last is None:
+                last = now
+                setattr(self, "_acl_last_frame", now)
+            if idle_s > 0:
+                remaining = last + idle_s - now
+                raw_msg = await next_frame(self, idle_s=remaining) if remaining > 0 else None
+            else:
+                raw_msg = await next_frame(self)
 
             if raw_msg is None:
-                # idle guard
-                try:
-                    max_idle = int(getattr(self, "acl_max_idle_ticks", 0))  # 0 = wyłączone
-                except Exception:
-                    max_idle = 0
-
-                if max_idle > 0:
-                    ticks = int(getattr(self, "_acl_idle_ticks", 0)) + 1
-                    setattr(self, "_acl_idle_ticks", ticks)
-                    if ticks >= max_idle:
-                        kill = getattr(self, "kill", None)
-                        if callable(kill):
-                            await kill()
-                        return
+                if idle_s > 0:  # None przy włączonym strażniku = termin bezczynności minął
+                    kill = getattr(self, "kill", None)
+                    if callable(kill):
+                        res = kill()  # SPADE: kill() synchroniczne; atrapy bywają async
+                        if inspect.isawaitable(res):
+                            await res
                 return
-            else:
-                # reset licznika, skoro przyszła realna wiadomość
-                if hasattr(self, "_acl_idle_ticks"):
-                    setattr(self, "_acl_idle_ticks", 0)
-
+            setattr(self, "_acl_last_frame", time.monotonic())
 
-        body = getattr(raw_msg, "body", "") or ""
         fallback_cid = _conv_id_from_meta(raw_msg)
-
-        # NEW: limit rozmiaru body (UTF-8 bytes)
         try:
             max_bytes = int(getattr(self, "acl_max_body_bytes", 64 * 1024))
         except Exception:
             max_bytes = 64 * 1024
-        size_bytes = len(body.encode("utf-8"))
-        if size_bytes > max_bytes:
-            # metrics
-            try:
-                inc("acl_in_body_too_large_total", 1)
-            except Exception:
-                pass
-
-            fail = AclMessage.build_failure(
-                conversation_id=fallback_cid,
-                code="VALIDATION_ERROR",
-                message="ACL body too large",
-                details={"size_bytes": size_bytes, "max_bytes": max_bytes},
-            )
-            to = _sender_jid(raw_msg)
-            if to:
-                await self.send(to_spade_message(fail, to))
-            return
-
-        # END NEW
 
-        ok, acl = validate_acl_json(body, fallback_conversation_id=fallback_cid)
-        if not ok:
-            # metrics
+        # limit rozmiaru + jedno dekodowanie body + walidacja (agents.protocol.ingest)
+        wire.PEERS.learn_from_message(raw_msg)
+        encoding = wire.body_encoding(raw_msg)
+        res = ingest(
+            getattr(raw_msg, "body", "") or "",
+            max_bytes=max_bytes,
+            fallback_conversation_id=fallback_cid,
+            encoding=encoding,
+        )
+        if not res.ok:
             try:
-                inc("acl_in_validation_errors_total", 1)
+                inc("acl_in_body_too_large_total" if res.error == BODY_TOO_LARGE else "acl_in_validation_errors_total", 1)
             except Exception:
                 pass
 
             to = _sender_jid(raw_msg)
             if to:
-                await self.send(to_spade_message(acl, to))
+                await self.send(to_spade_message(res.acl, to))
             return
+        acl = res.acl
 
-        # TELEMETRIA IN (po udanym parsowaniu ACL)
+        # TELEMETRIA IN: zdekodowany body, bez ponownej serializacji
         try:
-            log_acl_event(acl.conversation_id, "IN", json.loads(acl.to_json()))
+            record_acl("IN", acl, res.data)
         except Exception:
             pass
-        
-        # ⬇⬇⬇ METRICS IN — NOWA WSTAWKA
+
+        perf, ptype = acl_labels(acl)
+        owner = getattr(getattr(self, "agent", None), "name", None) or type(self).__name__
         try:
             inc("acl_in_total", 1)
-            p = getattr(acl, "performative", None)
-            if p and getattr(p, "value", None):
-                inc(f"acl_in_performative_{p.value}", 1)
-            ptype = (acl.payload or {}).get("type")
-            if isinstance(ptype, str):
-                inc(f"acl_in_type_{ptype}", 1)
+            ACL_MESSAGES.labels(owner, "in", perf, ptype).inc()
+            ACL_WIRE_BYTES.labels("in", encoding).inc(res.size)
         except Exception:
             pass
-        # ⬆⬆⬆ KONIEC WSTAWKI
 
-        await fn(self, acl, raw_msg)
+        # odpowiedź na send_request: zamyka future (agents.protocol.correlation), nie idzie do handlera
+        resolve = getattr(getattr(self, "agent", None), "resolve_reply", None)
+        if callable(resolve) and resolve(acl):
+            return
+        # komunikaty sterujące agenta (PROFILE, BaseAgent.handle_control) — przed routerem i skrzynkami
+        control = getattr(getattr(self, "agent", None), "handle_control", None)
+        if callable(control) and await control(self, raw_msg, acl):
+            return
+
+        parent = tracing.extract(raw_msg)  # traceparent nadawcy (send_acl / to_spade_message)
+
+        async def handle() -> None:
+            with tracing.span("acl.handle", parent=parent, service=owner, type=ptype, perf=perf,
+                              conv=acl.conversation_id):
+                with timer(ACL_HANDLE_SECONDS.labels(owner, perf, ptype)):
+                    await fn(self, acl, raw_msg)
+
+        # tryb współbieżny: kolejka per rozmowa, sloty wg pasa priorytetu; odbiór nie czeka na obsługę
+        boxes = _mailboxes(self)
+        if boxes is not None:
+            key = acl.conversation_id or getattr(raw_msg, "thread", None) or _sender_jid(raw_msg)
+            boxes.submit(key, handle, lane=CLASSIFIER.lane_for(acl))
+            return
+        await handle()
     return wrapper
 
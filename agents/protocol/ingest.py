@@ -0,0 +1,137 @@
+# agents/protocol/ingest.py
+"""
+Jedna ścieżka wejścia ACL dla acl_handler, BaseAgent.parse_acl i behaviourów registry/weather/extractor:
+
+    res = ingest(body, max_bytes=64 * 1024)            # handler: sam body
+    res = ingest_message(msg)                          # SPADE Message: thread/metadane jako uzupełnienie
+    if res.ok: res.acl (AclMessage), res.data (zdekodowany dict, np. dla telemetrii)
+    else:      res.error ("BODY_TOO_LARGE" | "VALIDATION_ERROR"), res.acl = gotowe FAILURE/ERROR
+
+- rozmiar bez kopii całego body: dla tekstu ASCII len(body) == liczba bajtów UTF-8, tekst spoza
+  ASCII liczony encode kawałkami; ta sama liczba idzie do limitu, szczegółów błędu i metryk,
+- JSON dekodowany raz (agents.common.codec.loads — orjson, gdy jest), walidacja z dict przez TypeAdapter tworzony raz na proces,
+- zdekodowany dict idzie dalej (telemetria) — nikt nie robi json.loads(acl.to_json()),
+- body w kodowaniu z agents.protocol.wire (metadana 'language', np. json+zlib) dekoduje wire.decode;
+  limit rozmiaru liczy body na drodze, rozpakowanie ma własny limit.
+Benchmark: python scripts/bench_acl_ingest.py
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from agents.common import codec
+
+from . import wire
+from .acl_messages import AclMessage
+from .errors import ErrorCode, ERROR_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+_ADAPTER: TypeAdapter[AclMessage] = TypeAdapter(AclMessage)
+
+BODY_TOO_LARGE = "BODY_TOO_LARGE"
+VALIDATION_ERROR = ErrorCode.VALIDATION_ERROR.value
+
+
+class Ingested(NamedTuple):
+    ok: bool
+    acl: Optional[AclMessage]      # wiadomość albo (ok=False) gotowa odpowiedź FAILURE/ERROR
+    data: Optional[Dict[str, Any]]  # zdekodowany body (po uzupełnieniach z SPADE)
+    size: int                      # bajty UTF-8 body (dla bytes: len)
+    error: Optional[str] = None
+
+
+_SIZE_CHUNK = 64 * 1024
+
+
+def utf8_size(body: str) -> int:
+    """
+    Rozmiar body w bajtach UTF-8: ASCII bez kopii, reszta encode po _SIZE_CHUNK znaków
+    (bez kopii całego, np. za dużego, body).
+    """
+    if body.isascii():
+        return len(body)
+    if len(body) <= _SIZE_CHUNK:
+        return len(body.encode("utf-8"))
+    return sum(len(body[i:i + _SIZE_CHUNK].encode("utf-8")) for i in range(0, len(body), _SIZE_CHUNK))
+
+
+def validate_data(data: Any) -> AclMessage:
+    """dict -> AclMessage (ValidationError przy błędzie); bez ponownego JSON."""
+    return _ADAPTER.validate_python(data)
+
+
+def _failure(conversation_id: str, message: str, details: Dict[str, Any]) -> AclMessage:
+    return AclMessage.build_failure(
+        conversation_id=conversation_id,
+        code=VALIDATION_ERROR,
+        message=message,
+        details=details,
+    )
+
+
+def _spade_defaults(data: Dict[str, Any], msg: Any) -> None:
+    """Uzupełnienia jak w AclMessage.from_spade_message: conversation_id z thread, reszta z metadanych."""
+    thr = getattr(msg, "thread", None)
+    conv = data.get("conversation_id") or thr
+    if thr and conv and thr != conv:
+        logger.warning("Thread != conversation_id (thread=%s, conv=%s)", thr, conv)
+    if conv:
+        data["conversation_id"] = conv
+    meta = getattr(msg, "metadata", None) or {}
+    data.setdefault("ontology", meta.get("ontology", "default"))
+    lang = meta.get("language", "json")
+    data.setdefault("language", "json" if wire.is_encoding(lang) else lang)  # kodowanie body to nie język treści
+    if "performative" not in data and meta.get("performative"):
+        data["performative"] = meta["performative"]
+
+
+def ingest(
+    body: Any,
+    *,
+    max_bytes: Optional[int] = None,
+    fallback_conversation_id: str = "invalid-conv",
+    msg: Any = None,
+    encoding: Optional[str] = None,
+) -> Ingested:
+    """
+    Limit rozmiaru, jedno dekodowanie body, walidacja dict; msg (SPADE) = uzupełnienia z thread/metadanych,
+    encoding = kodowanie body (wire; None/json = JSON).
+    """
+    body = body or ""
+    size = len(body) if isinstance(body, (bytes, bytearray)) else utf8_size(body)
+    if max_bytes is not None and size > max_bytes:
+        fail = _failure(fallback_conversation_id, "ACL body too large", {"size_bytes": size, "max_bytes": max_bytes})
+        return Ingested(False, fail, None, size, BODY_TOO_LARGE)
+
+    if not body and msg is not None:
+        body = "{}"  # pusty body SPADE: wszystko z thread/metadanych
+    data = None
+    try:
+        data = codec.loads(body) if encoding in (None, wire.JSON) else wire.decode(body, encoding, max_bytes=max_bytes)
+        if msg is not None and isinstance(data, dict):
+            _spade_defaults(data, msg)
+        return Ingested(True, _ADAPTER.validate_python(data), data, size)
+    except wire.InflateLimitExceeded as e:
+        details = {"size_bytes": size, "max_bytes": max_bytes, "max_inflated_bytes": e.limit, "encoding": encoding}
+        return Ingested(False, _failure(fallback_conversation_id, "ACL body too large", details), None, size, BODY_TOO_LARGE)
+    except (ValidationError, ValueError) as e:
+        fail = _failure(fallback_conversation_id, ERROR_MESSAGES[ErrorCode.VALIDATION_ERROR], {"err": str(e)})
+        return Ingested(False, fail, data if isinstance(data, dict) else None, size, VALIDATION_ERROR)
+
+
+def ingest_message(msg: Any, *, max_bytes: Optional[int] = None) -> Ingested:
+    """ingest() dla SPADE Message (body + thread + metadata); zapamiętuje kodowania ogłoszone przez nadawcę."""
+    meta = getattr(msg, "metadata", None) or {}
+    fallback = meta.get("conversation_id") or getattr(msg, "thread", None) or "invalid-conv"
+    wire.PEERS.learn_from_message(msg)
+    return ingest(
+        getattr(msg, "body", "") or "",
+        max_bytes=max_bytes,
+        fallback_conversation_id=fallback,
+        msg=msg,
+        encoding=wire.body_encoding(msg),
+    )
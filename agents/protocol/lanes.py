@@ -0,0 +1,158 @@
+# agents/protocol/lanes.py
+"""
+Klasy priorytetu (pasy) dla ruchu przychodzącego i sprawiedliwy przydział slotów obsługi.
+
+    LANES = "ui:8,nlu:3,system:1"                    # MAS_ACL_LANES: pas:waga, kolejność = priorytet
+    RULES = "type:USER_MSG=ui,ontology:system=system" # MAS_ACL_LANE_RULES
+    lane = CLASSIFIER.lane_for(acl)                  # najpierw payload.type, potem ontology
+
+- klasyfikacja to dwa zapytania do słownika; bez dopasowania -> MAS_ACL_LANE_DEFAULT,
+- LaneSlots zastępuje semafor skrzynek rozmów (agents.protocol.mailbox): gdy wszystkie
+  sloty są zajęte, zwolniony slot dostaje pas wybrany ważonym round-robinem (smooth WRR) —
+  przy wagach 8/3/1 burst ramek system dostaje co najwyżej 1 z 12 slotów, ale nie głodzieje,
+- metryki per pas: acl_lane_depth{agent, lane} (ramki czekające na obsługę) i
+  acl_lane_wait_seconds{agent, lane} (od przyjęcia ramki do startu obsługi).
+Pasy działają w trybie współbieżnym (acl_concurrency > 0); w trybie ramka po ramce nie ma kolejki.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from agents.common.metrics import gauge, histogram
+
+DEFAULT_LANES = "ui:8,nlu:3,system:1"
+DEFAULT_RULES = (
+    "type:USER_MSG=ui,type:PRESENTER_REPLY=ui,type:TO_USER=ui,"
+    "type:CAPABILITY=system,type:METRICS_EXPORT=system,type:CONFIRM=system,type:PING=system,"
+    "ontology:ui=ui,ontology:nlu=nlu,ontology:system=system"
+)
+
+ACL_LANE_DEPTH = gauge(
+    "acl_lane_depth", ("agent", "lane"),
+    help="Ramki ACL czekające na obsługę w pasie priorytetu.",
+)
+ACL_LANE_WAIT_SECONDS = histogram(
+    "acl_lane_wait_seconds", ("agent", "lane"),
+    help="Czas od przyjęcia ramki ACL do startu obsługi, per pas priorytetu.",
+)
+
+
+def parse_lanes(spec: Optional[str]) -> Dict[str, int]:
+    """"ui:8,nlu:3,system:1" -> {"ui": 8, "nlu": 3, "system": 1} (kolejność zachowana; waga >= 1)."""
+    lanes: Dict[str, int] = {}
+    for item in (spec or "").split(","):
+        name, _, weight = item.strip().partition(":")
+        if not name:
+            continue
+        try:
+            lanes[name] = max(1, int(weight or 1))
+        except ValueError:
+            lanes[name] = 1
+    return lanes or parse_lanes(DEFAULT_LANES)
+
+
+def parse_rules(spec: Optional[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """"type:USER_MSG=ui,ontology:nlu=nlu" -> ({"USER_MSG": "ui"}, {"nlu": "nlu"}); błędne wpisy pomijane."""
+    by_type: Dict[str, str] = {}
+    by_ontology: Dict[str, str] = {}
+    for item in (spec or "").split(","):
+        match, _, lane = item.strip().partition("=")
+        kind, _, value = match.partition(":")
+        if not lane or not value:
+            continue
+        if kind == "type":
+            by_type[value] = lane
+        elif kind == "ontology":
+            by_ontology[value] = lane
+    return by_type, by_ontology
+
+
+class LaneClassifier:
+    def __init__(self, rules: Optional[str] = DEFAULT_RULES, *, default: str = "nlu"):
+        self.by_type, self.by_ontology = parse_rules(rules)
+        self.default = default
+
+    def lane_for(self, acl: Any) -> str:
+        ptype = (acl.payload or {}).get("type")
+        lane = self.by_type.get(ptype) if isinstance(ptype, str) else None
+        return lane or self.by_ontology.get(acl.ontology) or self.default
+
+
+LANES = parse_lanes(os.getenv("MAS_ACL_LANES", DEFAULT_LANES))
+CLASSIFIER = LaneClassifier(
+    os.getenv("MAS_ACL_LANE_RULES", DEFAULT_RULES),
+    default=os.getenv("MAS_ACL_LANE_DEFAULT", "nlu"),
+)
+
+
+class LaneSlots:
+    """
+    Semafor z pasami: acquire(lane) czeka na slot, release() oddaje go pasowi wybranemu
+    ważonym round-robinem spośród pasów z oczekującymi. Nieznany pas = najniższy priorytet.
+    """
+
+    def __init__(self, max_concurrency: int, lanes: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.weights: Dict[str, int] = dict(lanes or LANES)
+        self._lowest = next(reversed(self.weights))
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in self.weights}
+        self._current: Dict[str, int] = {lane: 0 for lane in self.weights}
+        self._in_use = 0
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def lane(self, name: Optional[str]) -> str:
+        return name if name in self.weights else self._lowest
+
+    def waiting(self, lane: str) -> int:
+        return len(self._waiters[self.lane(lane)])
+
+    async def acquire(self, lane: Optional[str] = None) -> None:
+        lane = self.lane(lane)
+        if self._in_use < self.max_concurrency and not any(self._waiters.values()):
+            self._in_use += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(fut)
+        try:
+            await fut  # release() przekazuje slot bez zmiany _in_use
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # slot przyznany tuż przed anulowaniem — oddaj dalej
+            else:
+                try:
+                    self._waiters[lane].remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self) -> None:
+        lane = self._pick()
+        while lane is not None:
+            fut = self._waiters[lane].popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+            lane = self._pick()
+        self._in_use = max(0, self._in_use - 1)
+
+    def _pick(self) -> Optional[str]:
+        """Smooth weighted round-robin po pasach z oczekującymi."""
+        best, total = None, 0
+        for lane, waiters in self._waiters.items():
+            if not waiters:
+                self._current[lane] = 0  # pas bez kolejki nie zbiera kredytu
+                continue
+            weight = self.weights[lane]
+            total += weight
+            self._current[lane] += weight
+            if best is None or self._current[lane] > self._current[best]:
+                best = lane
+        if best is not None:
+            self._current[best] -= total
+        return best
@@ -0,0 +1,171 @@
+# agents/protocol/mailbox.py
+"""
+Skrzynki per rozmowa: równoległość między rozmowami, kolejność w obrębie rozmowy.
+
+    boxes = ConversationMailboxes(max_concurrency=8)
+    boxes.submit(acl.conversation_id, lambda: handle(acl), lane="ui")   # nie czeka na obsługę
+
+- każda rozmowa (conversation_id / XMPP thread) ma własną kolejkę i jedno zadanie,
+  które obsługuje ramki po kolei — rozmowa czekająca na LLM nie blokuje innych,
+- sloty ograniczają liczbę obsług w toku (max_concurrency) dla całego agenta; przy pełnym
+  obciążeniu wolny slot dostaje pas priorytetu wg wag (agents.protocol.lanes),
+- zadanie bez pracy czeka idle_s na kolejną ramkę, potem kończy się i skrzynka znika,
+- błąd obsługi trafia do on_error (log) i nie zatrzymuje kolejnych ramek rozmowy.
+Używane przez acl_handler i BaseAgent.Inbox, gdy behaviour ma acl_concurrency > 0.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from agents.common.metrics import counter, gauge
+
+from .lanes import ACL_LANE_DEPTH, ACL_LANE_WAIT_SECONDS, LaneSlots
+
+Job = Callable[[], Awaitable[None]]
+
+ACL_MAILBOXES = gauge(
+    "acl_mailboxes", ("agent",),
+    help="Aktywne skrzynki rozmów (agents.protocol.mailbox).",
+)
+ACL_MAILBOX_REAPED = counter(
+    "acl_mailbox_reaped_total", ("agent",),
+    help="Skrzynki rozmów zamknięte po bezczynności.",
+)
+
+
+class _Mailbox:
+    __slots__ = ("jobs", "wake", "task")
+
+    def __init__(self):
+        self.jobs: Deque[Tuple[Job, str, float]] = deque()  # (obsługa, pas, czas przyjęcia)
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class ConversationMailboxes:
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 8,
+        idle_s: float = 30.0,
+        name: str = "",
+        lanes: Optional[Dict[str, int]] = None,
+        on_error: Optional[Callable[[Hashable, BaseException], None]] = None,
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.idle_s = max(0.0, float(idle_s))
+        self.name = name
+        self._on_error = on_error
+        self._slots = LaneSlots(self.max_concurrency, lanes)
+        self._depth: Dict[str, int] = {lane: 0 for lane in self._slots.weights}
+        self._boxes: Dict[Hashable, _Mailbox] = {}
+        self._unfinished = 0            # ramki w kolejkach + w obsłudze
+        self._all_done = asyncio.Event()
+        self._all_done.set()
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._boxes
+
+    @property
+    def pending(self) -> int:
+        """Ramki czekające w skrzynkach (bez tych w obsłudze)."""
+        return sum(len(box.jobs) for box in self._boxes.values())
+
+    def depth(self, lane: str) -> int:
+        """Ramki pasa czekające na start obsługi."""
+        return self._depth.get(self._slots.lane(lane), 0)
+
+    def submit(self, key: Hashable, job: Job, *, lane: Optional[str] = None) -> None:
+        """Dołóż obsługę ramki do skrzynki rozmowy; zadanie skrzynki startuje przy pierwszej ramce."""
+        lane = self._slots.lane(lane)
+        box = self._boxes.get(key)
+        if box is None:
+            box = self._boxes[key] = _Mailbox()
+            box.task = asyncio.ensure_future(self._drain(key, box))
+            self._set_gauge()
+        box.jobs.append((job, lane, time.perf_counter()))
+        box.wake.set()
+        self._set_depth(lane, +1)
+        self._unfinished += 1
+        self._all_done.clear()
+
+    async def _drain(self, key: Hashable, box: _Mailbox) -> None:
+        try:
+            while True:
+                while box.jobs:
+                    job, lane, t0 = box.jobs[0]
+                    await self._slots.acquire(lane)
+                    box.jobs.popleft()
+                    self._set_depth(lane, -1)
+                    try:
+                        ACL_LANE_WAIT_SECONDS.labels(self.name, lane).observe(time.perf_counter() - t0)
+                    except Exception:
+                        pass
+                    try:
+                        await job()
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        if self._on_error is not None:
+                            self._on_error(key, e)
+                    finally:
+                        self._slots.release()
+                        self._job_done()
+                box.wake.clear()
+                try:
+                    await asyncio.wait_for(box.wake.wait(), timeout=self.idle_s)
+                except asyncio.TimeoutError:
+                    if not box.jobs:
+                        break  # bezczynna: zamknij skrzynkę
+            try:
+                ACL_MAILBOX_REAPED.labels(self.name).inc()
+            except Exception:
+                pass
+        finally:
+            if self._boxes.get(key) is box:
+                del self._boxes[key]
+                self._set_gauge()
+
+    def _job_done(self) -> None:
+        self._unfinished -= 1
+        if self._unfinished <= 0:
+            self._unfinished = 0
+            self._all_done.set()
+
+    def _set_depth(self, lane: str, delta: int) -> None:
+        self._depth[lane] = max(0, self._depth[lane] + delta)
+        try:
+            ACL_LANE_DEPTH.labels(self.name, lane).set(self._depth[lane])
+        except Exception:
+            pass
+
+    def _set_gauge(self) -> None:
+        try:
+            ACL_MAILBOXES.labels(self.name).set(len(self._boxes))
+        except Exception:
+            pass
+
+    async def join(self) -> None:
+        """Poczekaj, aż wszystkie skrzynki opróżnią kolejki (testy, łagodne zatrzymanie)."""
+        await self._all_done.wait()
+
+    async def aclose(self) -> None:
+        """Anuluj zadania skrzynek (ramki w kolejkach przepadają) i poczekaj, aż się zakończą."""
+        me = asyncio.current_task()
+        tasks = []
+        for box in list(self._boxes.values()):
+            if box.task is not None and box.task is not me:  # stop() wołany z obsługi ramki
+                box.task.cancel()
+                tasks.append(box.task)
+            for _, lane, _ in box.jobs:
+                self._set_depth(lane, -1)
+            box.jobs.clear()
+        self._unfinished = 0
+        self._all_done.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
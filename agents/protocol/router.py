@@ -0,0 +1,203 @@
+# agents/protocol/router.py
+"""
+Deklaratywny routing ACL po (ontology, performative, payload.type):
+
+    ROUTER = Router("coordinator", middleware=(wire_log, dedup, timed))
+
+    class CoordinatorAgent(BaseAgent):
+        @ROUTER.route("FACT", middleware=(requires("slot"),))
+        async def _on_fact(self, behaviour, spade_msg, acl): ...
+
+        @ROUTER.fallback
+        async def _on_other(self, behaviour, spade_msg, acl): ...
+
+        async def handle_acl(self, behaviour, spade_msg, acl):
+            await ROUTER.dispatch(self, behaviour, spade_msg, acl)
+
+- dispatch to stała liczba zapytań do słownika (najpierw dokładne ontology/performative,
+  potem None = dowolne); bez dopasowania: fallback i licznik acl_unrouted_total,
+- middleware to fabryka (route, next) -> next składana raz, przy rejestracji:
+  zewnętrzne = routera, wewnętrzne = trasy; w obsłudze wiadomości nie ma już wyszukiwań,
+- timed mierzy czas obsługi per trasa: histogram acl_route_seconds{router, route}.
+Handler dostaje agenta jako self (metody klasy agenta działają bez zmian).
+"""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from agents.common.metrics import counter, histogram, timer
+
+from .acl_messages import AclMessage
+
+Handler = Callable[[Any, Any, Any, AclMessage], Awaitable[None]]
+Middleware = Callable[["Route", Handler], Handler]
+RouteKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+ACL_ROUTE_SECONDS = histogram(
+    "acl_route_seconds", ("router", "route"),
+    help="Czas obsługi wiadomości ACL per trasa routera.",
+)
+ACL_UNROUTED = counter(
+    "acl_unrouted_total", ("router", "type"),
+    help="Wiadomości ACL bez trasy w routerze (obsłużone przez fallback albo pominięte).",
+)
+
+
+def _perf(acl: AclMessage) -> str:
+    return str(getattr(acl.performative, "value", acl.performative))
+
+
+class Route:
+    def __init__(self, router: str, name: str, key: RouteKey, handler: Handler):
+        self.router = router
+        self.name = name
+        self.key = key
+        self.handler = handler
+        self.call: Handler = handler  # handler owinięty w middleware
+
+    def __repr__(self) -> str:
+        return f"Route({self.router}:{self.name} {self.key})"
+
+
+class Router:
+    def __init__(self, name: str, *, middleware: Iterable[Middleware] = ()):
+        self.name = name
+        self.middleware: Tuple[Middleware, ...] = tuple(middleware)
+        self._routes: Dict[RouteKey, Route] = {}
+        self._fallback: Optional[Route] = None
+
+    # ------------ rejestracja ------------
+    def _build(self, name: str, key: RouteKey, fn: Handler, middleware: Iterable[Middleware]) -> Route:
+        route = Route(self.name, name, key, fn)
+        call = fn
+        for mw in reversed((*self.middleware, *middleware)):
+            call = mw(route, call)
+        route.call = call
+        return route
+
+    def route(
+        self,
+        type_: str,
+        *,
+        performative: Optional[str] = None,
+        ontology: Optional[str] = None,
+        middleware: Iterable[Middleware] = (),
+        name: Optional[str] = None,
+    ) -> Callable[[Handler], Handler]:
+        """Dekorator: handler dla payload.type (opcjonalnie zawężony do performative/ontology)."""
+        key: RouteKey = (ontology, performative, type_)
+
+        def deco(fn: Handler) -> Handler:
+            if key in self._routes:
+                raise ValueError(f"route {key} already registered in router {self.name!r}")
+            self._routes[key] = self._build(name or type_, key, fn, middleware)
+            return fn
+
+        return deco
+
+    def fallback(self, fn: Handler) -> Handler:
+        """Dekorator: handler dla wiadomości bez trasy (też przechodzi przez middleware routera)."""
+        self._fallback = self._build("*", (None, None, None), fn, ())
+        return fn
+
+    # ------------ obsługa ------------
+    def resolve(self, acl: AclMessage) -> Optional[Route]:
+        ptype = (acl.payload or {}).get("type")
+        if not isinstance(ptype, str):
+            return None
+        routes, ont, perf = self._routes, acl.ontology, _perf(acl)
+        return (
+            routes.get((ont, perf, ptype))
+            or routes.get((None, perf, ptype))
+            or routes.get((ont, None, ptype))
+            or routes.get((None, None, ptype))
+        )
+
+    async def dispatch(self, agent: Any, behaviour: Any, spade_msg: Any, acl: AclMessage) -> bool:
+        """Obsłuż wiadomość; False = brak trasy (wtedy fallback, jeśli jest)."""
+        route = self.resolve(acl)
+        if route is not None:
+            await route.call(agent, behaviour, spade_msg, acl)
+            return True
+        ptype = (acl.payload or {}).get("type")
+        try:
+            ACL_UNROUTED.labels(self.name, ptype if isinstance(ptype, str) else "").inc()
+        except Exception:
+            pass
+        if self._fallback is not None:
+            await self._fallback.call(agent, behaviour, spade_msg, acl)
+        return False
+
+    def routes(self) -> Dict[RouteKey, Route]:
+        return dict(self._routes)
+
+
+# ------------ middleware ------------
+def timed(route: Route, nxt: Handler) -> Handler:
+    """Czas obsługi trasy -> acl_route_seconds{router, route}."""
+    child = ACL_ROUTE_SECONDS.labels(route.router, route.name)
+
+    async def run(agent, behaviour, spade_msg, acl):
+        with timer(child):
+            await nxt(agent, behaviour, spade_msg, acl)
+
+    return run
+
+
+def dedup(route: Route, nxt: Handler) -> Handler:
+    """Pomiń powtórzone ramki (BaseAgent.is_duplicate, agents.protocol.dedup)."""
+
+    async def run(agent, behaviour, spade_msg, acl):
+        if agent.is_duplicate(acl):
+            return
+        await nxt(agent, behaviour, spade_msg, acl)
+
+    return run
+
+
+def wire_log(route: Route, nxt: Handler) -> Handler:
+    """Jednolinijkowy log WIRE dir=IN (BaseAgent.wire_log) przed obsługą."""
+
+    async def run(agent, behaviour, spade_msg, acl):
+        log = getattr(agent, "wire_log", None)
+        if callable(log):
+            log("IN", acl=acl, spade_msg=spade_msg)
+        await nxt(agent, behaviour, spade_msg, acl)
+
+    return run
+
+
+def thread_guard(route: Route, nxt: Handler) -> Handler:
+    """Ostrzeż, gdy XMPP thread != conversation_id (diagnostyka; wiadomość idzie dalej)."""
+
+    async def run(agent, behaviour, spade_msg, acl):
+        thr = getattr(spade_msg, "thread", None)
+        if thr and thr != acl.conversation_id:
+            agent.log(f"[warn] thread mismatch: thread={thr!r} != conv={acl.conversation_id!r}")
+        await nxt(agent, behaviour, spade_msg, acl)
+
+    return run
+
+
+def requires(*fields: str) -> Middleware:
+    """Walidacja: payload musi mieć pola; inaczej FAILURE/VALIDATION_ERROR do nadawcy."""
+
+    def mw(route: Route, nxt: Handler) -> Handler:
+        async def run(agent, behaviour, spade_msg, acl):
+            payload = acl.payload or {}
+            missing = [f for f in fields if payload.get(f) is None]
+            if not missing:
+                await nxt(agent, behaviour, spade_msg, acl)
+                return
+            fail = AclMessage.build_failure(
+                conversation_id=acl.conversation_id,
+                code="VALIDATION_ERROR",
+                message=f"Missing payload field(s) for {route.name}",
+                details={"missing": missing},
+            )
+            await agent.send_acl(behaviour, fail, to_jid=str(spade_msg.sender))
+            agent.log(f"rejected {route.name}: missing {missing}")
+
+        return run
+
+    return mw
@@ -4,6 +4,7 @@ from typing import Tuple
 from pydantic import ValidationError
 from .acl_messages import AclMessage
 from .errors import ErrorCode, ERROR_MESSAGES
+from .ingest import validate_data
 
 def validate_acl_json(blob: str, *, fallback_conversation_id: str = "invalid-conv") -> Tuple[bool, AclMessage]:
     """
@@ -23,12 +24,10 @@ def validate_acl_json(blob: str, *, fallback_conversation_id: str = "invalid-con
         return False, fail
 
 def validate_acl_dict(data: dict, *, fallback_conversation_id: str = "invalid-conv") -> Tuple[bool, AclMessage]:
-    """Wariant dla już zdekodowanego dict."""
+    """Wariant dla już zdekodowanego dict (walidacja wprost z dict, bez JSON w obie strony)."""
     try:
-        # szybki zrzut do JSON i z powrotem, by przejść przez jeden mechanizm walidacji
-        blob = json.dumps(data)
-        return validate_acl_json(blob, fallback_conversation_id=fallback_conversation_id)
-    except (TypeError, ValueError) as e:
+        return True, validate_data(data)
+    except (ValidationError, TypeError, ValueError) as e:
         fail = AclMessage.build_failure(
             conversation_id=fallback_conversation_id,
             code=ErrorCode.VALIDATION_ERROR.value,
@@ -0,0 +1,215 @@
+# agents/protocol/wire.py
+"""
+Kodowanie body ACL na drodze XMPP, wskazywane metadaną SPADE 'language':
+
+    json           tekst JSON (domyślne; jedyne używane bez negocjacji)
+    json+zlib      JSON skompresowany zlib, base64 (body XMPP musi być tekstem)
+    msgpack        msgpack, base64 — tylko gdy pakiet msgpack jest zainstalowany i tylko na
+                   wyraźne żądanie (to_spade_message(encoding=...)); negocjacja go nie wybiera
+    msgpack+zlib   msgpack skompresowany zlib, base64
+
+Pole AclMessage.language opisuje treść i zostaje "json"; metadana 'language' mówi,
+jak zapisano body. Limit acl_max_body_bytes dotyczy body na drodze (po kompresji),
+a rozpakowanie jest ograniczone do max_bytes * MAS_ACL_MAX_INFLATE_RATIO.
+
+Negocjacja: kodowania innego niż json używamy tylko wobec peera, który je ogłosił:
+- metadana 'encodings' (lista po przecinku) w wiadomościach z AclMessage.to_spade_message,
+- pole "encodings" w CAPABILITY; rejestr oddaje je w odpowiedzi capability.providers.
+PEERS pamięta ogłoszenia per bare JID; nieznany peer dostaje json.
+
+Ustawienia:
+    MAS_ACL_ENCODINGS            obsługiwane lokalnie, w kolejności preferencji (domyślnie wszystkie dostępne)
+    MAS_ACL_COMPRESS_MIN_BYTES   krótszego JSON nie kompresujemy (domyślnie 1024)
+    MAS_ACL_MAX_INFLATE_RATIO    domyślnie 16
+Benchmark: python scripts/bench_acl_wire.py
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import os
+import zlib
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from agents.common import codec
+
+try:
+    import msgpack
+except ImportError:  # opcjonalna zależność
+    msgpack = None
+
+JSON = "json"
+META_ENCODINGS = "encodings"
+
+# kolejność preferencji wg zmierzonego rozmiaru body (scripts/bench_acl_wire.py): json+zlib wychodzi
+# mniejszy niż msgpack+zlib, a samo msgpack w base64 jest większe niż JSON (+10..34%)
+_ALL = ("json+zlib", "msgpack+zlib", JSON, "msgpack")
+# PeerEncodings.choose wybiera tylko spośród nich (i json); "msgpack" wyłącznie na wyraźne żądanie
+AUTO_ENCODINGS = ("json+zlib", "msgpack+zlib")
+AVAILABLE: Tuple[str, ...] = tuple(e for e in _ALL if msgpack is not None or not e.startswith("msgpack"))
+
+
+def parse_encodings(value: Any) -> Tuple[str, ...]:
+    """'a, b' albo lista -> krotka znanych kodowań (małe litery, bez powtórzeń)."""
+    if not value:
+        return ()
+    items = value.split(",") if isinstance(value, str) else value
+    out = []
+    for item in items:
+        enc = str(item).strip().lower()
+        if enc in _ALL and enc not in out:
+            out.append(enc)
+    return tuple(out)
+
+
+def _local_encodings() -> Tuple[str, ...]:
+    wanted = parse_encodings(os.getenv("MAS_ACL_ENCODINGS")) or AVAILABLE
+    out = tuple(e for e in wanted if e in AVAILABLE)
+    return out if JSON in out else out + (JSON,)
+
+
+LOCAL_ENCODINGS = _local_encodings()
+COMPRESS_MIN_BYTES = int(os.getenv("MAS_ACL_COMPRESS_MIN_BYTES", "1024"))
+MAX_INFLATE_RATIO = int(os.getenv("MAS_ACL_MAX_INFLATE_RATIO", "16"))
+ZLIB_LEVEL = 6
+
+
+class InflateLimitExceeded(ValueError):
+    """Body rozpakowuje się do więcej niż dozwolony limit (ochrona przed bombą zlib)."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"inflated body exceeds {limit} bytes")
+        self.limit = limit
+
+
+def is_encoding(value: Any) -> bool:
+    """Czy wartość metadany 'language' to kodowanie body obsługiwane przez ten proces."""
+    return value is None or str(value).lower() in AVAILABLE
+
+
+def body_encoding(msg: Any) -> str:
+    """Kodowanie body wiadomości SPADE (metadana 'language'; brak/inne -> json)."""
+    meta = getattr(msg, "metadata", None) or {}
+    lang = str(meta.get("language") or JSON).lower()
+    return lang if lang in AVAILABLE else JSON
+
+
+# ------------ kodowanie / dekodowanie ------------
+def encode_data(data: Any, encoding: str = JSON) -> str:
+    """Obiekt (dict) -> body w danym kodowaniu."""
+    if encoding == JSON:
+        return codec.dumps(data)
+    return _pack(codec.dumpb(data) if encoding.startswith(JSON) else None, data, encoding)
+
+
+def encode(acl: Any, encoding: str = JSON) -> str:
+    """AclMessage -> body; json+zlib kompresuje JSON z cache wiadomości (freeze)."""
+    if encoding == JSON:
+        return acl.to_json()
+    if encoding.startswith(JSON):
+        return _pack(acl.to_bytes(), None, encoding)
+    return _pack(None, acl.model_dump(mode="json"), encoding)
+
+
+def _pack(raw: Optional[bytes], data: Any, encoding: str) -> str:
+    if encoding not in AVAILABLE:
+        raise ValueError(f"unsupported ACL encoding: {encoding!r}")
+    if raw is None:
+        raw = msgpack.packb(data, use_bin_type=True)
+    if encoding.endswith("+zlib"):
+        raw = zlib.compress(raw, ZLIB_LEVEL)
+    return base64.b64encode(raw).decode("ascii")
+
+
+def decode(body: Any, encoding: Optional[str] = None, *, max_bytes: Optional[int] = None) -> Any:
+    """
+    body -> zdekodowany obiekt. Błędy jako ValueError; InflateLimitExceeded (też ValueError),
+    gdy rozpakowane body przekroczy max_bytes * MAX_INFLATE_RATIO.
+    """
+    enc = str(encoding or JSON).lower()
+    if enc == JSON:
+        return codec.loads(body)
+    if enc not in AVAILABLE:
+        raise ValueError(f"unsupported ACL encoding: {encoding!r}")
+    try:
+        raw = base64.b64decode(body, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"invalid base64 body: {e}") from None
+    if enc.endswith("+zlib"):
+        raw = _inflate(raw, max_bytes * MAX_INFLATE_RATIO if max_bytes else 0)
+    if enc.startswith(JSON):
+        return codec.loads(raw)
+    try:
+        return msgpack.unpackb(raw, raw=False)
+    except Exception as e:
+        raise ValueError(f"invalid msgpack body: {e}") from None
+
+
+def _inflate(raw: bytes, limit: int) -> bytes:
+    d = zlib.decompressobj()
+    try:
+        out = d.decompress(raw, limit)  # limit 0 = bez ograniczenia
+    except zlib.error as e:
+        raise ValueError(f"invalid zlib body: {e}") from None
+    if d.unconsumed_tail:
+        raise InflateLimitExceeded(limit)
+    if not d.eof:
+        raise ValueError("truncated zlib body")
+    return out
+
+
+# ------------ negocjacja ------------
+def bare_jid(jid: Any) -> str:
+    return str(jid or "").split("/", 1)[0]
+
+
+def advertise(msg: Any) -> None:
+    """Dopisz do wiadomości SPADE metadaną 'encodings' (gdy obsługujemy coś poza json)."""
+    if len(LOCAL_ENCODINGS) > 1:
+        msg.set_metadata(META_ENCODINGS, ",".join(LOCAL_ENCODINGS))
+
+
+class PeerEncodings:
+    """bare JID -> kodowania ogłoszone przez peera; ostatnie ogłoszenie wygrywa."""
+
+    def __init__(self, max_peers: int = 10000):
+        self.max_peers = max_peers
+        self._peers: Dict[str, Tuple[str, ...]] = {}
+
+    def learn(self, jid: Any, encodings: Iterable[str] | str | None) -> None:
+        key = bare_jid(jid)
+        encs = parse_encodings(encodings)
+        if not key or not encs:
+            return
+        self._peers.pop(key, None)
+        self._peers[key] = encs
+        if len(self._peers) > self.max_peers:
+            self._peers.pop(next(iter(self._peers)))  # najdawniej ogłoszony
+
+    def learn_from_message(self, msg: Any) -> None:
+        meta = getattr(msg, "metadata", None) or {}
+        if meta.get(META_ENCODINGS):
+            self.learn(getattr(msg, "sender", None), meta[META_ENCODINGS])
+
+    def get(self, jid: Any) -> Tuple[str, ...]:
+        return self._peers.get(bare_jid(jid), ())
+
+    def choose(self, jid: Any, size: int = 0) -> str:
+        """
+        Najlepsze wspólne kodowanie dla peera: poniżej COMPRESS_MIN_BYTES zawsze json, wyżej
+        pierwsze wspólne z AUTO_ENCODINGS (w kolejności LOCAL_ENCODINGS). Samego msgpack nie
+        wybieramy — base64 zjada zysk i body wychodzi większe niż JSON.
+        """
+        theirs = self._peers.get(bare_jid(jid))
+        if not theirs or size < COMPRESS_MIN_BYTES:
+            return JSON
+        for enc in LOCAL_ENCODINGS:
+            if enc in AUTO_ENCODINGS and enc in theirs:
+                return enc
+        return JSON
+
+    def clear(self) -> None:
+        self._peers.clear()
+
+
+PEERS = PeerEncodings()
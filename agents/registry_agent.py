@@ -1,7 +1,6 @@
 # agents/registry_agent.py
 from __future__ import annotations
 import os
-import json
 import asyncio
 from collections import defaultdict
 from typing import Dict, Set, Tuple, List
@@ -12,6 +11,9 @@ from spade.message import Message
 
 from agents.agent import BaseAgent
 from agents.protocol import AclMessage, Performative
+from agents.protocol.handler import next_frame
+from agents.protocol.ingest import ingest_message
+from agents.protocol import wire
 
 REGISTRY_ONTOLOGY = "system"
 
@@ -50,15 +52,14 @@ def _safe_log(agent, msg: str):
 # === BEHAVIOUR: przyjmowanie INFORM/CAPABILITY =================================
 class CapabilityIngestBehav(CyclicBehaviour):
     async def run(self):
-        msg = await self.receive(timeout=5)
+        msg = await next_frame(self)  # czeka na ramkę z szablonu, bez odpytywania
         if not msg:
             return
 
-        try:
-            data = json.loads(msg.body or "{}")
-            acl = AclMessage.model_validate(data)
-        except Exception:
+        res = ingest_message(msg)
+        if not res.ok:
             return
+        acl = res.acl
 
         if acl.performative != Performative.INFORM:
             return
@@ -82,6 +83,12 @@ class CapabilityIngestBehav(CyclicBehaviour):
                 self.agent.registry[key].add(sender)
                 added.append(key)
 
+        # kodowania body ogłoszone przez dostawcę (agents.protocol.wire) — oddawane pytającym
+        encodings = wire.parse_encodings(payload.get("encodings"))
+        if encodings:
+            self.agent.encodings[sender] = list(encodings)
+            wire.PEERS.learn(sender, encodings)
+
         if added:
             _safe_log(self.agent, f"[Registry] + {sender} provides {', '.join(sorted(added))}")
 
@@ -89,18 +96,19 @@ class CapabilityIngestBehav(CyclicBehaviour):
 # === BEHAVIOUR: odpowiadanie na REQUEST/ASK o capability =======================
 class CapabilityQueryBehav(CyclicBehaviour):
     async def run(self):
-        msg = await self.receive(timeout=5)
+        msg = await next_frame(self)  # czeka na ramkę z szablonu, bez odpytywania
         if not msg:
             return
 
-        try:
-            data = json.loads(msg.body or "{}")
-            acl = AclMessage.model_validate(data)
-        except Exception:
+        res = ingest_message(msg)
+        if not res.ok:
             return
+        acl = res.acl
 
         if acl.performative != Performative.REQUEST:
             return
+        if await self.agent.handle_control(self, msg, acl):
+            return  # PROFILE (REQUEST/system trafia do tego behaviour)
         payload = acl.payload or {}
         if payload.get("type") != "ASK":
             return
@@ -121,11 +129,14 @@ class CapabilityQueryBehav(CyclicBehaviour):
             out[k] = providers
 
         reply_payload = {"type": "FACT", "slot": "capability.providers", "value": out}
+        encodings = {jid: self.agent.encodings[jid] for jids in out.values() for jid in jids if jid in self.agent.encodings}
+        if encodings:
+            reply_payload["encodings"] = encodings
         reply_acl = AclMessage.build_inform(
             conversation_id=acl.conversation_id,
             payload=reply_payload,
             ontology=REGISTRY_ONTOLOGY,
-        )
+        ).as_reply_to(acl)  # pytający czeka na future po in_reply_to
 
         r = Message(to=str(msg.sender))
         r.thread = acl.conversation_id
@@ -141,6 +152,8 @@ class RegistryAgent(BaseAgent):
     async def setup(self):
         # Wspólny stan: mapa "ontology.TYPE" -> set(JID)
         self.registry: Dict[str, Set[str]] = defaultdict(set)
+        # bare JID -> kodowania body ogłoszone w CAPABILITY
+        self.encodings: Dict[str, List[str]] = {}
 
         # INFORM/system (CAPABILITY)
         t_inform = Template()
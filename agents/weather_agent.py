@@ -1,7 +1,6 @@
 # agents/weather_agent.py
 from __future__ import annotations
 import os
-import json
 import asyncio
 from typing import Any, Dict
 import time
@@ -17,6 +16,10 @@ from agents.protocol.acl_messages import AclMessage, Performative
 
 from agents.protocol import AclMessage
 from agents.protocol.spade_utils import to_spade_message  # już jest w repo
+from agents.protocol.handler import next_frame
+from agents.protocol.ingest import ingest_message
+from agents.protocol import wire
+from agents.common import codec, tracing
 
 from dotenv import load_dotenv  # pip install python-dotenv
 
@@ -54,104 +57,101 @@ class WeatherAdviceBehav(CyclicBehaviour):
         await self.owm.aclose()
 
     async def run(self):
-        msg = await self.receive(timeout=10)
+        msg = await next_frame(self)  # czeka na ramkę z szablonu, bez odpytywania
         if not msg:
             return
 
-        try:
-            body = json.loads(msg.body or "{}")
-        except Exception:
-            body = {}
-
-        # Spróbuj zmapować do AclMessage (jeśli walidator dopuszcza WEATHER_ADVICE)
-        acl: Dict[str, Any]
-        try:
-            acl_obj = AclMessage.model_validate(body)
-            acl = acl_obj.model_dump()
-        except Exception:
-            # fallback: przyjmij minimalny kontrakt JSON
-            acl = body
+        # jedno dekodowanie body (agents.protocol.ingest); gdy walidator odrzuci wiadomość,
+        # działamy na minimalnym kontrakcie JSON (zdekodowany dict)
+        res = ingest_message(msg)
+        if res.ok and self.agent.is_duplicate(res.acl):
+            return  # powtórzona ramka — bez drugiego zapytania do OpenWeather
+        acl: Dict[str, Any] = res.data or {}
 
         payload = (acl.get("payload") or {})
         if payload.get("type") != WEATHER_TYPE:
             # nie nasze – ignoruj (lub przekaż dalej wg. polityki)
             return
 
-        place = payload.get("place") or ""
-        days  = int(payload.get("days") or 5)
-        lang  = payload.get("lang") or os.getenv("OWM_LANG", "pl")
-        units = payload.get("units") or os.getenv("OWM_UNITS", "metric")
-
-        # Geokoder → bierz pierwszy kandydat
-        candidates = await self.owm.geocode(place, limit=1)
-        if not candidates:
-            await self._reply_error(msg, acl, f"Nie znaleziono lokalizacji dla: {place!r}")
-            return
-
-        c0 = candidates[0]
-        lat, lon = float(c0["lat"]), float(c0["lon"])
-        place_name = f'{c0.get("name") or place}' + (f", {c0.get('country')}" if c0.get("country") else "")
-
-        # Prognoza
-        # agents/weather_agent.py  (wewnątrz async def run, tuż przed: title_and_text = ...)
-        try:
-            fc = await self.owm.forecast_daily(lat, lon, days=days)
-        except Exception as e:
-            await self._reply_error(msg, acl, f"OpenWeather błąd: {e}")
-            return
-        title_and_text, meta = summarize_human(place_name, fc["provider"], fc["data"], days)
-        title, text = title_and_text.split("\n", 1) if "\n" in title_and_text else (title_and_text, "")
-
-        # Budujemy INFORM (ACL)
-        inform_payload = {
-            "type": WEATHER_TYPE,
-            "note": {"title": title, "text": text},
-            "meta": {
-                **meta,
-                "lang": lang,
-                "units": units,
-            },
-        }
-
-        try:
-            # Preferuj ustandaryzowany AclMessage
-            out_acl = AclMessage(
-                performative=Performative.INFORM,
-                conversation_id=acl.get("conversation_id") or (msg.thread or ""),
-                ontology="weather",
-                language="json",
-                payload=inform_payload,
-            )
-            body_out = json.dumps(out_acl.model_dump())
-        except Exception:
-            # fallback – surowy JSON
-            body_out = json.dumps({
-                "performative": "INFORM",
-                "conversation_id": acl.get("conversation_id") or (msg.thread or ""),
-                "ontology": "weather",
-                "language": "json",
-                "payload": inform_payload,
-            })
-
-        reply = Message(to=str(msg.sender))
-        reply.thread = acl.get("conversation_id") or msg.thread  # zachowaj konwersację
-        reply.set_metadata("performative", "INFORM")
-        reply.set_metadata("ontology", "weather")
-        reply.set_metadata("language", "json")
-        reply.body = body_out
-
-        await self.send(reply)
+        with tracing.span("acl.handle", parent=tracing.extract(msg), service="WeatherAgent",
+                          type=WEATHER_TYPE, conv=acl.get("conversation_id")):
+            place = payload.get("place") or ""
+            days  = int(payload.get("days") or 5)
+            lang  = payload.get("lang") or os.getenv("OWM_LANG", "pl")
+            units = payload.get("units") or os.getenv("OWM_UNITS", "metric")
+
+            # Geokoder → bierz pierwszy kandydat
+            candidates = await self.owm.geocode(place, limit=1)
+            if not candidates:
+                await self._reply_error(msg, acl, f"Nie znaleziono lokalizacji dla: {place!r}")
+                return
+
+            c0 = candidates[0]
+            lat, lon = float(c0["lat"]), float(c0["lon"])
+            place_name = f'{c0.get("name") or place}' + (f", {c0.get('country')}" if c0.get("country") else "")
+
+            # Prognoza
+            # agents/weather_agent.py  (wewnątrz async def run, tuż przed: title_and_text = ...)
+            try:
+                fc = await self.owm.forecast_daily(lat, lon, days=days)
+            except Exception as e:
+                await self._reply_error(msg, acl, f"OpenWeather błąd: {e}")
+                return
+            title_and_text, meta = summarize_human(place_name, fc["provider"], fc["data"], days)
+            title, text = title_and_text.split("\n", 1) if "\n" in title_and_text else (title_and_text, "")
+
+            # Budujemy INFORM (ACL)
+            inform_payload = {
+                "type": WEATHER_TYPE,
+                "note": {"title": title, "text": text},
+                "meta": {
+                    **meta,
+                    "lang": lang,
+                    "units": units,
+                },
+            }
+
+            try:
+                # Preferuj ustandaryzowany AclMessage; duże porady idą zwięźlej, jeśli pytający
+                # ogłosił kodowanie (agents.protocol.wire)
+                out_acl = AclMessage(
+                    performative=Performative.INFORM,
+                    conversation_id=acl.get("conversation_id") or (msg.thread or ""),
+                    ontology="weather",
+                    language="json",
+                    payload=inform_payload,
+                    in_reply_to=acl.get("reply_with") or acl.get("message_id"),
+                )
+                encoding = wire.PEERS.choose(msg.sender, len(out_acl.freeze().to_json()))
+                reply = out_acl.to_spade_message(to=str(msg.sender), encoding=encoding)
+            except Exception:
+                # fallback – surowy JSON
+                reply = Message(to=str(msg.sender))
+                reply.thread = acl.get("conversation_id") or msg.thread  # zachowaj konwersację
+                reply.set_metadata("performative", "INFORM")
+                reply.set_metadata("ontology", "weather")
+                reply.set_metadata("language", "json")
+                reply.body = codec.dumps({
+                    "performative": "INFORM",
+                    "conversation_id": acl.get("conversation_id") or (msg.thread or ""),
+                    "ontology": "weather",
+                    "language": "json",
+                    "payload": inform_payload,
+                })
+
+            await self.send(reply)
         if hasattr(self.agent, "log"):
             _safe_log(self.agent, f"[Weather] INFORM sent to {msg.sender} for place={place!r}")
 
     async def _reply_error(self, msg: Message, acl: Dict[str, Any], err: str):
         payload = {"type": WEATHER_TYPE, "error": err}
-        body_out = json.dumps({
+        body_out = codec.dumps({
             "performative": "FAILURE",
             "conversation_id": acl.get("conversation_id") or (msg.thread or ""),
             "ontology": "weather",
             "language": "json",
             "payload": payload,
+            "in_reply_to": acl.get("reply_with") or acl.get("message_id"),
         })
         reply = Message(to=str(msg.sender))
         reply.thread = acl.get("conversation_id") or msg.thread
@@ -159,6 +159,7 @@ class WeatherAdviceBehav(CyclicBehaviour):
         reply.set_metadata("ontology", "weather")
         reply.set_metadata("language", "json")
         reply.body = body_out
+        tracing.inject(reply)
         await self.send(reply)
 
 class AnnounceCapabilityBehav(OneShotBehaviour):
@@ -178,6 +179,7 @@ class AnnounceCapabilityBehav(OneShotBehaviour):
                 "provides": [{"ontology": "weather", "types": ["WEATHER_ADVICE"]}],
                 "keys": ["weather.WEATHER_ADVICE"],
                 "agent": os.getenv("WEATHER_AGENT_JID"),
+                "encodings": list(wire.LOCAL_ENCODINGS),
             },
         )
         m = Message(to=self.registry_jid)
@@ -208,6 +210,7 @@ class WeatherAgent(BaseAgent):
         tpl.set_metadata("ontology", "weather")
         self.add_behaviour(beh, tpl)
         _safe_log(self, "[WeatherAgent] behaviour registered")
+        self.add_control_behaviour()  # PROFILE na ontology=system (agents.common.profiler)
 
         # planujemy ogłoszenie capability jako OneShotBehaviour
         reg_jid = os.getenv("REGISTRY_JID")
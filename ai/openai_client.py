@@ -3,6 +3,9 @@ from __future__ import annotations
 import os
 from typing import Optional
 
+from agents.common import tracing
+from agents.common.metrics import histogram, inc, timer
+
 # Spróbuj załadować oficjalnego klienta OpenAI.
 # Jeśli go nie ma lub brak klucza, po prostu zwracamy None w czasie wywołania.
 try:
@@ -17,6 +20,8 @@ _OPENAI_MAX_TOKENS = int(os.getenv("OPENAI_MAX_TOKENS", "180"))
 
 _client = None
 
+LLM_CHAT_SECONDS = histogram("llm_chat_seconds", ("model",), help="Czas odpowiedzi modelu czatowego.")
+
 def _get_client():
     global _client
     if _client is not None:
@@ -41,16 +46,18 @@ def chat_reply(system_prompt: str, user_text: str) -> Optional[str]:
         return None
     try:
         # API stylu v1.x
-        resp = client.chat.completions.create(
-            model=_OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_text},
-            ],
-            temperature=_OPENAI_TEMPERATURE,
-            max_tokens=_OPENAI_MAX_TOKENS,
-        )
+        with tracing.span("llm.chat", model=_OPENAI_MODEL), timer(LLM_CHAT_SECONDS.labels(model=_OPENAI_MODEL)):
+            resp = client.chat.completions.create(
+                model=_OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_text},
+                ],
+                temperature=_OPENAI_TEMPERATURE,
+                max_tokens=_OPENAI_MAX_TOKENS,
+            )
         content = resp.choices[0].message.content or ""
         return content.strip()
     except Exception:
+        inc("llm_chat_errors_total", 1)
         return None
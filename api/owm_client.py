@@ -8,6 +8,11 @@ from collections import Counter
 from itertools import islice
 import httpx
 
+from agents.common import tracing
+from agents.common.metrics import histogram, timer
+
+OWM_HTTP_SECONDS = histogram("owm_http_seconds", ("endpoint",), help="Czas zapytań HTTP do OpenWeatherMap.")
+
 @dataclass
 class OWMConfig:
     api_key: str
@@ -24,11 +29,16 @@ class OWMClient:
     async def aclose(self):
         await self._http.aclose()
 
+    async def _get(self, endpoint: str, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """GET z pomiarem czasu (histogram per endpoint OWM) i spanem owm.<endpoint>."""
+        with tracing.span(f"owm.{endpoint}"), timer(OWM_HTTP_SECONDS.labels(endpoint=endpoint)):
+            return await self._http.get(url, params=params)
+
     async def geocode(self, q: str, limit: int = 1) -> List[Dict[str, Any]]:
         """Direct geocoding → lista kandydatów (name, lat, lon, country, state)."""
         url = "https://api.openweathermap.org/geo/1.0/direct"
         params = {"q": q, "limit": limit, "appid": self.cfg.api_key}
-        r = await self._http.get(url, params=params)
+        r = await self._get("geocode", url, params)
         r.raise_for_status()
         return r.json() or []
 
@@ -47,7 +57,7 @@ class OWMClient:
                     "lat": lat, "lon": lon, "cnt": max(1, min(days, 16)),
                     "units": self.cfg.units, "lang": self.cfg.lang, "appid": self.cfg.api_key
                 }
-                r = await self._http.get(url, params=params)
+                r = await self._get("forecast16", url, params)
                 r.raise_for_status()
                 return {"provider": "owm_forecast16", "data": r.json()}
             except httpx.HTTPStatusError as e:
@@ -62,7 +72,7 @@ class OWMClient:
                 "lat": lat, "lon": lon, "exclude": "minutely,hourly,alerts",
                 "units": self.cfg.units, "lang": self.cfg.lang, "appid": self.cfg.api_key
             }
-            r = await self._http.get(url, params=params)
+            r = await self._get("onecall3", url, params)
             r.raise_for_status()
             data = r.json()
             if "daily" in data:
@@ -81,7 +91,7 @@ class OWMClient:
             "lat": lat, "lon": lon,
             "units": self.cfg.units, "lang": self.cfg.lang, "appid": self.cfg.api_key
         }
-        r = await self._http.get(url, params=params)
+        r = await self._get("forecast5", url, params)
         r.raise_for_status()
         data = r.json()
         items = data.get("list") or []
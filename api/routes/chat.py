@@ -1,29 +1,118 @@
 # api/routes/chat.py
-from fastapi import APIRouter, Request, HTTPException
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import APIRouter, Header, Request, HTTPException
 from pydantic import BaseModel
 import asyncio
 import os
+import time
+
+from agents.common import tracing
+from agents.protocol.dedup import DEDUP_TTL_S
 
 router = APIRouter()
 
+# Ponowiony POST z tym samym Idempotency-Key: koordynator odrzuca duplikat USER_MSG (dedup),
+# więc odpowiedź pierwszego żądania odtwarzamy tutaj — w toku wspólny future, potem z pamięci.
+# Po API_REPLY_TIMEOUT odpowiedzi czekamy dalej w tle, aż minie okno dedup koordynatora
+# (MAS_DEDUP_TTL_S): dopiero wtedy ponowienie może wysłać USER_MSG od nowa.
+IDEMPOTENCY_TTL_S = float(os.getenv("API_IDEMPOTENCY_TTL_S", "600"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("API_IDEMPOTENCY_MAX_ENTRIES", "1000"))
+
 class ChatIn(BaseModel):
     conversation_id: str
     text: str
 
+
+def _replies(app) -> "OrderedDict[tuple, tuple[float, asyncio.Future]]":
+    """(conversation_id, Idempotency-Key) -> (wygasa, future odpowiedzi); kolejność = czas wstawienia."""
+    replies = getattr(app.state, "idempotent_replies", None)
+    if replies is None:
+        replies = app.state.idempotent_replies = OrderedDict()
+    now = time.monotonic()
+    while replies and next(iter(replies.values()))[0] <= now:
+        replies.popitem(last=False)
+    return replies
+
+
+_late_replies: "set[asyncio.Task]" = set()
+
+
+def _keep_pending(replies, key, reply: asyncio.Future, waiter: asyncio.Queue) -> None:
+    """
+    USER_MSG wyszedł, odpowiedzi brak: koordynator odrzuci ponowienie jako duplikat, więc wpis
+    zostaje w toku do końca okna dedup, a odpowiedź odbiera zadanie w tle.
+    """
+    if replies.get(key, (0, None))[1] is reply:
+        replies[key] = (max(replies[key][0], time.monotonic() + DEDUP_TTL_S), reply)
+        replies.move_to_end(key)
+    task = asyncio.get_running_loop().create_task(_await_late_reply(replies, key, reply, waiter, DEDUP_TTL_S))
+    _late_replies.add(task)
+    task.add_done_callback(_late_replies.discard)
+
+
+async def _await_late_reply(replies, key, reply: asyncio.Future, waiter: asyncio.Queue, ttl_s: float) -> None:
+    """Odbiór odpowiedzi po timeoucie pierwszego żądania; ponowienia czekają na ten sam future."""
+    try:
+        payload = await asyncio.wait_for(waiter.get(), timeout=ttl_s)
+    except asyncio.TimeoutError:
+        payload = None
+    reply.set_result(payload)
+    if payload is None and replies.get(key, (0, None))[1] is reply:
+        del replies[key]  # okno dedup minęło bez odpowiedzi: kolejne ponowienie wysyła USER_MSG
+
+
 @router.post("/chat")
-async def chat(req: Request, body: ChatIn):
+async def chat(req: Request, body: ChatIn, idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     bridge = getattr(req.app.state, "bridge", None)
     if not bridge:
         # Jeśli API_BRIDGE_ENABLED != 1, nie ma Bridge'a
         raise HTTPException(status_code=503, detail="Bridge disabled")
 
+    timeout_s = float(os.getenv("API_REPLY_TIMEOUT", "60"))
+    key = (body.conversation_id, idempotency_key) if idempotency_key else None
+    replies = _replies(req.app) if key is not None else None
+    if key is not None and key in replies:
+        # ponowienie: nie wysyłamy USER_MSG ani nie podmieniamy waitera pierwszego żądania
+        try:
+            payload = await asyncio.wait_for(asyncio.shield(replies[key][1]), timeout=timeout_s)
+        except asyncio.TimeoutError:
+            payload = None
+        return {"reply": payload}
+
+    reply: Optional[asyncio.Future] = None
+    if key is not None:
+        reply = asyncio.get_running_loop().create_future()
+        replies[key] = (time.monotonic() + IDEMPOTENCY_TTL_S, reply)
+        while len(replies) > IDEMPOTENCY_MAX_ENTRIES:
+            replies.popitem(last=False)
+
     session_id = body.conversation_id
     waiter = bridge.register_waiter(session_id)
-    await bridge.send_user_msg(conversation_id=body.conversation_id, text=body.text, session_id=session_id)
-
-    timeout_s = float(os.getenv("API_REPLY_TIMEOUT", "60"))
+    payload = None
+    sent = False
     try:
-        payload = await asyncio.wait_for(waiter.get(), timeout=timeout_s)
-        return {"reply": payload}
-    except asyncio.TimeoutError:
-        return {"reply": None}
+        # korzeń śladu tury: traceparent idzie z USER_MSG przez wszystkie agenty aż do odpowiedzi
+        with tracing.span("chat.turn", service="api", conv=body.conversation_id) as sp:
+            await bridge.send_user_msg(
+                conversation_id=body.conversation_id,
+                text=body.text,
+                session_id=session_id,
+                idempotency_key=idempotency_key,
+            )
+            sent = True
+            try:
+                payload = await asyncio.wait_for(waiter.get(), timeout=timeout_s)
+            except asyncio.TimeoutError:
+                if sp is not None:
+                    sp.set(timeout=True)
+            return {"reply": payload}
+    finally:
+        if reply is not None:
+            if payload is None and sent:
+                _keep_pending(replies, key, reply, waiter)
+            else:
+                reply.set_result(payload)
+                if payload is None and replies.get(key, (0, None))[1] is reply:
+                    del replies[key]  # USER_MSG nie wyszedł: ponowienie wysyła go od nowa
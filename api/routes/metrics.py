@@ -0,0 +1,14 @@
+# api/routes/metrics.py
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from agents.common.metrics_exporter import CONTENT_TYPE, render
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(content=render(), media_type=CONTENT_TYPE)
@@ -2,12 +2,15 @@
 from __future__ import annotations
 
 import os
+import time
 import logging
 import asyncio
 from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI, Request
 from api.routes.chat import router as chat_router
+from api.routes.metrics import router as metrics_router
+from agents.common.metrics import counter, histogram
 from agents.common.config import settings
 from agents.api_bridge import ApiBridgeAgent
 
@@ -52,3 +55,27 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(chat_router)
+app.include_router(metrics_router)
+
+
+HTTP_REQUEST_SECONDS = histogram("http_request_seconds", ("method", "route"), help="Czas obsługi żądań HTTP.")
+HTTP_RESPONSES = counter("http_responses_total", ("status",), help="Odpowiedzi HTTP według kodu.")
+
+
+def _route_key(request: Request) -> str:
+    # szablon trasy ("/chat"), nie surowa ścieżka — liczba serii pozostaje stała
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+@app.middleware("http")
+async def http_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_SECONDS.labels(request.method, _route_key(request)).observe(time.perf_counter() - t0)
+        HTTP_RESPONSES.labels(str(status)).inc()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Odbiór ramek ACL: odpytywanie (przed) vs czekanie na kolejce (po) — koszt bezczynności i opóźnienie.
+
+    python scripts/bench_acl_receive.py [--idle 3] [-n 200]
+
+Przed: jak OnACL + BaseAgent.Inbox sprzed zmiany — dwa konsumenci tej samej skrzynki, pętla
+CyclicBehaviour z receive(timeout=0.2) i receive(timeout=5), licznik pustych ticków.
+Po: jeden konsument, next_frame() czeka wprost na behaviour.queue (acl_handler / Inbox).
+Mierzone: wybudzenia pętli i czas CPU procesu w bezczynności, opóźnienie put -> start obsługi
+(p50/p99) oraz liczba obsłużeń na ramkę.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.protocol.handler import next_frame  # noqa: E402
+
+
+class Behaviour:
+    """Minimalny odpowiednik CyclicBehaviour: kolejka + receive() jak w SPADE."""
+
+    def __init__(self, queue: asyncio.Queue):
+        self.queue = queue
+
+    async def receive(self, timeout=None):
+        if timeout:
+            try:
+                return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        try:
+            return self.queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+
+async def _cyclic(run, stop: asyncio.Event, stats: dict) -> None:
+    """Pętla CyclicBehaviour._step: run() + sleep(0) aż do zatrzymania."""
+    while not stop.is_set():
+        stats["wakeups"] += 1
+        await run()
+        await asyncio.sleep(0)
+
+
+def _consumers(mode: str, queues, stop, stats, latencies):
+    async def handle(item):
+        stats["handled"] += 1
+        if item is not None:
+            latencies.append(time.perf_counter() - item)
+
+    if mode == "before":
+        onacl, inbox = Behaviour(queues[0]), Behaviour(queues[1])
+
+        async def onacl_run():
+            item = await onacl.receive(timeout=0.2)
+            if item is not None:
+                await handle(item)
+
+        async def inbox_run():
+            item = await inbox.receive(timeout=5)
+            if item is not None:
+                await handle(None)  # drugie obsłużenie tej samej ramki
+
+        return [_cyclic(onacl_run, stop, stats), _cyclic(inbox_run, stop, stats)]
+
+    beh = Behaviour(queues[0])
+
+    async def run():
+        item = await next_frame(beh)
+        if item is not None:
+            await handle(item)
+
+    return [_cyclic(run, stop, stats)]
+
+
+async def _bench(mode: str, idle_s: float, n: int) -> dict:
+    queues = [asyncio.Queue(), asyncio.Queue()]
+    stop = asyncio.Event()
+    stats = {"wakeups": 0, "handled": 0}
+    latencies: list = []
+    tasks = [asyncio.ensure_future(c) for c in _consumers(mode, queues, stop, stats, latencies)]
+
+    # 1) bezczynność
+    cpu0, wake0 = time.process_time(), stats["wakeups"]
+    await asyncio.sleep(idle_s)
+    idle = {"idle_wakeups_per_s": (stats["wakeups"] - wake0) / idle_s,
+            "idle_cpu_ms_per_s": (time.process_time() - cpu0) * 1000 / idle_s}
+
+    # 2) ramki w losowych odstępach (SPADE dostarcza ramkę do każdej pasującej kolejki)
+    rnd = random.Random(7)
+    for _ in range(n):
+        await asyncio.sleep(rnd.uniform(0.0005, 0.005))
+        t = time.perf_counter()
+        for q in queues if mode == "before" else queues[:1]:
+            q.put_nowait(t)
+    await asyncio.sleep(0.05)
+
+    stop.set()
+    for q in queues:
+        q.put_nowait(None)  # obudź konsumentów czekających bez timeoutu
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    latencies.sort()
+    return {
+        **idle,
+        "lat_p50_us": statistics.median(latencies) * 1e6,
+        "lat_p99_us": latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        "handled_per_frame": stats["handled"] / n,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--idle", type=float, default=3.0, help="sekundy bezczynności do pomiaru")
+    ap.add_argument("-n", type=int, default=200, help="liczba ramek do pomiaru opóźnienia")
+    args = ap.parse_args(argv)
+
+    print(f"{'mode':<8} {'wakeups/s':>10} {'cpu ms/s':>9} {'p50 us':>8} {'p99 us':>8} {'handled/frame':>14}")
+    for mode in ("before", "after"):
+        r = asyncio.run(_bench(mode, args.idle, args.n))
+        print(f"{mode:<8} {r['idle_wakeups_per_s']:>10.1f} {r['idle_cpu_ms_per_s']:>9.3f} "
+              f"{r['lat_p50_us']:>8.1f} {r['lat_p99_us']:>8.1f} {r['handled_per_frame']:>14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Rozmiar i czas kodowania body ACL dla kodowań z agents.protocol.wire.
+
+    python scripts/bench_acl_wire.py [-n 2000]
+
+Dla każdego typu wiadomości (mały ASK, wynik NLU, porada pogodowa) i kodowania:
+bajty body na drodze, % względem JSON, czas encode (AclMessage -> body) i ingest (body -> AclMessage).
+msgpack pojawia się tylko, gdy pakiet jest zainstalowany.
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.protocol.acl_messages import AclMessage  # noqa: E402
+from agents.protocol.ingest import ingest  # noqa: E402
+from agents.protocol import wire  # noqa: E402
+
+
+def _samples() -> dict:
+    ask = AclMessage.build_request_ask("conv-bench", ["nights", "budget_total"])
+    nlu = AclMessage.build_inform(
+        conversation_id="conv-bench-nlu",
+        payload={"type": "FACT", "slot": "nlu.extraction", "value": {
+            "slots": {f"slot_{i}": {"value": f"wartość {i}", "confidence": 0.9, "source": "llm"} for i in range(30)},
+            "notes": "Użytkownik szuka wyjazdu z dziećmi, preferuje ciepłe kraje i krótkie loty. " * 8,
+        }},
+        ontology="nlu",
+    )
+    days = [{"date": f"2026-07-{d:02d}", "t_min": 18.5 + d % 3, "t_max": 27.0 + d % 4, "rain_mm": 0.2 * (d % 5),
+             "wind_ms": 3.1, "summary": "słonecznie z przejaśnieniami, po południu możliwe przelotne opady"}
+            for d in range(1, 15)]
+    weather = AclMessage.build_inform(
+        conversation_id="conv-bench-weather",
+        payload={"type": "WEATHER_ADVICE", "note": {"title": "Pogoda: Lizbona, 14 dni",
+                                                     "text": "\n".join(d["summary"] for d in days)},
+                 "meta": {"days": days, "lang": "pl", "units": "metric"}},
+        ontology="weather",
+    )
+    return {"ask": ask, "nlu": nlu, "weather": weather}
+
+
+def _per_op_us(fn, n: int, repeat: int = 5) -> float:
+    """Najlepszy z kilku przebiegów (jak timeit)."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / n * 1_000_000
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-n", type=int, default=2000, help="liczba operacji na wariant")
+    args = ap.parse_args(argv)
+
+    print(f"encodings: {', '.join(wire.AVAILABLE)}, n={args.n}")
+    print(f"{'message':<8} {'encoding':<13} {'bytes':>7} {'vs json':>8} {'encode us':>10} {'ingest us':>10}")
+    for name, acl in _samples().items():
+        base = len(acl.to_json())
+        for enc in reversed(wire.AVAILABLE):  # json pierwszy
+            body = wire.encode(acl, enc)
+            assert ingest(body, encoding=enc).acl == acl
+            # encode bez cache JSON (jak pierwsza wysyłka wiadomości)
+            enc_us = _per_op_us(lambda: wire.encode(acl.model_copy(), enc), args.n)
+            dec_us = _per_op_us(lambda: ingest(body, max_bytes=64 * 1024, encoding=enc), args.n)
+            print(f"{name:<8} {enc:<13} {len(body):>7} {len(body) / base:>7.0%} {enc_us:>10.2f} {dec_us:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Waterfall opóźnień tury czatu ze spanów zapisanych przez MAS_TRACE_EXPORT=jsonl.
+
+    python scripts/trace_waterfall.py [telemetry/traces.jsonl] [--trace <trace_id>] [--last 5] [--width 40]
+
+Każdy ślad (jedna tura: chat.turn -> acl.handle w kolejnych agentach -> kb.* / llm.chat / owm.*)
+jako drzewo: przesunięcie od startu tury [ms], czas spanu [ms], nazwa [agent], pasek na osi czasu.
+"""
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.common.tracing import JSONL_PATH, load_jsonl, render_waterfall  # noqa: E402
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", nargs="?", default=JSONL_PATH, help="plik JSONL ze spanami")
+    ap.add_argument("--trace", help="tylko ten trace_id (lub jego prefiks)")
+    ap.add_argument("--last", type=int, default=5, help="ile ostatnich śladów pokazać (0 = wszystkie)")
+    ap.add_argument("--width", type=int, default=40, help="szerokość paska osi czasu")
+    args = ap.parse_args(argv)
+
+    try:
+        records = load_jsonl(args.path)
+    except FileNotFoundError:
+        print(f"brak pliku: {args.path} (uruchom agentów z MAS_TRACE_EXPORT=jsonl)", file=sys.stderr)
+        return 1
+
+    traces: dict = {}
+    for r in records:
+        traces.setdefault(r["trace_id"], []).append(r)
+    ordered = sorted(traces.values(), key=lambda spans: min(s["start_ns"] for s in spans))
+    if args.trace:
+        ordered = [t for t in ordered if t[0]["trace_id"].startswith(args.trace)]
+    elif args.last > 0:
+        ordered = ordered[-args.last:]
+
+    print(f"{'start ms':>9} {'dur ms':>9}  span")
+    for spans in ordered:
+        print("\n".join(render_waterfall(spans, width=args.width)))
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,4 +1,5 @@
 # tests/conftest.py
+import io
 import os, sys
 import asyncio
 import pytest
@@ -17,4 +18,13 @@ def asyncio_event_loop():
     try:
         yield loop
     finally:
-        loop.close()
\ No newline at end of file
+        loop.close()
+
+
+@pytest.fixture(autouse=True, scope="session")
+def quiet_logs():
+    """Logi agentów (wątek zapisu agents.common.log) do bufora zamiast na stdout — cichy `pytest -q`."""
+    import agents.common.log as log_mod
+    log_mod.configure(stream=io.StringIO())
+    yield
+    log_mod.flush()
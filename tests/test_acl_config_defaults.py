@@ -4,8 +4,25 @@ import agents.coordinator as coordinator_mod
 
 def test_presenter_onacl_reads_limits_from_settings():
     assert presenter_mod.PresenterAgent.OnACL.acl_max_body_bytes == settings.acl_max_body_bytes
-    assert presenter_mod.PresenterAgent.OnACL.acl_max_idle_ticks == settings.acl_max_idle_ticks
+    assert presenter_mod.PresenterAgent.OnACL.acl_max_idle_s == settings.acl_max_idle_s
 
 def test_coordinator_onacl_reads_limits_from_settings():
     assert coordinator_mod.CoordinatorAgent.OnACL.acl_max_body_bytes == settings.acl_max_body_bytes
-    assert coordinator_mod.CoordinatorAgent.OnACL.acl_max_idle_ticks == settings.acl_max_idle_ticks
+    assert coordinator_mod.CoordinatorAgent.OnACL.acl_max_idle_s == settings.acl_max_idle_s
+
+def test_idle_ticks_env_is_deprecated_alias(monkeypatch):
+    import pytest
+    from agents.common.config import Settings
+
+    monkeypatch.setenv("ACL_MAX_IDLE_TICKS", "25")
+    with pytest.warns(FutureWarning, match="ACL_MAX_IDLE_TICKS"):
+        assert Settings(acl_max_idle_s=None).acl_max_idle_s == 5.0  # 25 ticków x 0.2 s
+    assert Settings(acl_max_idle_s="3").acl_max_idle_s == 3.0  # nowa zmienna ma pierwszeństwo
+
+def test_invalid_env_values_fall_back_to_defaults():
+    import pytest
+    from agents.common.config import Settings
+
+    with pytest.warns(RuntimeWarning):
+        s = Settings(acl_concurrency="abc", acl_mailbox_idle_s="", acl_max_body_bytes="64k")
+    assert (s.acl_concurrency, s.acl_mailbox_idle_s, s.acl_max_body_bytes) == (0, 30.0, 65536)
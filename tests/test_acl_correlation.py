@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from agents.agent import BaseAgent
+from agents.coordinator import CoordinatorAgent
+from agents.protocol import acl_handler
+from agents.protocol.acl_messages import AclMessage
+from agents.protocol.correlation import Correlator
+
+
+class DummyMsg:
+    def __init__(self, body, sender="registry@xmpp"):
+        self.body = body
+        self.sender = sender
+        self.metadata = {}
+
+
+def test_correlator_matches_by_reply_id_then_conversation(asyncio_event_loop):
+    async def scenario():
+        c = Correlator()
+        req = AclMessage.build_request_ask("conv-c", ["x"])
+        by_id = c.expect("rw-1")
+        by_conv = c.expect("rw-2", conversation_id="conv-c")
+
+        reply = AclMessage.build_inform_ack("other-conv", {"type": "ASK"})
+        reply.in_reply_to = "rw-1"
+        assert c.resolve(reply) and (await by_id) is reply
+
+        stale = AclMessage.build_inform_ack("conv-c", {"type": "ASK"}).as_reply_to(req)  # nieznane id
+        assert not c.resolve(stale) and not by_conv.done()  # spóźniona odpowiedź na inne żądanie
+
+        legacy = AclMessage.build_inform_ack("conv-c", {"type": "ASK"})  # peer bez in_reply_to
+        assert c.resolve(legacy) and (await by_conv) is legacy
+        await asyncio.sleep(0)  # callbacki future'ów
+        assert not c.resolve(legacy) and len(c) == 0
+
+        late = c.expect("rw-3")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(late, timeout=0.01)
+        assert len(c) == 0  # anulowany future sam znika
+
+    asyncio_event_loop.run_until_complete(scenario())
+
+
+def test_acl_handler_resolves_reply_before_dispatch(asyncio_event_loop):
+    agent = BaseAgent("a@xmpp", "pw")
+    handled = []
+
+    class Beh:
+        pass
+
+    beh = Beh()
+    beh.agent = agent
+
+    @acl_handler
+    async def on_msg(self, acl, raw_msg):
+        handled.append(acl)
+
+    async def scenario():
+        async def fake_send_acl(behaviour, acl, to_jid):
+            reply = AclMessage.build_inform_ack(acl.conversation_id, {"type": "ASK"}).as_reply_to(acl)
+            asyncio.get_running_loop().call_soon(
+                lambda: asyncio.ensure_future(on_msg(beh, DummyMsg(reply.to_json())))
+            )
+
+        agent.send_acl = fake_send_acl
+        fut = await agent.send_request(beh, AclMessage.build_request_ask("conv-r", ["x"]), to_jid="b@xmpp")
+        reply = await asyncio.wait_for(fut, timeout=1.0)
+        await on_msg(beh, DummyMsg(AclMessage.build_request_ask("conv-other", ["y"]).to_json()))
+        return reply
+
+    reply = asyncio_event_loop.run_until_complete(scenario())
+    assert reply.conversation_id == "conv-r"
+    assert [a.conversation_id for a in handled] == ["conv-other"]  # odpowiedź nie trafiła do handlera
+
+
+def test_coordinator_capability_lookups_run_concurrently(asyncio_event_loop, monkeypatch):
+    monkeypatch.setenv("REGISTRY_JID", "registry@xmpp")
+    agent = CoordinatorAgent("coordinator@xmpp", "pw")
+    sent = []
+
+    async def fake_send_acl(behaviour, acl, to_jid):
+        sent.append(acl)
+        key = acl.payload["need"][1]
+        reply = AclMessage.build_inform(
+            conversation_id=acl.conversation_id,
+            payload={"type": "FACT", "slot": "capability.providers", "value": {key: [f"{key}@xmpp"]}},
+            ontology="system",
+        ).as_reply_to(acl)
+        # Registry odpowiada po chwili; odpowiedzi w odwrotnej kolejności niż pytania
+        delay = 0.05 if key == "nlu.SLOTS" else 0.01
+        asyncio.get_running_loop().call_later(delay, agent.resolve_reply, reply)
+
+    agent.send_acl = fake_send_acl
+
+    async def scenario():
+        return await asyncio.gather(
+            agent._find_provider(None, "nlu.SLOTS"),
+            agent._find_provider(None, "weather.WEATHER_ADVICE"),
+        )
+
+    providers = asyncio_event_loop.run_until_complete(scenario())
+    assert providers == ["nlu.SLOTS@xmpp", "weather.WEATHER_ADVICE@xmpp"]
+    assert len(sent) == 2 and all(a.reply_with == a.message_id for a in sent)
+
+
+def test_coordinator_nlu_result_waits_for_conversation_mailbox(asyncio_event_loop, monkeypatch):
+    agent = CoordinatorAgent("coordinator@xmpp", "pw")
+    assert agent.acl_consumer().acl_concurrency >= 1  # koordynator zawsze obsługuje ramki przez skrzynki
+    handled = []
+
+    async def find_provider(behaviour, key):
+        return "extractor@xmpp"
+
+    async def ask_extractor(*args):
+        return {"nights": 7}
+
+    async def handle_acl(behaviour, spade_msg, acl):
+        handled.append(acl.payload.get("slot"))
+
+    monkeypatch.setattr(agent, "_find_provider", find_provider)
+    monkeypatch.setattr(agent, "_ask_extractor", ask_extractor)
+    monkeypatch.setattr(agent, "handle_acl", handle_acl)
+
+    async def scenario():
+        boxes = agent.mailboxes()
+        gate = asyncio.Event()
+
+        async def in_flight():  # wcześniejsza ramka tej rozmowy jeszcze w obsłudze
+            await gate.wait()
+            handled.append("earlier")
+
+        boxes.submit("conv-n", in_flight)
+        await agent._run_nlu(None, None, "conv-n", "conv-n", "7 nocy")
+        await asyncio.sleep(0.01)
+        assert handled == []  # FACT czeka w kolejce rozmowy, nie wchodzi obok
+        gate.set()
+        await boxes.join()
+        await boxes.aclose()
+
+    asyncio_event_loop.run_until_complete(scenario())
+    assert handled == ["earlier", "nlu.extraction"]
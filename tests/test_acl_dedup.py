@@ -0,0 +1,57 @@
+from agents.protocol.acl_messages import AclMessage
+from agents.protocol.dedup import DedupWindow, dedup_key
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _wire(acl: AclMessage) -> AclMessage:
+    """Jak po drodze przez XMPP: body -> nowy obiekt."""
+    return AclMessage.from_json(acl.to_json())
+
+
+def test_redelivered_frame_is_duplicate_but_repeated_text_is_not():
+    window = DedupWindow()
+    first = AclMessage.build_request_user_msg("conv-d", "Cześć", session_id="conv-d")
+
+    assert not window.is_duplicate(_wire(first))
+    assert window.is_duplicate(_wire(first))  # ta sama ramka drugi raz
+
+    again = AclMessage.build_request_user_msg("conv-d", "Cześć", session_id="conv-d")
+    assert again.message_id != first.message_id
+    assert not window.is_duplicate(_wire(again))  # użytkownik napisał to samo jeszcze raz
+
+
+def test_idempotency_key_wins_over_message_id():
+    window = DedupWindow()
+    a = AclMessage.build_request_user_msg("conv-i", "rezerwuj", idempotency_key="k-1")
+    b = AclMessage.build_request_user_msg("conv-i", "rezerwuj", idempotency_key="k-1")
+    other_conv = AclMessage.build_request_user_msg("conv-j", "rezerwuj", idempotency_key="k-1")
+
+    assert not window.is_duplicate(_wire(a))
+    assert window.is_duplicate(_wire(b))
+    assert not window.is_duplicate(_wire(other_conv))
+
+
+def test_legacy_frames_without_message_id():
+    legacy = '{"performative":"INFORM","conversation_id":"c","ts":"2026-01-01T00:00:00+00:00","payload":{"type":"ACK"}}'
+    assert dedup_key(AclMessage.from_json(legacy)) == dedup_key(AclMessage.from_json(legacy))
+    # bez message_id i ts nie ma czego porównać
+    assert dedup_key(AclMessage.from_json('{"performative":"INFORM","conversation_id":"c"}')) is None
+
+
+def test_window_expires_by_count_and_time():
+    clock = Clock()
+    window = DedupWindow(max_items=2, ttl_s=10, clock=clock)
+
+    assert not window.seen("a") and not window.seen("b") and not window.seen("c")
+    assert "a" not in window and len(window) == 2  # najstarszy wypadł po liczbie
+
+    clock.t = 10.0
+    assert "b" not in window and "c" not in window  # wygasły po czasie
+    assert not window.seen("b")
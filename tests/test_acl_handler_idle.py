@@ -1,35 +1,111 @@
-import types
-import pytest
+import asyncio
+import time
 
+from agents.agent import BaseAgent
 from agents.protocol import acl_handler
 from agents.protocol.acl_messages import AclMessage
 
+
+class DummyMsg:
+    def __init__(self, body: str, sender: str = "user@xmpp"):
+        self.body = body
+        self.sender = sender
+        self.metadata = {}
+
+
 class DummyBehaviour:
-    def __init__(self, seq=None):
-        # seq: lista wartości zwracanych przez receive; tu same None (idle)
-        self._seq = list(seq or [])
+    def __init__(self, idle_s=0.0):
+        # kolejka jak w SPADE (CyclicBehaviour.queue) — handler czeka na niej wprost
+        self.queue = asyncio.Queue()
         self._killed = False
-        self.acl_handler_timeout = 0.001  # szybkie ticky
-        self.acl_max_idle_ticks = 3       # po 3 pustych cyklach zabij
+        self.acl_max_idle_s = idle_s
 
-    async def receive(self, timeout=None):
-        if self._seq:
-            return self._seq.pop(0)
-        return None
-
-    async def kill(self):
+    def kill(self):  # SPADE: synchroniczne
         self._killed = True
 
-def test_idle_guard_kills_after_n_ticks(asyncio_event_loop):
-    beh = DummyBehaviour(seq=[None, None, None, None])  # 4 puste ticky
 
+def test_idle_guard_kills_after_idle_time(asyncio_event_loop):
     @acl_handler
     async def on_msg(self, acl: AclMessage, raw_msg):
-        # nie powinno wejść (bo nie ma wiadomości)
         assert False, "should not be called"
 
-    # odpalamy wrapper parę razy; po 3-cim powinno zabić behaviour
-    for _ in range(4):
-        asyncio_event_loop.run_until_complete(on_msg(beh))
+    async def scenario():
+        beh = DummyBehaviour(idle_s=0.05)
+        t0 = time.monotonic()
+        await on_msg(beh)  # jedno czekanie do terminu, bez ticków
+        return beh, time.monotonic() - t0
+
+    beh, waited = asyncio_event_loop.run_until_complete(scenario())
+    assert beh._killed is True, "behaviour should be killed after idle time"
+    assert 0.04 <= waited < 0.5
+
+
+def test_frame_is_delivered_without_polling_and_resets_idle(asyncio_event_loop):
+    handled = []
+
+    @acl_handler
+    async def on_msg(self, acl: AclMessage, raw_msg):
+        handled.append((acl.conversation_id, time.monotonic()))
+
+    async def scenario():
+        beh = DummyBehaviour(idle_s=0.1)
+        loop = asyncio.get_running_loop()
+        sent = {}
+
+        def put():
+            sent["t"] = time.monotonic()
+            beh.queue.put_nowait(DummyMsg(AclMessage.build_request_ask("conv-q", ["nights"]).to_json()))
+
+        loop.call_later(0.06, put)
+        await on_msg(beh)   # ramka po 0.06 s: obsłużona od razu
+        await on_msg(beh)   # termin liczony od ostatniej ramki -> kill ~0.1 s później
+        return beh, sent["t"]
+
+    beh, t_sent = asyncio_event_loop.run_until_complete(scenario())
+    assert [c for c, _ in handled] == ["conv-q"]
+    assert handled[0][1] - t_sent < 0.05
+    assert beh._killed is True
+
+
+def test_base_agent_has_exactly_one_acl_consumer():
+    import agents.coordinator as coordinator_mod
+    import agents.presenter as presenter_mod
+
+    assert type(BaseAgent("a@xmpp", "pw").acl_consumer()) is BaseAgent.Inbox
+    coord = coordinator_mod.CoordinatorAgent("c@xmpp", "pw")
+    assert type(coord.acl_consumer()) is coordinator_mod.CoordinatorAgent.OnACL
+    pres = presenter_mod.PresenterAgent("p@xmpp", "pw")
+    assert type(pres.acl_consumer()) is presenter_mod.PresenterAgent.OnACL
+
+
+def test_agent_stop_wakes_consumers_so_on_end_runs(asyncio_event_loop):
+    from spade.behaviour import CyclicBehaviour
+
+    ended = []
+
+    class OnACL(CyclicBehaviour):
+        @acl_handler
+        async def run(self, acl: AclMessage, raw_msg):
+            assert False, "should not be called"
+
+        async def on_end(self):
+            ended.append("OnACL")
+
+    class Inbox(BaseAgent.Inbox):
+        async def on_end(self):
+            ended.append("Inbox")
+
+    async def scenario():
+        agent = BaseAgent("a@xmpp", "pw")
+        tasks = []
+        for beh in (OnACL(), Inbox()):
+            agent.add_behaviour(beh)
+            beh.queue = asyncio.Queue()
+            tasks.append(asyncio.ensure_future(beh._step()))  # pętla SPADE: run() ... on_end()
+        await asyncio.sleep(0.01)
+        assert not any(t.done() for t in tasks)  # ACL_MAX_IDLE_S=0: czekają bez terminu
+        await agent.stop()
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=0.5)
 
-    assert beh._killed is True, "behaviour should be killed after idle ticks"
+    asyncio_event_loop.run_until_complete(scenario())
+    assert sorted(ended) == ["Inbox", "OnACL"]
@@ -0,0 +1,74 @@
+import json
+
+from agents.protocol import Performative
+from agents.protocol.acl_messages import AclMessage
+from agents.protocol.ingest import BODY_TOO_LARGE, VALIDATION_ERROR, ingest, ingest_message, utf8_size
+
+
+class DummyMsg:
+    def __init__(self, body, thread=None, meta=None):
+        self.body = body
+        self.thread = thread
+        self.metadata = meta or {}
+
+
+def test_utf8_size_matches_encoding():
+    assert utf8_size("abc") == 3
+    assert utf8_size("zażółć") == len("zażółć".encode("utf-8"))
+    long = "zażółć gęślą jaźń " * 10_000  # liczone kawałkami
+    assert utf8_size(long) == len(long.encode("utf-8"))
+
+
+def test_ingest_reports_utf8_bytes_of_polish_text():
+    src = AclMessage.build_inform_fact("conv-pl", "destination", "Łódź, Zażółć gęślą jaźń")
+    body = src.to_json()
+    assert not body.isascii()
+    expected = len(body.encode("utf-8"))
+
+    accepted = ingest(body, max_bytes=4 * len(body))  # limit daleko: rozmiar i tak dokładny
+    assert accepted.ok and accepted.size == expected
+    assert ingest(body).size == expected
+
+    rejected = ingest(body, max_bytes=len(body) - 1)  # więcej znaków niż limit
+    assert not rejected.ok and rejected.size == expected
+    assert rejected.acl.payload["details"]["size_bytes"] == expected
+
+
+def test_ingest_ok_returns_acl_and_decoded_dict():
+    src = AclMessage.build_inform_fact("conv-i", "nights", 3)
+    res = ingest(src.to_json(), max_bytes=64 * 1024)
+
+    assert res.ok and res.error is None
+    assert res.acl.payload == {"type": "FACT", "slot": "nights", "value": 3}
+    assert res.data == json.loads(src.to_json())
+
+
+def test_ingest_body_too_large_counts_utf8_bytes():
+    body = json.dumps({"payload": {"text": "ż" * 40}}, ensure_ascii=False)
+    res = ingest(body, max_bytes=len(body) + 10, fallback_conversation_id="conv-big")
+
+    assert not res.ok and res.error == BODY_TOO_LARGE
+    assert res.acl.conversation_id == "conv-big"
+    assert res.acl.payload["details"] == {"size_bytes": len(body.encode("utf-8")), "max_bytes": len(body) + 10}
+
+
+def test_ingest_validation_errors():
+    bad_json = ingest("{not-json", fallback_conversation_id="conv-bad")
+    assert not bad_json.ok and bad_json.error == VALIDATION_ERROR
+    assert bad_json.acl.performative == Performative.FAILURE and bad_json.data is None
+
+    bad_sem = ingest(json.dumps({"performative": "REQUEST", "conversation_id": "c", "payload": {"type": "FACT"}}))
+    assert not bad_sem.ok and bad_sem.error == VALIDATION_ERROR
+    assert bad_sem.data["payload"] == {"type": "FACT"}
+
+
+def test_ingest_message_fills_from_thread_and_metadata():
+    body = json.dumps({"payload": {"type": "PING"}})
+    res = ingest_message(DummyMsg(body, thread="conv-t", meta={"performative": "REQUEST", "ontology": "system"}))
+
+    assert res.ok
+    assert res.acl.conversation_id == "conv-t"
+    assert res.acl.performative == Performative.REQUEST
+    assert res.acl.ontology == "system"
+    # AclMessage.from_spade_message korzysta z tej samej ścieżki
+    assert AclMessage.from_spade_message(DummyMsg(body, thread="conv-t", meta={"performative": "REQUEST"})).conversation_id == "conv-t"
@@ -0,0 +1,76 @@
+import asyncio
+
+import agents.common.metrics as metrics_mod
+from agents.protocol.acl_messages import AclMessage
+from agents.protocol.lanes import LaneClassifier, LaneSlots, parse_lanes
+from agents.protocol.mailbox import ConversationMailboxes
+
+
+def test_classifier_by_type_then_ontology():
+    c = LaneClassifier()
+    user = AclMessage.build_request_user_msg("c", "Cześć")
+    cap = AclMessage.build_inform("c", payload={"type": "CAPABILITY", "provides": []}, ontology="system")
+    nlu = AclMessage.build_inform_fact("c", slot="nights", value=7, ontology="nlu")
+    travel = AclMessage.build_inform_fact("c", slot="nights", value=7, ontology="travel")
+
+    assert [c.lane_for(a) for a in (user, cap, nlu, travel)] == ["ui", "system", "nlu", "nlu"]
+    assert LaneClassifier("ontology:travel=ui,bad-entry", default="system").lane_for(travel) == "ui"
+    assert parse_lanes("ui:5, system:0, nlu") == {"ui": 5, "system": 1, "nlu": 1}
+
+
+def test_weighted_fair_grants_without_starvation(asyncio_event_loop):
+    async def scenario():
+        slots = LaneSlots(1, {"ui": 2, "system": 1})
+        granted = []
+        await slots.acquire("ui")  # slot zajęty
+
+        async def want(lane):
+            await slots.acquire(lane)
+            granted.append(lane)
+
+        waiters = [asyncio.ensure_future(want(lane)) for lane in ["system"] * 4 + ["ui"] * 4]
+        await asyncio.sleep(0)
+        assert slots.waiting("system") == 4 and slots.waiting("unknown-lane") == 4  # nieznany = najniższy
+        for _ in waiters:
+            slots.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+        return granted
+
+    granted = asyncio_event_loop.run_until_complete(scenario())
+    assert granted[:6] == ["ui", "system", "ui", "ui", "system", "ui"]
+
+
+def test_mailboxes_serve_user_lane_first_under_load(asyncio_event_loop):
+    metrics_mod.snapshot(reset=True)
+    order = []
+
+    async def scenario():
+        boxes = ConversationMailboxes(max_concurrency=1, name="t-lanes")
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        def job(tag):
+            async def run():
+                order.append(tag)
+            return run
+
+        boxes.submit("busy", blocker, lane="nlu")
+        await asyncio.sleep(0)
+        for i in range(3):
+            boxes.submit(f"sys-{i}", job(f"system-{i}"), lane="system")
+        boxes.submit("user", job("ui"), lane="ui")
+        await asyncio.sleep(0)
+        assert boxes.depth("system") == 3 and boxes.depth("ui") == 1
+
+        gate.set()
+        await boxes.join()
+        assert boxes.depth("system") == 0
+        await boxes.aclose()  # skrzynki czekają w wait_for -> anuluj i domknij
+
+    asyncio_event_loop.run_until_complete(scenario())
+    assert order[0] == "ui"
+    assert metrics_mod.raw_histograms()['acl_lane_wait_seconds{agent="t-lanes",lane="system"}'].count == 3
+    assert metrics_mod.gauges()['acl_lane_depth{agent="t-lanes",lane="ui"}'] == 0
@@ -0,0 +1,102 @@
+import asyncio
+
+from agents.agent import BaseAgent
+from agents.protocol import AclMessage, acl_handler
+from agents.protocol.mailbox import ConversationMailboxes
+
+
+class DummyMsg:
+    def __init__(self, body, sender="user@xmpp"):
+        self.body = body
+        self.sender = sender
+        self.metadata = {}
+
+
+def test_order_within_conversation_parallel_across(asyncio_event_loop):
+    events = []
+
+    async def scenario():
+        boxes = ConversationMailboxes(max_concurrency=4)
+        slow_gate = asyncio.Event()
+
+        def job(conv, n, gate=None):
+            async def run():
+                if gate is not None:
+                    await gate.wait()
+                events.append((conv, n))
+            return run
+
+        boxes.submit("A", job("A", 1, slow_gate))  # A czeka (np. na LLM)
+        boxes.submit("A", job("A", 2))
+        boxes.submit("B", job("B", 1))
+        boxes.submit("B", job("B", 2))
+        await asyncio.sleep(0.01)
+        assert events == [("B", 1), ("B", 2)]  # B nie czeka na A
+
+        slow_gate.set()
+        await boxes.join()
+        assert events[2:] == [("A", 1), ("A", 2)]  # A w kolejności nadania
+        await boxes.aclose()
+        assert len(boxes) == 0
+
+    asyncio_event_loop.run_until_complete(scenario())
+
+
+def test_concurrency_limit_errors_and_idle_reaping(asyncio_event_loop):
+    errors = []
+
+    async def scenario():
+        boxes = ConversationMailboxes(max_concurrency=2, idle_s=0.1, on_error=lambda k, e: errors.append(k))
+        state = {"now": 0, "peak": 0, "done": 0}
+
+        async def work():
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+            await asyncio.sleep(0.005)
+            state["now"] -= 1
+            state["done"] += 1
+
+        async def boom():
+            raise RuntimeError("handler failed")
+
+        boxes.submit("c0", boom)
+        for i in range(6):
+            boxes.submit(f"c{i}", work)
+        await boxes.join()
+        assert state["peak"] == 2 and state["done"] == 6
+        assert errors == ["c0"]  # błąd nie zatrzymał kolejnej ramki tej rozmowy
+
+        assert len(boxes) == 6
+        await asyncio.sleep(0.2)
+        assert len(boxes) == 0  # bezczynne skrzynki zamknięte
+
+    asyncio_event_loop.run_until_complete(scenario())
+
+
+def test_acl_handler_concurrent_mode_uses_agent_mailboxes(asyncio_event_loop):
+    agent = BaseAgent("a@xmpp", "pw")
+    handled = []
+
+    class Beh:
+        acl_concurrency = 2
+
+    beh = Beh()
+    beh.agent = agent
+
+    @acl_handler
+    async def on_msg(self, acl, raw_msg):
+        if acl.conversation_id == "slow":
+            await asyncio.sleep(0.02)
+        handled.append(acl.conversation_id)
+
+    async def scenario():
+        for conv in ("slow", "fast"):
+            await on_msg(beh, DummyMsg(AclMessage.build_request_ask(conv, ["nights"]).to_json()))
+        assert handled == []  # odbiór nie czeka na obsługę
+        await agent.mailboxes().join()
+        await agent.stop()  # skrzynki agenta zamknięte i domknięte (aclose)
+        assert len(agent.mailboxes()) == 0
+
+    asyncio_event_loop.run_until_complete(scenario())
+    assert handled == ["fast", "slow"]
+    assert agent.mailboxes().max_concurrency == 2
@@ -0,0 +1,109 @@
+import pytest
+
+import agents.common.metrics as metrics_mod
+from agents.protocol.acl_messages import AclMessage
+from agents.protocol.dedup import DedupWindow
+from agents.protocol.router import Router, dedup, requires, timed
+
+
+class DummyMsg:
+    def __init__(self, sender="user@xmpp", thread=None):
+        self.sender = sender
+        self.thread = thread
+        self.metadata = {}
+
+
+class DummyAgent:
+    def __init__(self):
+        self.handled = []
+        self.outbox = []
+        self._dedup = DedupWindow()
+
+    def is_duplicate(self, acl):
+        return self._dedup.is_duplicate(acl)
+
+    async def send_acl(self, behaviour, acl, to_jid):
+        self.outbox.append((to_jid, acl))
+
+    def log(self, *a, **k):
+        pass
+
+
+def _run(loop, router, agent, acl):
+    return loop.run_until_complete(router.dispatch(agent, None, DummyMsg(), acl))
+
+
+def test_most_specific_route_wins(asyncio_event_loop):
+    router = Router("t-specific")
+
+    @router.route("FACT")
+    async def any_fact(self, behaviour, spade_msg, acl):
+        self.handled.append("any")
+
+    @router.route("FACT", performative="INFORM", ontology="system")
+    async def system_fact(self, behaviour, spade_msg, acl):
+        self.handled.append("system")
+
+    agent = DummyAgent()
+    sys_fact = AclMessage.build_inform(conversation_id="c", payload={"type": "FACT"}, ontology="system")
+    travel_fact = AclMessage.build_inform_fact(conversation_id="c", slot="nights", value=7)
+
+    assert _run(asyncio_event_loop, router, agent, sys_fact)
+    assert _run(asyncio_event_loop, router, agent, travel_fact)
+    assert agent.handled == ["system", "any"]
+
+    with pytest.raises(ValueError):
+        router.route("FACT")(any_fact)
+
+
+def test_middleware_order_and_unrouted_fallback(asyncio_event_loop):
+    metrics_mod.snapshot(reset=True)
+    calls = []
+
+    def tag(label):
+        def mw(route, nxt):
+            calls.append(("build", label, route.name))
+
+            async def run(agent, behaviour, spade_msg, acl):
+                agent.handled.append(label)
+                await nxt(agent, behaviour, spade_msg, acl)
+            return run
+        return mw
+
+    router = Router("t-order", middleware=(tag("outer"), dedup, timed))
+
+    @router.route("PING", middleware=(tag("inner"),))
+    async def on_ping(self, behaviour, spade_msg, acl):
+        self.handled.append("handler")
+
+    @router.fallback
+    async def on_other(self, behaviour, spade_msg, acl):
+        self.handled.append("fallback")
+
+    agent = DummyAgent()
+    ping = AclMessage.build_request("c", payload={"type": "PING"}).to_json()
+    _run(asyncio_event_loop, router, agent, AclMessage.from_json(ping))
+    _run(asyncio_event_loop, router, agent, AclMessage.from_json(ping))  # powtórzona ramka
+    assert not _run(asyncio_event_loop, router, agent, AclMessage.build_request_ask("c", ["nights"]))
+
+    assert agent.handled == ["outer", "inner", "handler", "outer", "outer", "fallback"]
+    # middleware składane raz, przy rejestracji — nie przy każdej wiadomości
+    assert [c for c in calls if c[2] == "PING"] == [("build", "inner", "PING"), ("build", "outer", "PING")]
+    assert metrics_mod.counters()['acl_unrouted_total{router="t-order",type="ASK"}'] == 1
+    assert metrics_mod.raw_histograms()['acl_route_seconds{router="t-order",route="PING"}'].count == 1
+
+
+def test_requires_rejects_missing_fields_with_failure(asyncio_event_loop):
+    router = Router("t-requires")
+
+    @router.route("FACT", middleware=(requires("slot", "value"),))
+    async def on_fact(self, behaviour, spade_msg, acl):
+        self.handled.append(acl.payload["slot"])
+
+    agent = DummyAgent()
+    _run(asyncio_event_loop, router, agent, AclMessage.build_inform("c", payload={"type": "FACT", "slot": "nights"}))
+
+    assert agent.handled == []
+    to_jid, fail = agent.outbox[0]
+    assert to_jid == "user@xmpp" and fail.performative == "FAILURE"
+    assert fail.payload["code"] == "VALIDATION_ERROR" and fail.payload["details"] == {"missing": ["value"]}
@@ -0,0 +1,97 @@
+import base64
+import zlib
+
+import pytest
+
+from agents.protocol import wire
+from agents.protocol.acl_messages import AclMessage
+from agents.protocol.guards import meta_language_supported
+from agents.protocol.ingest import BODY_TOO_LARGE, ingest, ingest_message
+
+
+class DummyMsg:
+    def __init__(self, language=None, sender="peer@x/res", encodings=None):
+        self.metadata = {}
+        if language is not None:
+            self.metadata["language"] = language
+        if encodings is not None:
+            self.metadata["encodings"] = encodings
+        self.sender = sender
+
+
+def _big_acl():
+    return AclMessage.build_inform(
+        conversation_id="conv-w",
+        payload={"type": "WEATHER_ADVICE", "note": {"text": "słonecznie, bez opadów. " * 100}},
+        ontology="weather",
+    )
+
+
+@pytest.mark.parametrize("encoding", wire.AVAILABLE)
+def test_spade_roundtrip_for_each_encoding(encoding):
+    src = _big_acl()
+    msg = src.to_spade_message(to="peer@x", encoding=encoding)
+
+    assert msg.metadata["language"] == encoding
+    assert msg.metadata.get("encodings") == ",".join(wire.LOCAL_ENCODINGS)
+    if encoding != "json":
+        assert msg.body.isascii()  # base64 — bezpieczne w XMPP
+    if encoding.endswith("+zlib"):
+        assert len(msg.body) < len(src.to_json()) // 2
+
+    res = ingest_message(msg)
+    assert res.ok and res.acl == src
+    assert res.acl.language == "json"  # język treści, nie kodowanie body
+
+
+def test_peer_choice_requires_announcement_and_size():
+    peers = wire.PeerEncodings()
+    assert peers.choose("peer@x", 10_000) == "json"  # nie ogłosił -> json
+
+    peers.learn("peer@x/res", "json+zlib, json, xml")
+    assert peers.get("peer@x") == ("json+zlib", "json")
+    assert peers.choose("peer@x/other", 10_000) == "json+zlib"
+    assert peers.choose("peer@x", wire.COMPRESS_MIN_BYTES - 1) == "json"  # mała wiadomość: bez kompresji
+
+
+def test_small_frame_to_msgpack_peer_goes_as_json(monkeypatch):
+    monkeypatch.setattr(wire, "LOCAL_ENCODINGS", ("json+zlib", "msgpack+zlib", "json", "msgpack"))
+    peers = wire.PeerEncodings()
+    peers.learn("peer@x", "msgpack+zlib,msgpack,json+zlib,json")  # kolejność peera nie decyduje
+    small = AclMessage.build_request_ask("conv-s", ["nights"]).to_json()
+
+    assert peers.choose("peer@x", len(small)) == "json"
+    assert peers.choose("peer@x", 10_000) == "json+zlib"  # mniejsze niż msgpack+zlib
+
+    peers.learn("legacy@x", "msgpack,json")  # samo msgpack (base64) byłoby większe niż JSON
+    assert peers.choose("legacy@x", 10_000) == "json"
+
+
+def test_ingest_message_learns_sender_encodings(monkeypatch):
+    peers = wire.PeerEncodings()
+    monkeypatch.setattr(wire, "PEERS", peers)
+    acl = AclMessage.build_request_ask("conv-l", ["nights"])
+    msg = DummyMsg(language="json", encodings="json+zlib,json")
+    msg.body, msg.thread = acl.to_json(), "conv-l"
+
+    assert ingest_message(msg).ok
+    assert peers.choose("peer@x", 10_000) == "json+zlib"
+
+
+def test_inflate_limit_reports_body_too_large():
+    bomb = base64.b64encode(zlib.compress(b'{"payload":"' + b"a" * 200_000 + b'"}')).decode()
+    res = ingest(bomb, max_bytes=1024, fallback_conversation_id="conv-bomb", encoding="json+zlib")
+
+    assert not res.ok and res.error == BODY_TOO_LARGE
+    assert res.acl.payload["details"]["max_inflated_bytes"] == 1024 * wire.MAX_INFLATE_RATIO
+
+
+def test_bad_encoded_body_is_validation_error():
+    assert ingest("%%%not-base64", encoding="json+zlib").error == "VALIDATION_ERROR"
+    assert ingest(base64.b64encode(b"not zlib").decode(), encoding="json+zlib").error == "VALIDATION_ERROR"
+
+
+def test_meta_language_supported_accepts_wire_encodings():
+    assert meta_language_supported(DummyMsg()) is True
+    assert meta_language_supported(DummyMsg("JSON+zlib")) is True
+    assert meta_language_supported(DummyMsg("xml")) is False
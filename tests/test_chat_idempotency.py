@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+import api.routes.chat as chat_mod
+from api.routes.chat import router as chat_router
+
+
+class DummyBridge:
+    """Jak ApiBridgeAgent: jeden waiter na sesję; USER_MSG z powtórzonym kluczem koordynator odrzuca."""
+
+    def __init__(self, delay_s=0.05):
+        self.delay_s = delay_s
+        self.sent = []
+        self.seen_keys = set()
+        self.waiters = {}
+
+    def register_waiter(self, session_id):
+        q = self.waiters[session_id] = asyncio.Queue(maxsize=1)
+        return q
+
+    async def send_user_msg(self, conversation_id, text, session_id=None, idempotency_key=None):
+        self.sent.append(idempotency_key)
+        if idempotency_key in self.seen_keys:
+            return  # dedup koordynatora: brak odpowiedzi
+        self.seen_keys.add(idempotency_key)
+        q = self.waiters[session_id]
+        if self.delay_s is not None:
+            asyncio.get_running_loop().call_later(self.delay_s, q.put_nowait, {"text": f"odp: {text}"})
+
+
+def test_retried_post_replays_first_reply(asyncio_event_loop, monkeypatch):
+    monkeypatch.setenv("API_REPLY_TIMEOUT", "1")
+    app = FastAPI()
+    app.include_router(chat_router)
+    bridge = app.state.bridge = DummyBridge()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            def post(key):
+                return client.post("/chat", json={"conversation_id": "conv-k", "text": "rezerwuj"},
+                                   headers={"Idempotency-Key": key})
+
+            first, in_flight = await asyncio.gather(post("k-1"), post("k-1"))
+            after = await post("k-1")
+            other = await post("k-2")
+        return [r.json()["reply"] for r in (first, in_flight, after, other)]
+
+    first, in_flight, after, other = asyncio_event_loop.run_until_complete(scenario())
+    assert first == in_flight == after == {"text": "odp: rezerwuj"}
+    assert other == {"text": "odp: rezerwuj"}
+    assert bridge.sent == ["k-1", "k-2"]  # ponowienia nie idą do koordynatora
+
+
+def _post(client, key):
+    return client.post("/chat", json={"conversation_id": "conv-t", "text": "rezerwuj"},
+                       headers={"Idempotency-Key": key})
+
+
+def test_retry_after_timeout_attaches_to_late_reply(asyncio_event_loop, monkeypatch):
+    monkeypatch.setenv("API_REPLY_TIMEOUT", "0.1")
+    app = FastAPI()
+    app.include_router(chat_router)
+    bridge = app.state.bridge = DummyBridge(delay_s=0.2)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            timed_out = await _post(client, "k-t")
+            monkeypatch.setenv("API_REPLY_TIMEOUT", "1")
+            retried = await _post(client, "k-t")
+        return timed_out.json()["reply"], retried.json()["reply"]
+
+    timed_out, retried = asyncio_event_loop.run_until_complete(scenario())
+    assert timed_out is None
+    assert retried == {"text": "odp: rezerwuj"}
+    assert bridge.sent == ["k-t"]  # ponowienie nie trafia w dedup koordynatora
+
+
+def test_retry_after_dedup_window_sends_again(asyncio_event_loop, monkeypatch):
+    monkeypatch.setenv("API_REPLY_TIMEOUT", "0.05")
+    monkeypatch.setattr(chat_mod, "DEDUP_TTL_S", 0.1)
+    app = FastAPI()
+    app.include_router(chat_router)
+    bridge = app.state.bridge = DummyBridge(delay_s=None)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            await _post(client, "k-d")
+            await asyncio.sleep(0.2)
+            await _post(client, "k-d")
+
+    asyncio_event_loop.run_until_complete(scenario())
+    assert bridge.sent == ["k-d", "k-d"]
@@ -0,0 +1,75 @@
+import importlib
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+import agents.agent as agent_mod
+import agents.common.codec as codec
+from agents.protocol.acl_messages import AclMessage, Performative
+
+
+@pytest.fixture(params=["default", "stdlib"])
+def c(request, monkeypatch):
+    if request.param == "default":
+        yield codec
+        return
+    monkeypatch.setitem(sys.modules, "orjson", None)  # import orjson -> ImportError
+    fallback = importlib.reload(codec)
+    assert fallback.BACKEND == "json"
+    yield fallback
+    monkeypatch.undo()
+    importlib.reload(codec)
+
+
+def test_codec_roundtrip_and_types(c):
+    ts = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    out = c.dumps({"b": "zażółć", "a": Performative.INFORM, "ts": ts, 1: [1.5, None]})
+
+    assert "zażółć" in out and " " not in out  # UTF-8 wprost, kompaktowo
+    assert c.loads(out) == {"b": "zażółć", "a": "INFORM", "ts": ts.isoformat(), "1": [1.5, None]}
+    assert c.loads(c.dumpb({"x": 1})) == {"x": 1}
+    assert c.dumps({"b": 1, "a": 2}, sort_keys=True) == '{"a":2,"b":1}'
+    with pytest.raises(ValueError):
+        c.loads("{not-json")
+
+
+def test_freeze_caches_json_until_field_assignment():
+    acl = AclMessage.build_inform_fact("conv-f", "nights", 3)
+    assert not acl.frozen
+
+    first = acl.freeze().to_json()
+    assert acl.frozen and acl.to_json() is first
+    assert acl.to_bytes() == first.encode()
+    assert acl == AclMessage.model_validate_json(first)  # cache nie wpływa na równość
+
+    acl.ontology = "travel"
+    assert not acl.frozen and '"ontology":"travel"' in acl.to_json()
+    assert not acl.freeze().model_copy(update={"ontology": "x"}).frozen
+
+
+def test_send_acl_encodes_once(asyncio_event_loop, monkeypatch):
+    calls = []
+    orig = AclMessage.model_dump_json
+
+    def counting(self, *a, **k):
+        calls.append(1)
+        return orig(self, *a, **k)
+
+    monkeypatch.setattr(AclMessage, "model_dump_json", counting)
+    monkeypatch.setattr(agent_mod, "record_acl", lambda d, acl: acl.to_json())  # jak sink telemetrii
+
+    class Beh:
+        async def send(self, msg):
+            self.body = msg.body
+
+    class Self:
+        def log(self, *a, **k):
+            pass
+
+    beh = Beh()
+    acl = AclMessage.build_request_ask("conv-once", ["nights"])
+    asyncio_event_loop.run_until_complete(agent_mod.BaseAgent.send_acl(Self(), beh, acl, to_jid="p@x"))
+
+    assert len(calls) == 1
+    assert beh.body == acl.to_json()
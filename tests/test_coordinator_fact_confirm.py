@@ -1,9 +1,9 @@
 # tests/test_coordinator_fact_confirm.py
 import json
-from collections import deque
 
 from agents.protocol.acl_messages import AclMessage, Performative
 from agents.coordinator import CoordinatorAgent
+from agents.protocol.dedup import DedupWindow
 
 
 class DummyBehaviour:
@@ -22,7 +22,10 @@ class DummyAgent:
     """
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+
+    def is_duplicate(self, acl):
+        return self._dedup.is_duplicate(acl)
 
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         # Zbieramy wysyłane ramki do asercji
@@ -47,10 +50,10 @@ def test_coordinator_fact_produces_confirm(asyncio_event_loop, monkeypatch):
     import agents.coordinator as coord_mod
     calls = []
 
-    def fake_put_fact(conv_id, slot, value):
+    async def fake_put_fact(conv_id, slot, value):
         calls.append((conv_id, slot, value))
 
-    monkeypatch.setattr(coord_mod, "put_fact", fake_put_fact, raising=False)
+    monkeypatch.setattr(coord_mod, "aput_fact", fake_put_fact, raising=False)
 
     # Uruchom asynchroniczną metodę bez pytest-asyncio (używamy lokalnego fixture loopa)
     asyncio_event_loop.run_until_complete(
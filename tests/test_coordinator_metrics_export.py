@@ -1,8 +1,8 @@
 import json
-from collections import deque
 
 from agents.coordinator import CoordinatorAgent
 from agents.protocol.acl_messages import AclMessage
+from agents.protocol.dedup import DedupWindow
 
 class DummyBehaviour: pass
 
@@ -14,7 +14,10 @@ class DummyMsg:
 class DummyAgent:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+
+    def is_duplicate(self, acl):
+        return self._dedup.is_duplicate(acl)
 
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         self.outbox.append((to_jid, json.loads(acl.to_json())))
@@ -23,8 +26,8 @@ class DummyAgent:
     def write_kb_health(self): pass
 
     # hook z BaseAgent – będziemy monkeypatchować w teście
-    def export_metrics(self, session_id="system", slot_prefix="metrics"):
-        return f"{slot_prefix}_dummy123"
+    async def export_metrics(self):
+        return 12
 
 def test_metrics_export_request_produces_confirm(asyncio_event_loop, monkeypatch):
     agent = DummyAgent()
@@ -42,10 +45,10 @@ def test_metrics_export_request_produces_confirm(asyncio_event_loop, monkeypatch
         CoordinatorAgent.handle_acl(agent, beh, msg, req)
     )
 
-    # Oczekujemy INFORM/CONFIRM z nazwą slotu w statusie
+    # Oczekujemy INFORM/CONFIRM ze statusem i liczbą punktów w osobnym polu
     informs = [b for (_to, b) in agent.outbox if b.get("performative") == "INFORM"]
     assert informs, "expected INFORM as confirmation"
     p = informs[0].get("payload", {})
     assert p.get("type") == "CONFIRM"
     assert p.get("slot") == "metrics_export"
-    assert isinstance(p.get("status"), str) and p["status"].startswith("metrics_")
+    assert p.get("status") == "ok" and p.get("points") == 12
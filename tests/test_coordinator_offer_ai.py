@@ -1,9 +1,10 @@
 import json
-from collections import deque
 
 import os
+import threading
 import agents.coordinator as coord_mod
 from agents.protocol.acl_messages import AclMessage
+from agents.protocol.dedup import DedupWindow
 
 class DummyBehaviour: pass
 
@@ -15,7 +16,8 @@ class DummyMsg:
 class DummyAgent:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         self.outbox.append((to_jid, json.loads(acl.to_json())))
     def log(self, *a, **k): pass
@@ -32,7 +34,11 @@ def test_offer_uses_ai_when_enabled(asyncio_event_loop, monkeypatch):
     # Włącz AI i podstaw chat_reply
     monkeypatch.setenv("AI_ENABLED", "1")
     import ai.openai_client as ai_mod
-    monkeypatch.setattr(ai_mod, "chat_reply", lambda system_prompt, user_text: "Proponuję Sardynię w czerwcu — co Ty na to?", raising=False)
+    threads = []
+    def fake_chat_reply(system_prompt, user_text):
+        threads.append(threading.get_ident())
+        return "Proponuję Sardynię w czerwcu — co Ty na to?"
+    monkeypatch.setattr(ai_mod, "chat_reply", fake_chat_reply, raising=False)
 
     ping = AclMessage.build_request("conv-ai", {"type": "PING"}, ontology="default")
     _run(agent, beh, msg, ping, asyncio_event_loop)
@@ -41,6 +47,7 @@ def test_offer_uses_ai_when_enabled(asyncio_event_loop, monkeypatch):
     assert offers, "expected OFFER to be sent"
     notes = offers[0]["payload"]["proposal"]["notes"]
     assert "Sardynię" in notes or "Sardynię" in notes
+    assert threads and threads[0] != threading.get_ident()  # LLM poza wątkiem pętli zdarzeń
 
 def test_offer_fallback_without_ai(asyncio_event_loop, monkeypatch):
     agent = DummyAgent()
@@ -1,8 +1,8 @@
 import json
-from collections import deque
 
 from agents.protocol.acl_messages import AclMessage, Performative
 from agents.coordinator import CoordinatorAgent
+from agents.protocol.dedup import DedupWindow
 
 
 class DummyBehaviour:
@@ -16,7 +16,8 @@ class DummyMsg:
 class DummyAgent:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         self.outbox.append((to_jid, json.loads(acl.to_json())))
     def log(self, *args, **kwargs):
@@ -34,7 +35,7 @@ def test_unknown_fact_slot_is_rejected(asyncio_event_loop, monkeypatch):
 
     # put_fact nie powinien być wołany, ale podmieniamy na wszelki wypadek
     import agents.coordinator as coord_mod
-    monkeypatch.setattr(coord_mod, "put_fact", lambda *a, **k: (_ for _ in ()).throw(AssertionError("put_fact should not be called")), raising=False)
+    monkeypatch.setattr(coord_mod, "aput_fact", lambda *a, **k: (_ for _ in ()).throw(AssertionError("put_fact should not be called")), raising=False)
 
     asyncio_event_loop.run_until_complete(
         CoordinatorAgent.handle_acl(agent, beh, msg, fact)
@@ -0,0 +1,34 @@
+import threading
+
+import agents.common.kb as kb_mod
+import agents.common.kb_async as kb_async
+
+
+def test_pg_placeholders_are_numbered():
+    assert kb_async._pg(kb_mod.SQL_INSERT_OFFER).endswith("VALUES ($1, $2, $3, $4)")
+    assert "conversation_id=$1 AND slot=$2" in kb_async._SQL_LATEST_FACT
+
+
+def test_aput_fact_offloads_sync_kb_without_asyncpg(asyncio_event_loop, monkeypatch):
+    calls = []
+
+    def fake_put_fact(cid, slot, value):
+        calls.append((cid, slot, value, threading.current_thread().name))
+
+    monkeypatch.setattr(kb_async, "asyncpg", None)
+    monkeypatch.setattr(kb_mod, "put_fact", fake_put_fact)
+
+    asyncio_event_loop.run_until_complete(kb_async.aput_fact("conv-a", "nights", {"value": 7}))
+
+    assert calls and calls[0][:3] == ("conv-a", "nights", {"value": 7})
+    # zapis poszedł poza wątkiem pętli zdarzeń
+    assert calls[0][3].startswith("kb")
+
+
+def test_aget_fact_returns_sync_result(asyncio_event_loop, monkeypatch):
+    monkeypatch.setattr(kb_async, "asyncpg", None)
+    monkeypatch.setattr(kb_mod, "get_fact", lambda cid, slot: {"value": f"{cid}:{slot}"})
+
+    out = asyncio_event_loop.run_until_complete(kb_async.aget_fact("conv-b", "style"))
+
+    assert out == {"value": "conv-b:style"}
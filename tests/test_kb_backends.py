@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+import agents.common.kb as kb_mod
+import agents.common.kb_async as kb_async
+from agents.common.kb_backends import sqlite_path
+
+
+@pytest.fixture(params=["memory://", "sqlite"])
+def backend(request, tmp_path):
+    prev = kb_mod.DSN
+    dsn = request.param if request.param != "sqlite" else f"sqlite:///{tmp_path / 'kb.db'}"
+    b = kb_mod.configure_backend(dsn)
+    yield b
+    kb_mod.configure_backend(prev)
+
+
+def test_sqlite_dsn_paths():
+    assert sqlite_path("sqlite:///kb.db") == "kb.db"
+    assert sqlite_path("sqlite:////var/lib/mas/kb.db") == "/var/lib/mas/kb.db"
+    assert sqlite_path("sqlite://") == ":memory:"
+    with pytest.raises(ValueError):
+        kb_mod.make_backend("mysql://x")
+
+
+def test_facts_roundtrip(backend):
+    kb_mod.put_fact("c1", "nights", {"value": 5})
+    kb_mod.put_fact("c1", "nights", {"value": 7})
+    kb_mod.put_fact("c1", "event_IN_1", {"dir": "IN"})
+    kb_mod.put_fact("c2", "budget", {"value": 900})
+    kb_mod.cache_clear()  # odczyty mają trafić do backendu
+
+    assert kb_mod.get_fact("c1", "nights") == {"value": 7}
+    assert kb_mod.get_fact("c1", "event_IN_1") == {"dir": "IN"}
+    assert kb_mod.get_fact("c1", "budget") is None
+    assert kb_mod.get_facts("c1") == {"nights": {"value": 7}}
+    assert kb_mod.get_facts_many(["c1", "c2"], ["nights", "budget"]) == {
+        "c1": {"nights": {"value": 7}},
+        "c2": {"budget": {"value": 900}},
+    }
+    assert [r["slot"] for r in kb_mod.list_facts("c1")] == ["nights", "nights", "event_IN_1"]
+
+
+def test_offers_sorted_by_score(backend):
+    kb_mod.add_offer("c1", "a", {"p": 1}, None)
+    kb_mod.add_offer("c1", "b", {"p": 2}, 0.4)
+    kb_mod.add_offer("c1", "c", {"p": 3}, 0.9)
+    assert [o["provider"] for o in kb_mod.query_offers("c1")] == ["c", "b", "a"]
+
+
+def test_write_behind_batches_land_in_backend(backend):
+    kb_mod.configure_write_behind(True, batch_size=50, interval_s=60.0)
+    try:
+        for i in range(10):
+            kb_mod.put_fact("c-wb", "nights", {"value": i})
+        kb_mod.cache_clear()
+        assert kb_mod.get_fact("c-wb", "nights") == {"value": 9}  # odczyt robi flush
+    finally:
+        kb_mod.configure_write_behind(False)
+    assert len(kb_mod.list_facts("c-wb")) == 10
+
+
+def test_concurrent_writers(backend):
+    def work(n):
+        for i in range(20):
+            kb_mod.put_fact(f"c-{n}", "nights", {"value": i})
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    kb_mod.cache_clear()
+    got = kb_mod.get_facts_many([f"c-{n}" for n in range(4)], ["nights"])
+    assert all(v == {"nights": {"value": 19}} for v in got.values())
+
+
+def test_async_api_uses_backend(backend, asyncio_event_loop):
+    async def flow():
+        await kb_async.aput_fact("c-a", "nights", {"value": 3})
+        kb_mod.cache_clear()
+        return await kb_async.aget_fact("c-a", "nights")
+
+    assert asyncio_event_loop.run_until_complete(flow()) == {"value": 3}
@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+
+import pytest
+
+import agents.common.kb as kb_mod
+from agents.common.kb_cache import FactCache
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+    def __call__(self):
+        return self.t
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+    def __enter__(self):
+        return self
+    def __exit__(self, *a):
+        return False
+    def execute(self, sql, params=None):
+        self.db.executed.append((sql, params))
+    def fetchone(self):
+        return self.db.row
+
+
+class FakeDb:
+    def __init__(self):
+        self.executed = []
+        self.row = None
+    def cursor(self, *a, **k):
+        return FakeCursor(self)
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDb()
+
+    @contextmanager
+    def fake_get_conn():
+        yield db
+
+    monkeypatch.setattr(kb_mod, "get_conn", fake_get_conn)
+    kb_mod.configure_cache(True, ttl_s=60.0)
+    yield db
+    kb_mod.configure_cache(kb_mod.CACHE_ENABLED)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = FactCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1) and cache.get("c") == (True, 3)
+
+
+def test_ttl_expiry_and_byte_bound():
+    clock = Clock()
+    cache = FactCache(ttl_s=5.0, clock=clock)
+    cache.put("k", {"value": 1})
+    clock.t = 4.9
+    assert cache.get("k")[0]
+    clock.t = 5.0
+    assert cache.get("k") == (False, None)
+
+    small = FactCache(max_bytes=1000)
+    small.put("a", "x" * 400)
+    small.put("b", "y" * 400)
+    small.put("c", "z" * 400)
+    assert small.stats()["bytes"] <= 1000 and not small.get("a")[0]
+    small.put("huge", "h" * 5000)  # większe niż cały limit — nie trafia do cache
+    assert not small.get("huge")[0]
+
+
+def test_cached_value_is_a_copy():
+    cache = FactCache()
+    cache.put("k", {"value": [1]})
+    _, v = cache.get("k")
+    v["value"].append(2)
+    assert cache.get("k") == (True, {"value": [1]})
+
+
+def test_get_fact_served_from_cache_and_updated_by_put(db):
+    db.row = {"value": {"value": 3}}
+    assert kb_mod.get_fact("conv-c", "nights") == {"value": 3}
+    assert kb_mod.get_fact("conv-c", "nights") == {"value": 3}
+    assert len(db.executed) == 1  # drugi odczyt bez bazy
+
+    kb_mod.put_fact("conv-c", "nights", {"value": 4})
+    n = len(db.executed)
+    assert kb_mod.get_fact("conv-c", "nights") == {"value": 4}
+    assert len(db.executed) == n  # wartość zaktualizowana w miejscu, bez ponownego odczytu
+
+
+def test_telemetry_slots_are_not_cached(db):
+    db.row = {"value": {"dir": "IN"}}
+    kb_mod.put_fact("conv-c", "event_IN_1", {"dir": "IN"})
+    kb_mod.get_fact("conv-c", "event_IN_1")
+    kb_mod.get_fact("conv-c", "event_IN_1")
+    assert sum(1 for sql, _ in db.executed if sql == kb_mod.SQL_LATEST_FACT) == 2
+
+
+def test_cache_is_off_by_default_and_list_facts_always_reads_db(db, monkeypatch):
+    # agenty to osobne procesy -> bez MAS_KB_CACHE=1 cache jest wyłączony, a TTL krótki
+    assert not kb_mod.CACHE_ENABLED and kb_mod.CACHE_TTL_S <= 5.0
+
+    calls = []
+    monkeypatch.setattr(kb_mod.get_backend(), "list_facts", lambda cid: calls.append(cid) or [])
+    kb_mod.list_facts("conv-c")
+    kb_mod.list_facts("conv-c")
+    assert calls == ["conv-c", "conv-c"]  # pełna historia nie jest cache'owana
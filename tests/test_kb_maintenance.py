@@ -0,0 +1,139 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import agents.common.kb_maintenance as maint
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+    def __enter__(self):
+        return self
+    def __exit__(self, *a):
+        return False
+    def execute(self, sql, params=None):
+        self.db.executed.append((sql, params))
+        self.last = (sql, params)
+        if sql.startswith("DELETE") and self.db.deletes:
+            self.rowcount = self.db.deletes.pop(0)
+        if sql.startswith("INSERT"):
+            self.rowcount = self.db.late_rows
+    def fetchone(self):
+        sql, params = self.last
+        if sql.startswith("WITH copied"):
+            return self.db.copies.pop(0)
+        if sql == maint.SQL_DEFAULT_HAS_ROWS:
+            return (1,) if params[0].date() in self.db.default_days else None
+        return (1,) if self.db.partitioned else None
+    def fetchall(self):
+        return self.db.results.pop(0)
+
+
+class FakeDb:
+    def __init__(self, *, partitioned=True, deletes=(), results=(), default_days=(), copies=(), late_rows=0):
+        self.partitioned = partitioned
+        self.copies = list(copies)
+        self.late_rows = late_rows
+        self.default_days = set(default_days)
+        self.deletes = list(deletes)
+        self.results = list(results)
+        self.executed = []
+        self.commits = 0
+    def cursor(self, *a, **k):
+        return FakeCursor(self)
+    def commit(self):
+        self.commits += 1
+    def rollback(self):
+        pass
+
+
+def test_parse_retention():
+    assert maint.parse_retention("event_=7d, metrics_=12h,*=2w") == [
+        ("event_", timedelta(days=7)),
+        ("metrics_", timedelta(hours=12)),
+        ("*", timedelta(weeks=2)),
+    ]
+    with pytest.raises(ValueError):
+        maint.parse_retention("event_=7 days")
+
+
+def test_retention_deletes_in_committed_batches():
+    db = FakeDb(deletes=[100, 100, 7])
+    now = datetime(2026, 1, 10, tzinfo=timezone.utc)
+
+    out = maint.apply_retention(db, [("event_", timedelta(days=7))], now=now, batch=100, pause_s=0, log=lambda *_: None)
+
+    assert out == {"event_": 207}
+    deletes = [(sql, p) for sql, p in db.executed if sql.startswith("DELETE")]
+    assert len(deletes) == 3 and db.commits == 3
+    assert deletes[0][1] == [now - timedelta(days=7), "event\\_%", 100]
+    assert "tableoid" in deletes[0][0] and "LIMIT" in deletes[0][0]
+
+
+def test_retention_star_excludes_other_prefixes_and_drops_old_partitions():
+    db = FakeDb(deletes=[0, 0], results=[[("facts_p20260101",), ("facts_p20260109",), ("facts_legacy",)]])
+    now = datetime(2026, 1, 10, tzinfo=timezone.utc)
+
+    maint.apply_retention(
+        db, [("event_", timedelta(days=1)), ("*", timedelta(days=5))],
+        now=now, batch=10, pause_s=0, max_batches=1, log=lambda *_: None,
+    )
+
+    sqls = [sql for sql, _ in db.executed]
+    assert "DROP TABLE facts_p20260101" in sqls and "DROP TABLE facts_p20260109" not in sqls
+    star_sql, star_params = [(s, p) for s, p in db.executed if s.startswith("DELETE")][-1]
+    assert "slot NOT LIKE %s" in star_sql and star_params[1] == "event\\_%"
+
+
+def test_ensure_partitions_creates_missing_days():
+    db = FakeDb(results=[[("facts_p20260110",)]])
+    created = maint.ensure_partitions(db, ahead_days=2, today=date(2026, 1, 10), log=lambda *_: None)
+    assert created == ["facts_p20260111", "facts_p20260112"]
+
+    skipped = maint.ensure_partitions(FakeDb(partitioned=False), ahead_days=2, log=lambda *_: None)
+    assert skipped == []
+
+
+def test_ensure_partitions_moves_rows_out_of_default_partition():
+    db = FakeDb(
+        results=[[("facts_p20260110",), ("facts_default",)]],
+        default_days=[date(2026, 1, 12)],
+        copies=[(2, 41), (1, 57)],
+        late_rows=1,
+    )
+    logs = []
+    created = maint.ensure_partitions(db, ahead_days=2, today=date(2026, 1, 10), batch=2, pause_s=0, log=logs.append)
+    assert created == ["facts_p20260111", "facts_p20260112"]
+    assert "moved 4 rows" in logs[-1]
+
+    sqls = [sql for sql, _ in db.executed if not sql.startswith("SELECT")]
+    assert sqls[0].startswith("CREATE TABLE IF NOT EXISTS facts_p20260111 PARTITION OF")
+    # dzień z wierszami w DEFAULT: facts_default nie jest odłączana (ACCESS EXCLUSIVE na facts)
+    assert not any("DETACH" in sql for sql in sqls)
+    rest = sqls[1:]
+    assert rest[0] == "CREATE TABLE IF NOT EXISTS facts_p20260112 (LIKE facts INCLUDING DEFAULTS)"
+    assert rest[1].startswith("ALTER TABLE facts_p20260112 ADD CONSTRAINT facts_p20260112_range CHECK")
+    copies = [p for sql, p in db.executed if sql.startswith("WITH copied")]
+    assert [(p[2], p[3]) for p in copies] == [(0, 2), (41, 2)]  # partie po id, commit po każdej
+    tail = rest[rest.index("LOCK TABLE facts_default IN EXCLUSIVE MODE"):]
+    assert [sql.split(" WHERE")[0] for sql in tail] == [
+        "LOCK TABLE facts_default IN EXCLUSIVE MODE",
+        "INSERT INTO facts_p20260112 SELECT d.* FROM facts_default d",
+        "DELETE FROM facts_default",
+        "ALTER TABLE facts ATTACH PARTITION facts_p20260112 FOR VALUES FROM (%s) TO (%s)",
+        "ALTER TABLE facts_p20260112 DROP CONSTRAINT facts_p20260112_range",
+    ]
+
+
+def test_compact_pages_through_conversations():
+    db = FakeDb(deletes=[4, 1], results=[[("a",), ("b",)], [("c",)]])
+
+    n = maint.compact(db, 3, conversations_per_batch=2, pause_s=0, log=lambda *_: None)
+
+    assert n == 5
+    pages = [p for sql, p in db.executed if sql == maint.SQL_NEXT_CONVERSATIONS]
+    assert pages == [("", 2), ("b", 2)]
+    compact_params = [p for sql, p in db.executed if sql.startswith("DELETE")]
+    assert compact_params[0][0] == ["a", "b"] and compact_params[0][-1] == 3
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+import agents.common.kb as kb_mod
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+    def __enter__(self):
+        return self
+    def __exit__(self, *a):
+        return False
+    def execute(self, sql, params=None):
+        if self.conn.broken:
+            raise RuntimeError("server closed the connection")
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+    def cursor(self, *a, **k):
+        return FakeCursor(self)
+    def get_transaction_status(self):
+        return 0  # TRANSACTION_STATUS_IDLE
+    def rollback(self):
+        self.rollbacks += 1
+    def close(self):
+        self.closed = 1
+
+
+def _pool(counts, monkeypatch, **kw):
+    opened = []
+
+    def connect():
+        c = FakeConn()
+        opened.append(c)
+        return c
+
+    monkeypatch.setattr(kb_mod, "inc", lambda k, n=1: counts.__setitem__(k, counts.get(k, 0) + n))
+    pool = kb_mod.ConnectionPool("fake://", connect=connect, **kw)
+    return pool, opened
+
+
+def test_pool_reuses_connections(monkeypatch):
+    counts = {}
+    pool, opened = _pool(counts, monkeypatch, minconn=0, maxconn=2)
+
+    c1 = pool.getconn()
+    pool.putconn(c1)
+    c2 = pool.getconn()
+    pool.putconn(c2)
+
+    assert c1 is c2 and len(opened) == 1
+    assert counts["kb_pool_checkouts_total"] == 2
+    assert counts["kb_pool_misses_total"] == 1
+    assert pool.stats() == {"size": 1, "idle": 1, "in_use": 0, "max": 2}
+
+
+def test_pool_times_out_when_exhausted(monkeypatch):
+    counts = {}
+    pool, _ = _pool(counts, monkeypatch, minconn=0, maxconn=1, timeout_s=0.01)
+
+    held = pool.getconn()
+    with pytest.raises(kb_mod.PoolTimeout):
+        pool.getconn()
+    assert counts["kb_pool_timeouts_total"] == 1
+
+    # zwrot połączenia budzi czekającego
+    got = []
+    t = threading.Thread(target=lambda: got.append(pool.getconn()))
+    pool.timeout_s = 1.0
+    t.start()
+    pool.putconn(held)
+    t.join(1.0)
+    assert got and got[0] is held
+
+
+def test_pool_healthcheck_replaces_dead_idle_connection(monkeypatch):
+    counts = {}
+    pool, opened = _pool(counts, monkeypatch, minconn=1, maxconn=1, healthcheck_idle_s=0.0)
+    pool.fill()
+    opened[0].broken = True
+
+    conn = pool.getconn()
+
+    assert conn is not opened[0] and opened[0].closed
+    assert counts["kb_pool_healthcheck_failed_total"] == 1
+    assert pool.stats()["size"] == 1
@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+
+import agents.common.kb as kb_mod
+import agents.common.kb_migrate as migrate_mod
+from agents.common.kb_cache import FactCache
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+    def __enter__(self):
+        return self
+    def __exit__(self, *a):
+        return False
+    def execute(self, sql, params=None):
+        self.db.executed.append((sql, params))
+    def fetchone(self):
+        return self.db.row
+    def fetchall(self):
+        return self.db.rows
+
+
+class FakeDb:
+    def __init__(self):
+        self.executed = []
+        self.row = None
+        self.rows = []
+        self.commits = 0
+        self.autocommit = False
+    def cursor(self, *a, **k):
+        return FakeCursor(self)
+    def commit(self):
+        self.commits += 1
+    def rollback(self):
+        pass
+
+
+def _patch_conn(monkeypatch, db):
+    @contextmanager
+    def fake_get_conn():
+        yield db
+    monkeypatch.setattr(kb_mod, "get_conn", fake_get_conn)
+    kb_mod.cache_clear()
+
+
+def test_put_fact_upserts_projection_in_one_statement(monkeypatch):
+    db = FakeDb()
+    _patch_conn(monkeypatch, db)
+
+    kb_mod.put_fact("conv-p", "nights", {"value": 7})
+    kb_mod.put_fact("conv-p", "event_IN_123", {"direction": "IN"})
+
+    (sql1, _), (sql2, _) = db.executed
+    assert "INSERT INTO facts_current" in sql1 and "ON CONFLICT" in sql1
+    assert "facts_current" not in sql2  # telemetria nie trafia do projekcji
+
+
+def test_get_fact_reads_projection_by_key(monkeypatch):
+    db = FakeDb()
+    db.row = {"value": {"value": 7}}
+    _patch_conn(monkeypatch, db)
+
+    assert kb_mod.get_fact("conv-p", "nights") == {"value": 7}
+    sql, params = db.executed[-1]
+    assert sql == kb_mod.SQL_CURRENT_FACT and params == ("conv-p", "nights")
+    assert "ORDER BY" not in sql
+
+
+def test_batch_projection_keeps_latest_row_per_key():
+    rows = [
+        ("c1", "nights", {"value": 5}, 1),
+        ("c1", "event_OUT_1", {}, 2),
+        ("c1", "nights", {"value": 7}, 3),
+        ("c2", "nights", {"value": 2}, 4),
+    ]
+    latest = kb_mod._latest_per_key(rows)
+    assert [(r[0], r[2]) for r in latest] == [("c1", {"value": 7}), ("c2", {"value": 2})]
+
+
+def test_migrations_apply_only_pending(monkeypatch):
+    db = FakeDb()
+    db.rows = [("000_base",)]
+    _patch_conn(monkeypatch, db)
+
+    versions = migrate_mod.migrate(log=lambda *_: None)
+
+    assert "000_base" not in versions and "001_facts_current" in versions
+    assert any("DISTINCT ON (conversation_id, slot)" in sql for sql, _ in db.executed)
+
+    # CREATE INDEX CONCURRENTLY: poza transakcją, każda instrukcja osobno
+    concurrent = [sql for sql, _ in db.executed if sql.startswith("CREATE INDEX CONCURRENTLY")]
+    assert concurrent and all(sql.count(";") == 1 for sql in concurrent)
+    assert db.autocommit is False
+
+
+def test_no_transaction_migration_split_into_statements():
+    sql = migrate_mod.MIGRATIONS_DIR.joinpath("005_facts_legacy_indexes.sql").read_text(encoding="utf-8")
+    assert sql.startswith(migrate_mod.NO_TRANSACTION)
+    stmts = migrate_mod.statements(sql)
+    assert [s.split()[0] for s in stmts] == ["CREATE", "ALTER", "CREATE", "ALTER"]
+    assert not any("--" in s for s in stmts)
+
+
+def test_no_transaction_migration_keeps_do_blocks_whole():
+    sql = migrate_mod.MIGRATIONS_DIR.joinpath("002_facts_partitioned.sql").read_text(encoding="utf-8")
+    assert sql.startswith(migrate_mod.NO_TRANSACTION)
+    stmts = migrate_mod.statements(sql)
+    # NOT VALID, VALIDATE i ATTACH w osobnych transakcjach
+    assert len(stmts) == 3 and all(s.startswith("DO $$") and s.endswith("END $$;") for s in stmts)
+    assert "NOT VALID" in stmts[0] and "VALIDATE CONSTRAINT" in stmts[1]
+    assert "ATTACH PARTITION facts_legacy" in stmts[2] and "DROP CONSTRAINT facts_legacy_bound" in stmts[2]
+
+
+def test_get_facts_fetches_all_slots_in_one_query(monkeypatch):
+    db = FakeDb()
+    db.rows = [("conv-m", "nights", {"value": 3}), ("conv-m", "budget", {"value": 900})]
+    _patch_conn(monkeypatch, db)
+    monkeypatch.setattr(kb_mod, "_cache", FactCache(ttl_s=60.0))  # cache jest opt-in
+
+    got = kb_mod.get_facts("conv-m", ["nights", "budget", "destination"])
+
+    assert got == {"nights": {"value": 3}, "budget": {"value": 900}}
+    assert len(db.executed) == 1
+    sql, (cids, slots) = db.executed[0]
+    assert sql == kb_mod.SQL_CURRENT_FACTS and cids == ["conv-m"]
+    assert sorted(slots) == ["budget", "destination", "nights"]
+
+    # drugie wywołanie w całości z cache (łącznie z nieustawionym "destination")
+    assert kb_mod.get_facts("conv-m", ["nights", "destination"]) == {"nights": {"value": 3}}
+    assert len(db.executed) == 1
+
+
+def test_get_facts_many_splits_projection_and_history(monkeypatch):
+    db = FakeDb()
+    db.rows = [("c1", "nights", {"value": 1}), ("c2", "nights", {"value": 2})]
+    _patch_conn(monkeypatch, db)
+
+    got = kb_mod.get_facts_many(["c1", "c2", "c1"], ["nights", "event_IN_1"])
+
+    assert got == {"c1": {"nights": {"value": 1}}, "c2": {"nights": {"value": 2}}}
+    assert [sql for sql, _ in db.executed] == [kb_mod.SQL_CURRENT_FACTS, kb_mod.SQL_LATEST_FACTS]
+    assert db.executed[1][1] == (["c1", "c2"], ["event_IN_1"])
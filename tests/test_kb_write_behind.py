@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+import agents.common.kb as kb_mod
+import agents.common.kb_async as kb_async
+
+
+class FakeWriter:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+    def __call__(self, rows):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.batches.append(list(rows))
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    writer = FakeWriter()
+    kb_mod.configure_write_behind(True, batch_size=3, interval_s=60.0, max_pending=4, writer=writer)
+    yield writer
+    writer.fail = False
+    kb_mod.configure_write_behind(False)
+
+
+def _wait_for(cond, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_put_fact_is_buffered_and_flushed_explicitly(write_behind):
+    kb_mod.put_fact("conv-wb", "nights", {"value": 7})
+    kb_mod.put_fact("conv-wb", "style", {"value": "relaks"})
+    assert write_behind.batches == []
+
+    assert kb_mod.flush() == 2
+    (batch,) = write_behind.batches
+    assert [(cid, slot) for cid, slot, _v, _ts in batch] == [("conv-wb", "nights"), ("conv-wb", "style")]
+    # created_at nadawany przy buforowaniu -> rosnący w obrębie partii
+    assert batch[0][3] <= batch[1][3]
+
+
+def test_batch_size_triggers_background_flush(write_behind):
+    for i in range(3):
+        kb_mod.put_fact("conv-wb", f"s{i}", {"value": i})
+    _wait_for(lambda: write_behind.batches)
+    assert len(write_behind.batches) == 1 and len(write_behind.batches[0]) == 3
+
+
+def test_full_buffer_applies_backpressure_and_keeps_rows(write_behind):
+    write_behind.fail = True
+    wb = kb_mod._write_buffer()
+    for i in range(4):
+        wb.add(("conv-bp", f"s{i}", {}, i), timeout=0.01)
+    with pytest.raises(kb_mod.BufferFull):
+        wb.add(("conv-bp", "s4", {}, 4), timeout=0.05)
+    assert wb.try_add(("conv-bp", "s4", {}, 4)) is False
+
+    # po powrocie bazy nic nie ginie, kolejność zachowana
+    write_behind.fail = False
+    kb_mod.flush()
+    assert len(wb) == 0
+    written = [row[1] for batch in write_behind.batches for row in batch]
+    assert written == ["s0", "s1", "s2", "s3"]
+
+
+def test_aput_fact_enqueues_without_touching_db(asyncio_event_loop, write_behind, monkeypatch):
+    monkeypatch.setattr(kb_async, "_offload", None)  # nie powinno być użyte
+    asyncio_event_loop.run_until_complete(kb_async.aput_fact("conv-a", "nights", {"value": 3}))
+    assert len(kb_mod._write_buffer()) == 1
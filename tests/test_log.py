@@ -0,0 +1,105 @@
+import io
+import json
+import logging
+import queue
+
+import agents.common.log as log_mod
+import agents.common.metrics as metrics_mod
+from agents.agent import BaseAgent
+from agents.protocol.acl_messages import AclMessage
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+class Expensive:
+    calls = 0
+
+    def __repr__(self):
+        Expensive.calls += 1
+        return "expensive"
+
+
+class CoordLike(BaseAgent):
+    pass
+
+
+def _lines(out: io.StringIO):
+    log_mod.flush()
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def teardown_function(_):
+    log_mod.configure(stream=io.StringIO())  # jak fixture quiet_logs w conftest
+
+
+def test_json_lines_with_per_agent_levels():
+    out = io.StringIO()
+    log_mod.configure(level="INFO", levels="CoordLike=DEBUG,wire=WARNING", stream=out)
+
+    agent = CoordLike("c@xmpp", "pw")
+    agent.log("kb saved", conv="conv-1", slot="nights")
+    agent.logger.debug("ACL OUT", to="p@xmpp")
+    BaseAgent("b@xmpp", "pw").logger.debug("hidden")  # domyślny poziom INFO
+    agent.wire_log("IN", acl=AclMessage.build_request_ask("conv-1", ["nights"]))  # wire=WARNING
+
+    lines = _lines(out)
+    assert [(l["logger"], l["event"]) for l in lines] == [
+        ("mas.agent.CoordLike", "kb saved"),
+        ("mas.agent.CoordLike", "ACL OUT"),
+    ]
+    assert lines[0]["conv"] == "conv-1" and lines[0]["level"] == "INFO" and lines[0]["ts"].endswith("+00:00")
+
+    log_mod.set_level("wire.CoordLike", "INFO")
+    agent.wire_log("IN", acl=AclMessage.build_request_ask("conv-2", ["nights"]))
+    wire = _lines(out)[-1]
+    assert wire["event"] == "WIRE" and wire["dir"] == "IN" and wire["conv"] == "conv-2" and wire["type"] == "ASK"
+
+
+def test_disabled_level_skips_formatting_and_queue():
+    out = io.StringIO()
+    log_mod.configure(level="WARNING", stream=out, fmt="text")
+    Expensive.calls = 0
+
+    lg = log_mod.get_logger("agent.Quiet")
+    lg.info("skipped", obj=Expensive())
+    lg.warning("kept", obj=Expensive())
+    assert Expensive.calls == 0  # nic nie formatuje się w wątku wołającym
+
+    log_mod.flush()
+    assert out.getvalue().splitlines() == ["[Quiet] kept obj=expensive"] and Expensive.calls == 1
+
+
+def test_full_queue_drops_instead_of_blocking():
+    metrics_mod.snapshot(reset=True)
+    q = queue.Queue(maxsize=1)
+    logger = logging.getLogger("mas.test.full")
+    logger.propagate = False
+    logger.addHandler(log_mod._QueueHandler(q))
+    try:
+        logger.warning("one")
+        logger.warning("two")
+    finally:
+        logger.handlers.clear()
+    assert q.qsize() == 1 and metrics_mod.counters()["log_dropped_total"] == 1
+
+
+def test_wire_gate_rate_limit_and_sampling():
+    metrics_mod.snapshot(reset=True)
+    clock = Clock()
+    gate = log_mod._WireGate(sample=1.0, rate=2, clock=clock)
+
+    assert [gate.allow("A") for _ in range(3)] == [True, True, False]
+    assert gate.allow("B")  # osobny limit per agent
+    clock.t = 0.5
+    assert gate.allow("A") and not gate.allow("A")
+
+    assert not log_mod._WireGate(sample=0.0, rate=0).allow("A")
+    c = metrics_mod.counters()
+    assert c['log_wire_suppressed_total{agent="A",reason="rate"}'] == 2
+    assert c['log_wire_suppressed_total{agent="A",reason="sample"}'] == 1
@@ -1,3 +1,5 @@
+import threading
+
 import agents.agent as agent_mod
 
 class DummyAgent(agent_mod.BaseAgent):
@@ -6,24 +8,46 @@ class DummyAgent(agent_mod.BaseAgent):
         pass
     def log(self, *a, **k): pass
 
-def test_export_metrics_calls_put_fact(monkeypatch):
+def test_export_metrics_flushes_metric_points_off_the_loop(monkeypatch, asyncio_event_loop):
     called = {}
-    # podmieniamy put_fact używane w metrics.export_to_kb przez monkeypatch na module metrics
+    # podmieniamy zrzut przyrostów używany przez BaseAgent.export_metrics
+    import agents.common.metrics_store as store_mod
+
+    def fake_flush():
+        called["thread"] = threading.get_ident()
+        return 7
+
+    monkeypatch.setattr(store_mod, "flush", fake_flush)
+
+    # strzał
+    a = DummyAgent()
+    points = asyncio_event_loop.run_until_complete(agent_mod.BaseAgent.export_metrics(a))
+
+    assert points == 7
+    assert called["thread"] != threading.get_ident()  # zapis do bazy w wątku, nie w pętli
+
+
+def test_export_metrics_failure_returns_none(monkeypatch, asyncio_event_loop):
+    import agents.common.metrics_store as store_mod
+
+    def broken_flush():
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(store_mod, "flush", broken_flush)
+    assert asyncio_event_loop.run_until_complete(agent_mod.BaseAgent.export_metrics(DummyAgent())) is None
+
+
+def test_export_to_kb_still_writes_snapshot_slot(monkeypatch):
     import agents.common.metrics as metrics_mod
+    called = {}
 
     def fake_put_fact(session_id, slot, payload):
-        called["session_id"] = session_id
-        called["slot"] = slot
-        called["payload"] = payload
+        called.update(session_id=session_id, slot=slot, payload=payload)
 
     monkeypatch.setattr(metrics_mod, "put_fact", fake_put_fact, raising=False)
 
-    # strzał
-    a = DummyAgent()
-    slot = agent_mod.BaseAgent.export_metrics(a, session_id="system", slot_prefix="metrics")
+    slot = metrics_mod.export_to_kb(session_id="system", slot_prefix="metrics")
 
-    assert called, "put_fact should be called"
     assert called["session_id"] == "system"
-    assert called["slot"].startswith("metrics_")
+    assert slot == called["slot"] and slot.startswith("metrics_")
     assert isinstance(called["payload"], dict)
-    assert slot == called["slot"]
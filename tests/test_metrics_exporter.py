@@ -0,0 +1,61 @@
+import urllib.request
+
+from fastapi.testclient import TestClient
+
+import agents.common.metrics as metrics_mod
+import agents.common.metrics_exporter as exporter
+
+
+def setup_function(_):
+    metrics_mod.snapshot(reset=True)
+
+
+def test_render_counters_gauges_histograms():
+    metrics_mod.inc("acl_in_type_FACT", 3)
+    metrics_mod.register_gauge("test_queue", lambda: 7)
+    metrics_mod.observe("latency_kb_get_fact", 0.003)
+
+    text = exporter.render()
+
+    assert "# TYPE mas_acl_in_type_FACT counter\nmas_acl_in_type_FACT 3" in text
+    assert "mas_test_queue 7" in text
+    assert "# TYPE mas_latency_kb_get_fact_seconds histogram" in text
+    assert 'mas_latency_kb_get_fact_seconds_bucket{le="0.002048"} 0' in text
+    assert 'mas_latency_kb_get_fact_seconds_bucket{le="0.004096"} 1' in text
+    assert 'mas_latency_kb_get_fact_seconds_bucket{le="+Inf"} 1' in text
+    assert "mas_latency_kb_get_fact_seconds_count 1" in text
+
+
+def test_standalone_exporter_serves_metrics():
+    metrics_mod.inc("exporter_probe", 1)
+    server = exporter.start_exporter(port=0)
+    try:
+        url = f"http://{exporter.host_port(server)}/metrics"
+        with urllib.request.urlopen(url, timeout=2) as r:
+            body = r.read().decode()
+            assert r.headers["Content-Type"].startswith("text/plain")
+        assert "mas_exporter_probe 1" in body
+    finally:
+        exporter.stop_exporter()
+
+
+def test_fastapi_metrics_endpoint_and_route_latency():
+    from api.server import app
+
+    client = TestClient(app)
+    client.get("/metrics")
+    r = client.get("/metrics")
+
+    assert r.status_code == 200
+    assert 'mas_http_request_seconds_count{method="GET",route="/metrics"} 1' in r.text
+    assert metrics_mod.counters()['http_responses_total{status="200"}'] >= 1
+
+
+def test_render_labelled_families_escapes_values():
+    fam = metrics_mod.counter("exporter_labelled_total", ("peer",), help="Próbka.")
+    fam.labels(peer='a"b\\c').inc(2)
+
+    text = exporter.render()
+
+    assert "# HELP mas_exporter_labelled_total Próbka." in text
+    assert 'mas_exporter_labelled_total{peer="a\\"b\\\\c"} 2' in text
@@ -0,0 +1,53 @@
+import agents.common.metrics as metrics_mod
+import agents.agent as agent_mod
+from agents.protocol.acl_messages import AclMessage
+
+
+def setup_function(_):
+    metrics_mod.snapshot(reset=True)
+
+
+def test_percentiles_from_log_buckets():
+    for _ in range(90):
+        metrics_mod.observe("latency_test", 0.001)   # 1 ms
+    for _ in range(10):
+        metrics_mod.observe("latency_test", 0.100)   # 100 ms
+
+    s = metrics_mod.histograms()["latency_test"]
+    assert s["count"] == 100
+    assert 1.0 <= s["p50_ms"] <= 1.2 and 1.0 <= s["p90_ms"] <= 1.2
+    assert s["p99_ms"] == s["max_ms"] == 100.0
+
+
+def test_timer_decorates_async_and_lands_in_snapshot(asyncio_event_loop):
+    @metrics_mod.timer("latency_async_op")
+    async def op():
+        return 42
+
+    assert asyncio_event_loop.run_until_complete(op()) == 42
+    with metrics_mod.timer("latency_sync_a", "latency_sync_b"):
+        pass
+
+    snap = metrics_mod.snapshot()
+    assert snap["latency_async_op_count"] == 1
+    assert snap["latency_sync_a_count"] == snap["latency_sync_b_count"] == 1
+    assert {"latency_async_op_p50_ms", "latency_async_op_p90_ms", "latency_async_op_p99_ms"} <= set(snap)
+
+
+def test_send_acl_records_latency_per_type(asyncio_event_loop, monkeypatch):
+    monkeypatch.setattr(agent_mod, "record_acl", lambda *a: None)
+
+    class Beh:
+        async def send(self, msg):
+            pass
+
+    class Self:
+        name = "coord"
+        def log(self, *a, **k):
+            pass
+
+    acl = AclMessage.build_request_ask("conv-h", ["nights"])
+    asyncio_event_loop.run_until_complete(agent_mod.BaseAgent.send_acl(Self(), Beh(), acl, to_jid="p@x"))
+
+    h = metrics_mod.histograms()
+    assert h['acl_send_seconds{agent="coord",performative="REQUEST",type="ASK"}']["count"] == 1
@@ -1,3 +1,4 @@
+import agents.common.metrics as metrics_mod
 import agents.protocol.handler as handler_mod
 from agents.protocol import acl_handler
 from agents.protocol.acl_messages import AclMessage
@@ -20,6 +21,7 @@ def test_metrics_increment_on_in(asyncio_event_loop, monkeypatch):
         counts[k] = counts.get(k, 0) + n
 
     monkeypatch.setattr(handler_mod, "inc", fake_inc, raising=False)
+    metrics_mod.snapshot(reset=True)
 
     agent = DummyAgent()
 
@@ -34,6 +36,6 @@ def test_metrics_increment_on_in(asyncio_event_loop, monkeypatch):
 
     assert agent.called is True
     assert counts.get("acl_in_total", 0) == 1
-    # performative i type specyficzne
-    assert counts.get("acl_in_performative_INFORM", 0) == 1
-    assert counts.get("acl_in_type_FACT", 0) == 1
+    # seria z etykietami: agent (tu nazwa klasy), kierunek, performatyw, typ
+    assert handler_mod.ACL_MESSAGES.labels("DummyAgent", "in", "INFORM", "FACT").value == 1
+    assert handler_mod.ACL_HANDLE_SECONDS.labels("DummyAgent", "INFORM", "FACT").count == 1
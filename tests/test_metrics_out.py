@@ -1,4 +1,5 @@
 import agents.agent as agent_mod
+import agents.common.metrics as metrics_mod
 from agents.protocol.acl_messages import AclMessage
 
 class DummyBehaviour:
@@ -17,6 +18,7 @@ def test_metrics_increment_on_out(asyncio_event_loop, monkeypatch):
         counts[k] = counts.get(k, 0) + n
 
     monkeypatch.setattr(agent_mod, "inc", fake_inc, raising=False)
+    metrics_mod.snapshot(reset=True)
 
     beh = DummyBehaviour()
     self = DummySelf()
@@ -27,6 +29,5 @@ def test_metrics_increment_on_out(asyncio_event_loop, monkeypatch):
     )
 
     assert counts.get("acl_out_total", 0) == 1
-    assert counts.get("acl_out_performative_REQUEST", 0) == 1
-    assert counts.get("acl_out_type_ASK", 0) == 1
+    assert agent_mod.ACL_MESSAGES.labels("DummySelf", "out", "REQUEST", "ASK").value == 1
     assert beh.sent, "message should be sent"
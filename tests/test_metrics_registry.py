@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+import agents.common.metrics as metrics_mod
+
+
+def setup_function(_):
+    metrics_mod.snapshot(reset=True)
+
+
+def test_labelled_counter_positional_and_keyword_share_series():
+    fam = metrics_mod.counter("reg_msgs_total", ("agent", "direction"))
+    fam.labels("coord", "in").inc()
+    fam.labels(direction="in", agent="coord").inc(2)
+
+    assert fam.labels("coord", "in").value == 3
+    assert metrics_mod.counters()['reg_msgs_total{agent="coord",direction="in"}'] == 3
+
+
+def test_registry_rejects_kind_or_label_mismatch():
+    metrics_mod.counter("reg_mismatch_total", ("a",))
+    assert metrics_mod.counter("reg_mismatch_total", ("a",)) is metrics_mod.REGISTRY.get("reg_mismatch_total")
+    with pytest.raises(ValueError):
+        metrics_mod.gauge("reg_mismatch_total", ("a",))
+    with pytest.raises(ValueError):
+        metrics_mod.counter("reg_mismatch_total", ("b",))
+    with pytest.raises(ValueError):
+        metrics_mod.REGISTRY.get("reg_mismatch_total").labels("x", "y")
+
+
+def test_flat_api_on_labelled_family_names_the_labels():
+    metrics_mod.counter("reg_flat_total", ("a",))
+    metrics_mod.histogram("reg_flat_seconds", ("op",))
+    with pytest.raises(ValueError, match=r"reg_flat_total.*\('a',\)"):
+        metrics_mod.inc("reg_flat_total")
+    with pytest.raises(ValueError, match="reg_flat_seconds"):
+        metrics_mod.observe("reg_flat_seconds", 0.1)
+    metrics_mod.inc("reg_flat_plain_total")
+    assert metrics_mod.counters()["reg_flat_plain_total"] == 1
+
+
+def test_cardinality_cap_routes_new_series_to_overflow():
+    fam = metrics_mod.counter("reg_capped_total", ("type",), max_series=3)
+    for i in range(10):
+        fam.labels(f"T{i}").inc()
+
+    values = {labels["type"]: child.value for labels, child in fam.series()}
+    assert set(values) == {"T0", "T1", "T2", metrics_mod.OVERFLOW}
+    assert values[metrics_mod.OVERFLOW] == 7
+    assert metrics_mod.counters()["metrics_series_overflow_total"] == 7
+    # istniejące serie nadal liczą się osobno
+    fam.labels("T0").inc()
+    assert fam.labels("T0").value == 2
+
+
+def test_reset_keeps_bound_children():
+    fam = metrics_mod.histogram("reg_bound_seconds", ("op",))
+    child = fam.labels(op="get")
+    child.observe(0.01)
+    metrics_mod.snapshot(reset=True)
+
+    child.observe(0.02)
+    assert fam.labels(op="get").count == 1
+
+
+def test_gauge_set_inc_and_function():
+    g = metrics_mod.gauge("reg_depth", ("queue",))
+    g.labels("a").set(5)
+    g.labels("a").inc(2)
+    g.labels("a").dec()
+    g.labels("b").set_function(lambda: 42)
+
+    assert metrics_mod.gauges()['reg_depth{queue="a"}'] == 6
+    assert metrics_mod.gauges()['reg_depth{queue="b"}'] == 42
+
+
+def test_concurrent_updates_are_not_lost():
+    c = metrics_mod.counter("reg_threads_total", ("worker",)).labels("w")
+    h = metrics_mod.histogram("reg_threads_seconds")
+
+    def work():
+        for _ in range(5000):
+            c.inc()
+            h.observe(0.001)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert c.value == 40000
+    assert metrics_mod.histograms()["reg_threads_seconds"]["count"] == 40000
@@ -0,0 +1,103 @@
+import pytest
+
+import agents.common.metrics as metrics_mod
+from agents.common.kb_backends import MemoryBackend, SQLiteBackend
+from agents.common.metrics_store import DeltaRecorder, MetricsStore
+
+T0 = 1_700_000_000 // 86400 * 86400  # północ UTC
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request):
+    if request.param == "memory":
+        b = MemoryBackend(is_projected=lambda s: True)
+    else:
+        b = SQLiteBackend(":memory:", is_projected=lambda s: True)
+    yield b
+    b.close()
+
+
+@pytest.fixture
+def registry():
+    return metrics_mod.Registry()
+
+
+def _store(backend, registry, retention="1m=2d,1h=90d"):
+    return MetricsStore(lambda: backend, retention=retention, registry=registry)
+
+
+def test_recorder_emits_deltas_and_handles_reset(registry):
+    c = registry.counter("msgs_total", ("type",))
+    h = registry.histogram("op_seconds")
+    rec = DeltaRecorder(registry)
+
+    c.labels("ASK").inc(5)
+    h.observe(0.5)
+    rows = {(r[1], r[2]): r for r in rec.collect(T0 + 30)}
+    assert rows[("msgs_total", '{"type":"ASK"}')][3:] == (T0, "counter", 5, 0)
+    assert rows[("op_seconds", "{}")][5:] == (0.5, 1)
+
+    c.labels("ASK").inc(2)
+    assert [r[5] for r in rec.collect(T0 + 90)] == [2]  # histogram bez zmian -> brak wiersza
+
+    registry.reset()
+    c.labels("ASK").inc(1)
+    assert [r[5] for r in rec.collect(T0 + 150)] == [1]
+
+
+def test_deltas_add_up_and_rate_per_second(backend, registry):
+    c = registry.counter("msgs_total", ("type",))
+    store = _store(backend, registry)
+
+    c.labels("ASK").inc(60)
+    store.record(T0 + 10)
+    c.labels("ASK").inc(120)
+    store.record(T0 + 70)
+    # drugi proces piszący do tej samej minuty
+    backend.add_metric_points([("1m", "msgs_total", '{"type":"ASK"}', T0 + 60, "counter", 60.0, 0)])
+
+    assert store.rate("msgs_total", 120, now=T0 + 119) == {'msgs_total{type="ASK"}': 2.0}
+    pts = store.series("msgs_total", since=T0, until=T0 + 120)['msgs_total{type="ASK"}']
+    assert pts == [(T0, 60.0, 0), (T0 + 60, 180.0, 0)]
+
+
+def test_rollups_and_retention(backend, registry):
+    c = registry.counter("jobs_total")
+    g = registry.gauge("queue_depth")
+    store = _store(backend, registry)
+
+    for minute in range(3):
+        c.inc(10)
+        g.set(minute * 2)
+        store.tick(T0 + 3600 + minute * 60)
+
+    assert store.series("jobs_total", T0, T0 + 86400, resolution="1h") == {"jobs_total": [(T0 + 3600, 30.0, 0)]}
+    assert store.series("jobs_total", T0, T0 + 86400, resolution="1d") == {"jobs_total": [(T0, 30.0, 0)]}
+    # rollup jest idempotentny: kolejny tick nie dubluje sum
+    store.tick(T0 + 3600 + 180)
+    assert store.series("jobs_total", T0, T0 + 86400, resolution="1h")["jobs_total"][0][1] == 30.0
+    assert store.rate("queue_depth", 3600, now=T0 + 3600 + 240, resolution="1h") == {"queue_depth": 2.5}  # 0, 2, 4, 4
+
+    # po 3 dniach minuty znikają, godziny i dni zostają
+    store.apply_retention(T0 + 3 * 86400)
+    assert store.series("jobs_total", T0, T0 + 86400, resolution="1m") == {}
+    assert store.series("jobs_total", T0, T0 + 86400, resolution="1h")["jobs_total"][0][1] == 30.0
+
+
+def test_resolution_for_window():
+    store = MetricsStore(lambda: None, retention="1m=2d,1h=90d")
+    assert store.resolution_for(300) == "1m"
+    assert store.resolution_for(7 * 86400) == "1h"
+    assert store.resolution_for(365 * 86400) == "1d"
+
+
+def test_store_thread_stops_only_after_last_user(backend, registry):
+    store = _store(backend, registry)
+    store.acquire(interval_s=3600)
+    store.acquire(interval_s=3600)  # drugi agent w tym samym procesie
+
+    store.release()
+    assert store.running()  # pierwszy agent zatrzymany, zapis metryk trwa dla drugiego
+    store.release()
+    assert not store.running()
+    store.release()  # nadmiarowe release nic nie psuje
@@ -1,5 +1,6 @@
 import agents.presenter as presenter_mod
 from agents.protocol.acl_messages import AclMessage
+from agents.protocol.dedup import DedupWindow
 
 class DummyBehaviour: ...
 class DummyMsg:
@@ -10,7 +11,8 @@ class DummyMsg:
 class DummyPresenter:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = __import__("collections").deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl, to_jid: str):
         import json
         self.outbox.append((to_jid, json.loads(acl.to_json())))
@@ -34,9 +36,9 @@ def test_presenter_sets_state_gather_on_ask(asyncio_event_loop, monkeypatch):
 
     # Patch: zapis stanu sesji do KB
     calls = []
-    def fake_put_fact(conv_id, slot, value):
+    async def fake_put_fact(conv_id, slot, value):
         calls.append((conv_id, slot, value))
-    monkeypatch.setattr(presenter_mod, "put_fact", fake_put_fact, raising=False)
+    monkeypatch.setattr(presenter_mod, "aput_fact", fake_put_fact, raising=False)
 
     # Run
     asyncio_event_loop.run_until_complete(
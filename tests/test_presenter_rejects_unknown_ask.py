@@ -1,5 +1,6 @@
 import agents.presenter as presenter_mod
 from agents.protocol.acl_messages import AclMessage
+from agents.protocol.dedup import DedupWindow
 
 class DummyBehaviour: ...
 class DummyMsg:
@@ -10,7 +11,8 @@ class DummyMsg:
 class DummyPresenter:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = __import__("collections").deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl, to_jid: str):
         import json
         self.outbox.append((to_jid, json.loads(acl.to_json())))
@@ -1,8 +1,8 @@
 import json
-from collections import deque
 
 from agents.protocol.acl_messages import AclMessage
 import agents.presenter as presenter_mod
+from agents.protocol.dedup import DedupWindow
 
 
 class DummyBehaviour:
@@ -16,7 +16,8 @@ class DummyMsg:
 class DummyPresenter:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         self.outbox.append((to_jid, json.loads(acl.to_json())))
     def log(self, *args, **kwargs):
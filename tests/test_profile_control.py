@@ -0,0 +1,100 @@
+import asyncio
+import pstats
+
+import agents.common.metrics as metrics_mod
+import agents.common.profiler as profiler
+from agents.agent import BaseAgent
+from agents.protocol.acl_messages import AclMessage
+
+
+class DummyMsg:
+    def __init__(self, sender: str):
+        self.sender = sender
+        self.metadata = {}
+
+
+class DummyBehaviour:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, msg):
+        self.sent.append(AclMessage.from_spade_message(msg))
+
+
+def _busy(ms: float) -> None:
+    import time
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        sum(range(200))
+
+
+async def _drain(agent: BaseAgent) -> None:
+    await asyncio.gather(*list(getattr(agent, "_tasks", ())))
+
+
+def test_profile_denied_for_unlisted_sender(monkeypatch, asyncio_event_loop):
+    monkeypatch.setattr(profiler, "ALLOWED_JIDS", frozenset({"ops@xmpp"}))
+    metrics_mod.snapshot(reset=True)
+    agent, beh = BaseAgent("a@xmpp", "pw"), DummyBehaviour()
+
+    req = AclMessage.build_request_profile("prof-1", seconds=1)
+    handled = asyncio_event_loop.run_until_complete(agent.handle_control(beh, DummyMsg("intruder@xmpp/laptop"), req))
+
+    assert handled and profiler.active() is None
+    assert beh.sent[0].payload["code"] == "UNAUTHORIZED" and beh.sent[0].in_reply_to == req.message_id
+    assert metrics_mod.counters()['profile_requests_total{agent="a",result="denied"}'] == 1
+    # inne typy na ontology=system idą dalej (router / handle_acl)
+    ping = AclMessage.build_request("prof-1", {"type": "PING"}, ontology="system")
+    assert asyncio_event_loop.run_until_complete(agent.handle_control(beh, DummyMsg("ops@xmpp"), ping)) is False
+
+
+def test_profile_session_writes_pstats_and_collapsed(monkeypatch, tmp_path, asyncio_event_loop):
+    monkeypatch.setattr(profiler, "ALLOWED_JIDS", frozenset({"ops@xmpp"}))
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    agent, beh = BaseAgent("a@xmpp.example", "pw"), DummyBehaviour()
+    sender = DummyMsg("ops@xmpp/cli")
+
+    async def scenario():
+        await agent.handle_control(beh, sender, AclMessage.build_request_profile("prof-2", seconds=0.3, mode="both"))
+        # druga sesja w tym samym procesie -> odmowa
+        await agent.handle_control(beh, sender, AclMessage.build_request_profile("prof-3", seconds=1))
+        for _ in range(10):
+            _busy(10)
+            await asyncio.sleep(0)
+        await _drain(agent)
+
+    asyncio_event_loop.run_until_complete(scenario())
+    started, busy, done = (m.payload for m in beh.sent)
+    assert started["status"] == "started" and started["mode"] == "both"
+    assert busy["code"] == "VALIDATION_ERROR" and "already running" in busy["message"]
+    assert done["status"] == "done" and profiler.active() is None
+
+    stats = pstats.Stats(done["files"]["pstats"])
+    assert any(func[2] == "_busy" for func in stats.stats)
+    collapsed = open(done["files"]["collapsed"], encoding="utf-8").read().splitlines()
+    assert collapsed and all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed)
+    assert any("_busy (test_profile_control.py" in line for line in collapsed)
+
+
+def test_profile_stop_ends_session_early(monkeypatch, tmp_path, asyncio_event_loop):
+    monkeypatch.setattr(profiler, "ALLOWED_JIDS", frozenset({"ops@xmpp"}))
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    agent, beh = BaseAgent("a@xmpp", "pw"), DummyBehaviour()
+    sender = DummyMsg("ops@xmpp")
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        await agent.handle_control(beh, sender, AclMessage.build_request_profile("prof-4", seconds=60))
+        await asyncio.sleep(0.05)
+        await agent.handle_control(beh, sender, AclMessage.build_request_profile("prof-4", "stop"))
+        await _drain(agent)
+        return loop.time() - t0
+
+    assert asyncio_event_loop.run_until_complete(scenario()) < 5
+    assert [m.payload["status"] for m in beh.sent] == ["started", "stopping", "done"]
+    assert set(beh.sent[-1].payload["files"]) == {"collapsed"}
+
+    bad = AclMessage.build_request_profile("prof-5", seconds=10_000)
+    asyncio_event_loop.run_until_complete(agent.handle_control(beh, sender, bad))
+    assert beh.sent[-1].payload["code"] == "VALIDATION_ERROR" and profiler.active() is None
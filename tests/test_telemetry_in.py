@@ -19,10 +19,10 @@ class DummyAgent:
 
 def test_acl_handler_logs_in(asyncio_event_loop, monkeypatch):
     calls = []
-    def fake_log_acl_event(cid, direction, acl_dict):
-        calls.append((cid, direction, acl_dict))
+    def fake_record_acl(direction, acl, data=None):
+        calls.append((acl.conversation_id, direction, acl, data))
 
-    monkeypatch.setattr(handler_mod, "log_acl_event", fake_log_acl_event, raising=False)
+    monkeypatch.setattr(handler_mod, "record_acl", fake_record_acl, raising=False)
 
     agent = DummyAgent()
 
@@ -38,4 +38,6 @@ def test_acl_handler_logs_in(asyncio_event_loop, monkeypatch):
     assert agent.called is True
     assert calls, "telemetry should be called"
     assert calls[0][0] == "conv-in" and calls[0][1] == "IN"
-    assert calls[0][2]["payload"]["type"] == "FACT"
+    assert calls[0][2].payload["type"] == "FACT"
+    # telemetria dostaje zdekodowany body z jedynego json.loads
+    assert calls[0][3] == json.loads(acl.to_json())
@@ -16,11 +16,10 @@ class DummySelf:
 
 def test_baseagent_send_acl_logs_out(asyncio_event_loop, monkeypatch):
     telemetry = []
-    monkeypatch.setattr(
-        agent_mod, "log_acl_event",
-        lambda cid, d, data: telemetry.append((cid, d, data)),
-        raising=False
-    )
+    def fake_record_acl(d, acl):
+        telemetry.append((acl.conversation_id, d, acl))
+
+    monkeypatch.setattr(agent_mod, "record_acl", fake_record_acl, raising=False)
 
     dummy_self = DummySelf()
     beh = DummyBehaviour()
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import agents.common.telemetry as tel
+from agents.protocol.acl_messages import AclMessage
+
+
+class ListSink(tel.Sink):
+    def __init__(self):
+        self.batches = []
+    def write(self, events):
+        self.batches.append(list(events))
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    counts = {}
+    monkeypatch.setattr(tel, "inc", lambda k, n=1: counts.__setitem__(k, counts.get(k, 0) + n))
+    s = ListSink()
+    s.counts = counts
+    tel.configure(s, sampling={}, capacity=5, batch_size=100, interval_s=60.0)
+    yield s
+    tel.configure(None, sampling={})
+
+
+def test_record_acl_buffers_without_serializing(sink):
+    acl = AclMessage.build_inform_fact("conv-t", "nights", 3)
+    tel.record_acl("IN", acl)
+    assert not sink.batches  # nic nie zapisane na ścieżce wiadomości
+
+    assert tel.flush() == 1
+    (event,) = sink.batches[0]
+    assert event.acl is acl and event.msg_type == "FACT" and event.direction == "IN"
+    assert json.loads(event.body_json())["payload"]["slot"] == "nights"
+
+
+def test_overflow_drops_oldest_and_counts(sink):
+    for i in range(8):
+        tel.log_acl_event(f"c{i}", "OUT", {"performative": "inform", "payload": {"type": "ACK"}})
+    tel.flush()
+    got = [e.conversation_id for b in sink.batches for e in b]
+    assert got == ["c3", "c4", "c5", "c6", "c7"]
+    assert sink.counts["telemetry_dropped_total"] == 3
+
+
+def test_sampling_per_type(sink):
+    tel.configure(sink, sampling={"PING": 0.0, "*": 1.0}, capacity=100, batch_size=100, interval_s=60.0)
+    tel.record_acl("IN", AclMessage.build_request("c", {"type": "PING"}))
+    tel.record_acl("IN", AclMessage.build_inform_fact("c", "nights", 1))
+    tel.flush()
+    assert [e.msg_type for b in sink.batches for e in b] == ["FACT"]
+    assert sink.counts["telemetry_sampled_out_total"] == 1
+
+
+def test_jsonl_sink_rotates(tmp_path):
+    path = tmp_path / "events.jsonl"
+    s = tel.JsonlSink(str(path), max_bytes=200, backups=2)
+    acl = AclMessage.build_inform_fact("conv-j", "nights", 3)
+    for _ in range(3):
+        s.write([tel.AclEvent(1, "IN", "conv-j", "inform", "FACT", acl)])
+    s.close()
+
+    rotated = sorted(p.name for p in tmp_path.iterdir())
+    assert rotated == ["events.jsonl.1", "events.jsonl.2"]
+    line = json.loads((tmp_path / "events.jsonl.1").read_text().splitlines()[0])
+    assert line["acl"]["payload"]["type"] == "FACT" and line["type"] == "FACT"
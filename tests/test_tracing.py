@@ -0,0 +1,95 @@
+import asyncio
+
+import agents.common.tracing as tracing
+from agents.protocol import acl_handler
+from agents.protocol.acl_messages import AclMessage
+from scripts import trace_waterfall
+
+
+class DummyMsg:
+    def __init__(self, spade_msg):
+        self.body = spade_msg.body
+        self.sender = "coordinator@xmpp"
+        self.thread = spade_msg.thread
+        self.metadata = dict(spade_msg.metadata)
+
+
+class DummyBehaviour:
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+
+def teardown_function(_):
+    tracing.COLLECTOR.clear()
+    tracing.configure("off")
+
+
+def test_trace_context_crosses_agents_via_metadata(asyncio_event_loop):
+    tracing.configure("memory")
+    replies = []
+
+    @tracing.traced("kb.aget_fact")
+    async def kb_call():
+        await asyncio.sleep(0)
+
+    @acl_handler
+    async def on_ask(self, acl: AclMessage, raw_msg):
+        await kb_call()
+        replies.append(AclMessage.build_inform_fact(acl.conversation_id, slot="nights", value=7)
+                       .to_spade_message("coordinator@xmpp"))
+
+    async def scenario():
+        with tracing.span("chat.turn", service="api", conv="conv-t") as root:
+            out = AclMessage.build_request_ask("conv-t", ["nights"]).to_spade_message("extractor@xmpp")
+        await on_ask(DummyBehaviour(), DummyMsg(out))
+        return root, out
+
+    root, out = asyncio_event_loop.run_until_complete(scenario())
+    assert tracing.parse_traceparent(out.metadata["traceparent"]).trace_id == root.trace_id
+
+    spans = {s.name: s for s in tracing.COLLECTOR.spans(root.trace_id)}
+    assert set(spans) == {"chat.turn", "acl.handle", "kb.aget_fact"}
+    assert spans["acl.handle"].parent_id == root.span_id and spans["acl.handle"].attrs["type"] == "ASK"
+    assert spans["kb.aget_fact"].parent_id == spans["acl.handle"].span_id
+    # odpowiedź niesie span obsługi -> kolejny agent dopina się pod acl.handle
+    assert tracing.extract(replies[0]).span_id == spans["acl.handle"].span_id
+
+
+def test_disabled_tracing_is_noop():
+    tracing.configure("off")
+    with tracing.span("chat.turn") as sp:
+        msg = AclMessage.build_request_ask("conv-off", ["nights"]).to_spade_message("x@xmpp")
+    assert sp is None and tracing.current() is None
+    assert "traceparent" not in msg.metadata and tracing.COLLECTOR.spans() == []
+    assert tracing.parse_traceparent("00-xyz-1-01") is None
+
+
+def test_jsonl_export_and_waterfall_cli(tmp_path, capsys):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure("jsonl", path=str(path))
+    with tracing.span("chat.turn", service="api"):
+        with tracing.span("acl.handle", service="CoordinatorAgent"):
+            with tracing.span("llm.chat"):
+                pass
+    try:
+        raise_in_span()
+    except RuntimeError:
+        pass
+    tracing.flush()
+
+    records = tracing.load_jsonl(str(path))
+    assert len(records) == 4
+    turn = [r for r in records if r["trace_id"] == records[2]["trace_id"]]
+    lines = tracing.render_waterfall(turn, width=10)
+    assert lines[0].startswith("trace ")
+    assert [l.split()[2] for l in lines[1:]] == ["chat.turn", "acl.handle", "llm.chat"]
+    assert "[CoordinatorAgent]" in lines[2]
+
+    assert trace_waterfall.main([str(path), "--last", "0"]) == 0
+    out = capsys.readouterr().out
+    assert out.count("trace ") == 2 and "! RuntimeError: boom" in out
+
+
+def raise_in_span():
+    with tracing.span("owm.geocode"):
+        raise RuntimeError("boom")
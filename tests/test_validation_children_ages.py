@@ -1,7 +1,7 @@
 import json
-from collections import deque
 from agents.protocol.acl_messages import AclMessage
 from agents.coordinator import CoordinatorAgent
+from agents.protocol.dedup import DedupWindow
 
 class DummyBehaviour: pass
 class DummyMsg:
@@ -12,7 +12,8 @@ class DummyMsg:
 class DummyAgent:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         self.outbox.append((to_jid, json.loads(acl.to_json())))
     def log(self, *a, **k): pass
@@ -45,8 +46,8 @@ def test_children_ages_valid_variants(asyncio_event_loop, monkeypatch):
     ]
     calls = []
     import agents.coordinator as coord_mod
-    def fake_put_fact(cid, slot, val): calls.append((cid, slot, val))
-    monkeypatch.setattr(coord_mod, "put_fact", fake_put_fact, raising=False)
+    async def fake_put_fact(cid, slot, val): calls.append((cid, slot, val))
+    monkeypatch.setattr(coord_mod, "aput_fact", fake_put_fact, raising=False)
 
     for i, (input_v, expected) in enumerate(good_cases):
         calls.clear(); agent.outbox.clear()
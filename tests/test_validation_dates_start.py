@@ -1,7 +1,7 @@
 import json
-from collections import deque
 from agents.protocol.acl_messages import AclMessage
 from agents.coordinator import CoordinatorAgent
+from agents.protocol.dedup import DedupWindow
 
 class DummyBehaviour: pass
 
@@ -13,7 +13,8 @@ class DummyMsg:
 class DummyAgent:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         self.outbox.append((to_jid, json.loads(acl.to_json())))
     def log(self, *a, **k): pass
@@ -27,7 +28,7 @@ def test_dates_start_invalid_is_rejected(asyncio_event_loop, monkeypatch):
     bad_fact = AclMessage.build_inform_fact("conv-bad-d", "dates_start", "2026-13-40", ontology="travel")
 
     import agents.coordinator as coord_mod
-    monkeypatch.setattr(coord_mod, "put_fact", lambda *a, **k: (_ for _ in ()).throw(AssertionError("put_fact should not be called")), raising=False)
+    monkeypatch.setattr(coord_mod, "aput_fact", lambda *a, **k: (_ for _ in ()).throw(AssertionError("put_fact should not be called")), raising=False)
 
     asyncio_event_loop.run_until_complete(CoordinatorAgent.handle_acl(agent, beh, msg, bad_fact))
 
@@ -43,9 +44,9 @@ def test_dates_start_valid_is_confirmed(asyncio_event_loop, monkeypatch):
 
     calls = []
     import agents.coordinator as coord_mod
-    def fake_put_fact(cid, slot, val):
+    async def fake_put_fact(cid, slot, val):
         calls.append((cid, slot, val))
-    monkeypatch.setattr(coord_mod, "put_fact", fake_put_fact, raising=False)
+    monkeypatch.setattr(coord_mod, "aput_fact", fake_put_fact, raising=False)
 
     asyncio_event_loop.run_until_complete(CoordinatorAgent.handle_acl(agent, beh, msg, good_fact))
 
@@ -1,7 +1,7 @@
 import json
-from collections import deque
 from agents.protocol.acl_messages import AclMessage
 from agents.coordinator import CoordinatorAgent
+from agents.protocol.dedup import DedupWindow
 
 class DummyBehaviour: pass
 class DummyMsg:
@@ -12,7 +12,8 @@ class DummyMsg:
 class DummyAgent:
     def __init__(self):
         self.outbox = []
-        self._acl_seen_keys = deque(maxlen=64)
+        self._dedup = DedupWindow()
+    def is_duplicate(self, acl): return self._dedup.is_duplicate(acl)
     async def send_acl(self, behaviour, acl: AclMessage, to_jid: str):
         self.outbox.append((to_jid, json.loads(acl.to_json())))
     def log(self, *a, **k): pass
@@ -22,7 +23,7 @@ def test_passport_ok_invalid_is_rejected(asyncio_event_loop, monkeypatch):
     agent = DummyAgent(); beh = DummyBehaviour(); msg = DummyMsg()
     bad = AclMessage.build_inform_fact("conv-p-bad", "passport_ok", "maybe")
     import agents.coordinator as coord_mod
-    monkeypatch.setattr(coord_mod, "put_fact",
+    monkeypatch.setattr(coord_mod, "aput_fact",
                         lambda *a, **k: (_ for _ in ()).throw(AssertionError("put_fact should not be called")),
                         raising=False)
     asyncio_event_loop.run_until_complete(CoordinatorAgent.handle_acl(agent, beh, msg, bad))
@@ -34,8 +35,8 @@ def test_passport_ok_valid_variants_are_normalized(asyncio_event_loop, monkeypat
     variants = ["tak", "nie", "YES", "no", "True", "false", "1", "0", True, False]
     calls = []
     import agents.coordinator as coord_mod
-    def fake_put_fact(cid, slot, val): calls.append((cid, slot, val))
-    monkeypatch.setattr(coord_mod, "put_fact", fake_put_fact, raising=False)
+    async def fake_put_fact(cid, slot, val): calls.append((cid, slot, val))
+    monkeypatch.setattr(coord_mod, "aput_fact", fake_put_fact, raising=False)
 
     for i, v in enumerate(variants):
         calls.clear()